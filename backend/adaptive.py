@@ -0,0 +1,144 @@
+# backend/adaptive.py
+"""Deadline-aware choice of decoding strategy.
+
+Requests may carry a latency budget. ``choose_strategy`` walks a ladder
+from the configured beam search down to greedy decoding, a shorter output
+and finally the extractive tier. It picks the first rung whose estimated
+cost fits the remaining budget. Estimates come from an EWMA of the observed
+time per decoding step and sequence, kept per task by ``DecodeTimer``.
+``DeadlineCriteria`` stops generation for rows whose deadline has passed,
+so a bad estimate costs a shorter output instead of a missed deadline.
+"""
+import os
+import threading
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+# Weight of the newest observation in the per-step EWMA
+EWMA_ALPHA = float(os.environ.get("ADAPTIVE_EWMA_ALPHA", 0.2))
+
+# Per-step, per-sequence cost assumed before anything has been measured
+PRIOR_STEP_SECONDS = float(os.environ.get("ADAPTIVE_PRIOR_STEP_MS", 5)) / 1000.0
+
+# Only plan to use this fraction of the budget, leaving room for estimation error
+BUDGET_SAFETY = float(os.environ.get("ADAPTIVE_BUDGET_SAFETY", 0.8))
+
+
+class Strategy:
+    """A way to decode: beam width, output length relative to the request, and
+    whether a draft model assists (greedy only)."""
+
+    def __init__(self, name, num_beams, length_scale=1.0, assisted=False):
+        self.name = name
+        self.num_beams = num_beams
+        self.length_scale = length_scale
+        self.assisted = assisted
+
+    @property
+    def extractive(self):
+        return self.num_beams == 0
+
+    def max_length(self, max_length, min_length=0):
+        return max(min_length + 1, int(max_length * self.length_scale))
+
+    def generate_kwargs(self, base_kwargs, min_length=0):
+        """``base_kwargs`` adjusted to this strategy's beam width and length."""
+        kwargs = dict(base_kwargs)
+        kwargs["num_beams"] = self.num_beams
+        if "max_length" in kwargs:
+            kwargs["max_length"] = self.max_length(kwargs["max_length"], min_length)
+        if self.num_beams == 1:
+            # Beam-only settings would only trigger warnings in greedy mode
+            for key in ("early_stopping", "length_penalty"):
+                kwargs.pop(key, None)
+        return kwargs
+
+
+def strategy_ladder(default_beams):
+    """Strategies from best quality to cheapest, starting at the configured beam width."""
+    ladder = [Strategy(f"beam{default_beams}", default_beams)]
+    if default_beams > 2:
+        ladder.append(Strategy(f"beam{default_beams // 2}", default_beams // 2))
+    if default_beams > 1:
+        ladder.append(Strategy("greedy", 1))
+    ladder.append(Strategy("greedy_short", 1, 0.5))
+    ladder.append(Strategy("extractive", 0))
+    return ladder
+
+
+class DecodeTimer:
+    """EWMA of seconds per decoding step per sequence (batch row × beam), per task."""
+
+    def __init__(self, alpha=EWMA_ALPHA, prior=PRIOR_STEP_SECONDS):
+        self.alpha = alpha
+        self.prior = prior
+        self._step_seconds = {}
+        self._lock = threading.Lock()
+
+    def record(self, task, seconds, steps, sequences):
+        if steps <= 0 or sequences <= 0:
+            return
+        observed = seconds / (steps * sequences)
+        with self._lock:
+            previous = self._step_seconds.get(task)
+            self._step_seconds[task] = observed if previous is None else (
+                self.alpha * observed + (1 - self.alpha) * previous
+            )
+
+    def step_seconds(self, task):
+        with self._lock:
+            return self._step_seconds.get(task, self.prior)
+
+    def estimate(self, task, strategy, max_length, min_length=0, rows=1):
+        """Worst-case seconds for ``rows`` prompts decoded with ``strategy`` to full length."""
+        if strategy.extractive:
+            return 0.0
+        return self.step_seconds(task) * strategy.max_length(max_length, min_length) * strategy.num_beams * rows
+
+    def stats(self):
+        with self._lock:
+            return {task: {"step_ms": 1000.0 * value} for task, value in self._step_seconds.items()}
+
+
+# One timer per process, fed by generate_batched
+timer = DecodeTimer()
+
+
+def choose_strategy(task, ladder, deadline, max_length, min_length=0, rows=1, expected_wait=0.0):
+    """The best strategy expected to finish before ``deadline`` (a time.monotonic() value).
+
+    Without a deadline the first rung (the configured decoding) is used.
+    """
+    if deadline is None:
+        return ladder[0]
+    budget = (deadline - time.monotonic() - expected_wait) * BUDGET_SAFETY
+    for strategy in ladder:
+        if strategy.extractive or timer.estimate(task, strategy, max_length, min_length, rows) <= budget:
+            return strategy
+    return ladder[-1]
+
+
+def deadline_from_ms(deadline_ms):
+    """Absolute monotonic deadline for a request budget in milliseconds (None means no deadline)."""
+    if deadline_ms is None:
+        return None
+    return time.monotonic() + max(0, deadline_ms) / 1000.0
+
+
+class DeadlineCriteria(StoppingCriteria):
+    """Stops the sequences of each prompt once that prompt's deadline has passed.
+
+    ``deadlines`` holds one monotonic deadline (or None) per prompt in the
+    batch; with beam search every prompt owns consecutive rows of
+    ``input_ids``, one per beam.
+    """
+
+    def __init__(self, deadlines):
+        self.deadlines = [float("inf") if d is None else d for d in deadlines]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.monotonic()
+        expired = torch.tensor([now >= d for d in self.deadlines], dtype=torch.bool, device=input_ids.device)
+        return expired.repeat_interleave(input_ids.shape[0] // len(self.deadlines))
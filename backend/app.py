@@ -1,71 +1,127 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from collections import OrderedDict
 import os
 import json
+import threading
+
+from document_store import DocumentStore
+from field_index import FieldExtractor, FieldIndex
+from gateway import BackendError, Gateway, outcome
+from ingest import DocumentBuilder, ingest_stream
+from textrank import split_sentences, textrank_summary
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Store uploaded documents in memory (for simplicity)
-# In a production environment, you would use a database
-document_store = {
-    "content": "",
-    "filename": ""
-}
+# Uploaded documents keyed by documentId, segmented and tokenized once at upload.
+# Least recently used documents spill to disk when DOCUMENT_STORE_MAX_BYTES is exceeded.
+document_store = DocumentStore()
 
-# Simple mock implementation of the LongT5 model functionality
-# In a real implementation, you would use the actual model from the provided code
-def generate_answer(context, question):
-    """
-    Mock implementation of answer generation.
-    In production, you would integrate the actual LongT5 model here.
+# Summaries and answers come from the FastAPI model servers (SUMMARY_SERVER_URL, QA_SERVER_URL)
+gateway = Gateway()
+# How long an upload waits for the model results before answering with what is ready
+UPLOAD_DEADLINE_SECONDS = float(os.environ.get("GATEWAY_UPLOAD_DEADLINE_MS", 5000)) / 1000.0
+# Uploads are whole documents, so by default they are summarized past the first 512 tokens
+UPLOAD_SUMMARY_MODE = os.environ.get("GATEWAY_SUMMARY_MODE", "hierarchical")
+
+# Model results of recent uploads, including those still running, for /api/documents/<id>/analysis
+ANALYSES_KEPT = int(os.environ.get("GATEWAY_ANALYSES_KEPT", 256))
+analyses = OrderedDict()
+analyses_lock = threading.Lock()
+
+def track_analysis(document_id, futures):
+    with analyses_lock:
+        analyses[document_id] = futures
+        analyses.move_to_end(document_id)
+        while len(analyses) > ANALYSES_KEPT:
+            analyses.popitem(last=False)
+
+DEFAULT_QUESTIONS = [
+    "Who is the petitioner in the case?",
+    "Who is the respondent in the case?",
+    "What is the case summary?",
+    "What was the court's decision?",
+    "What legal provisions are applied?",
+    "What were the main arguments from both sides?",
+    "What is the reasoning behind the decision?",
+    "Were there any precedents cited?",
+    "Were there any dissenting opinions?",
+    "What penalties or consequences were given?",
+    "What are the implications of the case?",
+    "What facts were established in the case?",
+    "What evidence was presented?",
+    "What are the key legal issues in the case?",
+    "What is the timeline of events?"
+]
+
+# Answers to the default questions per document: rule-extracted fields at upload, model answers once they arrive
+field_indexes = OrderedDict()
+field_indexes_lock = threading.Lock()
+
+def track_fields(document_id, fields):
+    with field_indexes_lock:
+        fields = field_indexes.setdefault(document_id, fields)
+        field_indexes.move_to_end(document_id)
+        while len(field_indexes) > ANALYSES_KEPT:
+            field_indexes.popitem(last=False)
+    return fields
+
+def document_fields(document):
+    """The field index of ``document``, rebuilt from its stored sentences if it was evicted."""
+    with field_indexes_lock:
+        fields = field_indexes.get(document.id)
+        if fields is not None:
+            field_indexes.move_to_end(document.id)
+            return fields
+    return track_fields(document.id, FieldIndex.from_text(document.text, document.sentence_texts()))
+
+def store_model_answers(fields, future):
+    """Done-callback of the upload's document registration: later lookups of these questions skip the model."""
+    if not future.cancelled() and future.exception() is None:
+        fields.add_answers({result["question"]: result["answer"] for result in future.result()["qa_results"]})
+
+def analysis_response(document, outcomes):
+    """Upload/analysis fields from the fan-out outcomes; TextRank stands in until the model summary is ready.
+
+    Default questions the field index cannot answer yet (the model pass is
+    still running or failed) have a null answer.
     """
-    # This would be replaced with actual model inference
-    if "plaintiff" in question.lower() or "petitioner" in question.lower():
-        return "Based on the document, the petitioner appears to be John Smith."
-    elif "respondent" in question.lower():
-        return "The respondent in this case is ABC Corporation."
-    elif "decision" in question.lower() or "ruling" in question.lower():
-        return "The court ruled in favor of the petitioner, finding that the patent was valid and infringed upon."
-    elif "legal" in question.lower() and "provision" in question.lower():
-        return "The court applied sections 101 and 103 of the Patent Act regarding patentability and non-obviousness."
-    elif "argument" in question.lower():
-        return "The main arguments were about patent validity and whether infringement occurred."
-    elif "reasoning" in question.lower():
-        return "The court reasoned that the technology was novel enough to merit protection."
-    elif "precedent" in question.lower():
-        return "Several key precedents were cited including Diamond v. Diehr (1981)."
-    elif "dissent" in question.lower():
-        return "There were no dissenting opinions in this unanimous decision."
-    elif "penalt" in question.lower() or "consequence" in question.lower():
-        return "The court ordered damages of $1.2 million and issued an injunction."
-    elif "implication" in question.lower():
-        return "This case strengthens protection for software patents."
-    elif "fact" in question.lower():
-        return "Key facts included the filing date of the patent and when alleged infringement began."
-    elif "evidence" in question.lower():
-        return "Evidence included source code comparisons and expert testimony."
-    elif "issue" in question.lower():
-        return "Key legal issues were patent validity and infringement."
-    elif "timeline" in question.lower():
-        return "The timeline spans from 2018 (patent filing) to 2022 (lawsuit)."
+    summary = outcomes["summary"]
+    if summary["status"] == "ok":
+        summary_text, summary_source = summary["result"]["summary"], "model"
     else:
-        # For any other question, generate a generic response that includes context
-        return f"Based on my analysis of the document which is about {len(context.split())} words long, I cannot provide a specific answer to this question."
+        summary_text, summary_source = summarize_document(document), "extractive"
+    fields = document_fields(document)
+    return {
+        "summary": summary_text,
+        "summarySource": summary_source,
+        "qaResults": [{"question": question, "answer": fields.lookup(question)} for question in DEFAULT_QUESTIONS],
+        "fields": fields.fields,
+        "analysis": {
+            name: {key: value for key, value in result.items() if key != "result"}
+            for name, result in outcomes.items()
+        },
+    }
 
-def summarize_text(text):
+def summarize_text(text, sentences=None, word_count=None):
     """
-    Mock implementation of text summarization.
-    In production, you would integrate the actual summarization model.
+    Extractive summary (TextRank over TF-IDF sentence vectors); no model required.
+    ``sentences`` and ``word_count`` can be passed in when they are already known.
     """
-    # Very simple extractive summarization as a placeholder
-    sentences = text.split('. ')
+    if sentences is None:
+        sentences = split_sentences(text)
     if len(sentences) <= 5:
         return text
+    if word_count is None:
+        word_count = len(text.split())
     
-    # Take first two sentences and last three
-    summary = '. '.join(sentences[:2] + sentences[-3:]) + '.'
-    return f"### Document Summary ###\n\nThis is a legal document containing approximately {len(text.split())} words. {summary}"
+    summary = textrank_summary(sentences=sentences)["summary"]
+    return f"### Document Summary ###\n\nThis is a legal document containing approximately {word_count} words. {summary}"
+
+def summarize_document(document):
+    """Summarize a stored document from its precomputed sentence boundaries."""
+    return summarize_text(document.text, document.sentence_texts(), document.word_count)
 
 @app.route('/api/upload', methods=['POST'])
 def upload_document():
@@ -79,22 +135,37 @@ def upload_document():
     if not file.filename.endswith('.txt'):
         return jsonify({"error": "Only .txt files are supported"}), 400
     
-    # Read file content
-    content = file.read().decode('utf-8')
-    if not content.strip():
+    # Decode and segment the upload chunk by chunk; parties, citations, dates and the disposition
+    # are extracted from each sentence as soon as it is complete
+    extractor = FieldExtractor()
+    builder = DocumentBuilder(file.filename, on_sentence=extractor.add)
+    try:
+        document = ingest_stream(file.stream, builder)
+    except UnicodeDecodeError:
+        return jsonify({"error": "File is not valid UTF-8 text"}), 400
+    if document.word_count == 0:
         return jsonify({"error": "File is empty"}), 400
     
-    # Store document
-    document_store["content"] = content
-    document_store["filename"] = file.filename
+    # Later requests refer to the document by its id
+    document_store.add(document)
     
-    # Generate summary
-    summary = summarize_text(content)
+    # The rules answer some default questions; one batched model pass answers the rest
+    fields = track_fields(document.id, FieldIndex(extractor.fields()))
+    
+    # Summarize and register the document with the QA server concurrently. Registration answers the
+    # default questions once; later questions refer to the document by id instead of resending it.
+    # Whatever is not ready by the deadline keeps running and can be fetched from
+    # /api/documents/<id>/analysis
+    outcomes, futures = gateway.fan_out({
+        "summary": (gateway.summarize, document.text, UPLOAD_SUMMARY_MODE),
+        "qa": (gateway.register_document, document.text, fields.missing(DEFAULT_QUESTIONS)),
+    }, UPLOAD_DEADLINE_SECONDS)
+    futures["qa"].add_done_callback(lambda future: store_model_answers(fields, future))
+    track_analysis(document.id, futures)
     
     return jsonify({
-        "filename": file.filename,
-        "fileSize": len(content),
-        "summary": summary
+        **document.info(),
+        **analysis_response(document, outcomes),
     })
 
 @app.route('/api/qa', methods=['POST'])
@@ -107,40 +178,111 @@ def answer_question():
     if not question:
         return jsonify({"error": "No question provided"}), 400
     
-    # Use stored document content or specific content provided
-    context = data.get('documentContent') or document_store["content"]
-    if not context:
-        return jsonify({"error": "No document has been uploaded"}), 400
+    # A stored document by id, the content sent with the request, or the latest upload
+    document, error = resolve_document(data)
+    if error:
+        return error
     
-    # Generate answer
-    answer = generate_answer(context, question)
+    # Default questions of a stored document are answered from its field index without a model call
+    answer = document_fields(document).lookup(question) if document is not None else None
+    source = "field_index"
+    try:
+        if answer is None and document is not None:
+            # The QA server has the document from the upload; only its id is sent
+            answer, source = gateway.answer_document(question, document.text)["answer"], "model"
+        elif answer is None:
+            answer, source = gateway.answer(question, data['documentContent'])["answer"], "model"
+    except BackendError as e:
+        status = 429 if e.status == 429 else 503
+        response = jsonify({"error": f"The QA model is unavailable: {e}"})
+        if e.retry_after:
+            response.headers["Retry-After"] = str(e.retry_after)
+        return response, status
     
     return jsonify({
         "question": question,
-        "answer": answer
+        "answer": answer,
+        "source": source,
+        "documentId": document.id if document is not None else None
     })
 
-@app.route('/api/questions', methods=['GET'])
-def get_questions():
+def resolve_document(data, text_field='documentContent'):
+    """Find the document a request refers to.
+
+    Returns ``(document, None)`` for a stored document, ``(None, None)`` when
+    the request carries its own text in ``text_field``, or ``(None, error
+    response)``. Requests with neither fall back to the latest upload.
+    """
+    document_id = data.get('documentId')
+    if document_id:
+        document = document_store.get(document_id)
+        if document is None:
+            return None, (jsonify({"error": f"Unknown documentId {document_id}"}), 404)
+        return document, None
+    if data.get(text_field):
+        return None, None
+    document = document_store.latest()
+    if document is None:
+        return None, (jsonify({"error": "No document has been uploaded"}), 400)
+    return document, None
+
+@app.route('/api/summarize', methods=['POST'])
+def summarize():
+    data = request.get_json(silent=True) or {}
+    document, error = resolve_document(data, text_field='text')
+    if error:
+        return error
+    
+    if document is not None:
+        summary = summarize_document(document)
+    else:
+        summary = summarize_text(data['text'])
+    
     return jsonify({
-        "questions": [
-            "Who is the petitioner in the case?",
-            "Who is the respondent in the case?",
-            "What is the case summary?",
-            "What was the court's decision?",
-            "What legal provisions are applied?",
-            "What were the main arguments from both sides?",
-            "What is the reasoning behind the decision?",
-            "Were there any precedents cited?",
-            "Were there any dissenting opinions?",
-            "What penalties or consequences were given?",
-            "What are the implications of the case?",
-            "What facts were established in the case?",
-            "What evidence was presented?",
-            "What are the key legal issues in the case?",
-            "What is the timeline of events?"
-        ]
+        "summary": summary,
+        "documentId": document.id if document is not None else None
     })
 
+@app.route('/api/documents', methods=['GET'])
+def document_store_stats():
+    return jsonify(document_store.stats())
+
+@app.route('/api/documents/<document_id>', methods=['GET'])
+def get_document(document_id):
+    document = document_store.get(document_id)
+    if document is None:
+        return jsonify({"error": f"Unknown documentId {document_id}"}), 404
+    return jsonify(document.info())
+
+@app.route('/api/documents/<document_id>/analysis', methods=['GET'])
+def get_analysis(document_id):
+    """The model summary and default answers started at upload, finished or not."""
+    document = document_store.get(document_id)
+    with analyses_lock:
+        futures = analyses.get(document_id)
+    if document is None or futures is None:
+        return jsonify({"error": f"No analysis for documentId {document_id}"}), 404
+    outcomes = {name: outcome(future) for name, future in futures.items()}
+    return jsonify({"documentId": document_id, **analysis_response(document, outcomes)})
+
+@app.route('/api/documents/<document_id>', methods=['DELETE'])
+def delete_document(document_id):
+    if not document_store.delete(document_id):
+        return jsonify({"error": f"Unknown documentId {document_id}"}), 404
+    with analyses_lock:
+        analyses.pop(document_id, None)
+    with field_indexes_lock:
+        field_indexes.pop(document_id, None)
+    return jsonify({"deleted": document_id})
+
+@app.route('/api/gateway/stats', methods=['GET'])
+def gateway_stats():
+    """Per-backend call counts, latency and circuit breaker state."""
+    return jsonify(gateway.stats())
+
+@app.route('/api/questions', methods=['GET'])
+def get_questions():
+    return jsonify({"questions": DEFAULT_QUESTIONS})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,73 @@
+# backend/assisted.py
+"""Assisted (speculative) decoding bookkeeping.
+
+With ``generate(assistant_model=draft)`` transformers lets a small draft
+model propose a few tokens greedily, then scores all of them with a single
+decoder pass of the large model. It keeps the longest prefix the large model
+agrees with, plus the large model's own next token. Greedy output is
+therefore the same as the large model decoding alone; only the number of
+expensive forward passes changes. It takes one prompt per call and does not
+support beam search.
+
+The speed-up depends on how many drafted tokens are accepted.
+``count_forward_passes`` counts decoder passes of both models with forward
+hooks, and ``record_acceptance`` turns the counts into acceptance metrics.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from metrics import ASSISTED_ACCEPTANCE, ASSISTED_ACCEPTED_TOKENS, ASSISTED_DRAFT_TOKENS
+
+_passes = threading.local()
+
+
+def assisted_decoding_enabled():
+    """ASSISTED_DECODING=1 makes assisted decoding the default for requests that do not choose."""
+    return os.environ.get("ASSISTED_DECODING", "0") == "1"
+
+
+def _instrument_decoder(model, role):
+    """Count ``model``'s decoder forward passes under ``role`` while a counting block is active."""
+    get_decoder = getattr(model, "get_decoder", None)
+    decoder = get_decoder() if callable(get_decoder) else None
+    if decoder is None or role in getattr(decoder, "_talqs_counted", ()):
+        return
+
+    def after(module, args, output):
+        counts = getattr(_passes, "counts", None)
+        if counts is not None:
+            counts[role] += 1
+
+    decoder.register_forward_hook(after)
+    decoder._talqs_counted = getattr(decoder, "_talqs_counted", ()) + (role,)
+
+
+@contextmanager
+def count_forward_passes(model, assistant_model):
+    """Yield a dict that holds the decoder passes of ``model`` ("target") and ``assistant_model`` ("draft")
+    made by this thread inside the block. The two models must not share a decoder."""
+    _instrument_decoder(model, "target")
+    _instrument_decoder(assistant_model, "draft")
+    counts = {"target": 0, "draft": 0}
+    _passes.counts = counts
+    try:
+        yield counts
+    finally:
+        _passes.counts = None
+
+
+def record_acceptance(task, counts, new_tokens):
+    """Record drafted and accepted tokens for one assisted generate() call; returns the acceptance rate.
+
+    Each target pass yields the accepted draft tokens plus one token of its
+    own, so ``new_tokens - target passes`` tokens came from the draft model.
+    """
+    drafted = counts["draft"]
+    accepted = min(drafted, max(0, new_tokens - counts["target"]))
+    ASSISTED_DRAFT_TOKENS.inc(drafted, task=task)
+    ASSISTED_ACCEPTED_TOKENS.inc(accepted, task=task)
+    rate = accepted / drafted if drafted else 0.0
+    if drafted:
+        ASSISTED_ACCEPTANCE.observe(rate, task=task)
+    return rate
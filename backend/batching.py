@@ -0,0 +1,140 @@
+# backend/batching.py
+import asyncio
+import os
+import time
+from collections import Counter
+
+from metrics import BATCH_SIZE, QUEUE_WAIT_SECONDS
+
+
+class MicroBatcher:
+    """Collect concurrent requests into padded model batches.
+
+    Callers ``await submit(item, key)``. The first request to arrive opens a
+    collection window of ``window_ms``; everything submitted before the window
+    closes (up to ``max_batch_size`` requests) is grouped by ``key`` and each
+    group is handed to ``process_batch(key, items)`` in a worker thread, so
+    only requests with compatible generation parameters share a batch.
+    ``process_batch`` must return one result per item, in order. With an
+    ``executor`` (an InferenceExecutor) batches run in its slots instead of
+    the default thread pool.
+    """
+
+    def __init__(self, process_batch, window_ms=None, max_batch_size=None, name="batcher", executor=None):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.window_ms = float(window_ms if window_ms is not None else os.environ.get("BATCH_WINDOW_MS", 10))
+        self.max_batch_size = int(max_batch_size if max_batch_size is not None else os.environ.get("BATCH_MAX_SIZE", 8))
+        self.name = name
+
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._collecting = 0
+
+        self.requests_total = 0
+        self.batches_total = 0
+        self.batch_size_counts = Counter()
+        self.queue_wait_total = 0.0
+        self.max_queue_depth = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item, key=()):
+        """Queue ``item`` for the next batch with matching ``key`` and await its result."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((key, item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return await future
+
+    @property
+    def mean_queue_wait(self):
+        """Average seconds a request has waited for its batch to start."""
+        return self.queue_wait_total / self.requests_total if self.requests_total else 0.0
+
+    @property
+    def queue_depth(self):
+        pending = self._queue.qsize() if self._queue is not None else 0
+        return pending + self._collecting
+
+    async def _collect(self):
+        first = await self._queue.get()
+        collected = [first]
+        self._collecting = 1
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+
+        while len(collected) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                collected.append(await asyncio.wait_for(self._queue.get(), remaining))
+                self._collecting = len(collected)
+            except asyncio.TimeoutError:
+                break
+
+        return collected
+
+    async def _run(self):
+        while True:
+            collected = await self._collect()
+
+            groups = {}
+            for entry in collected:
+                groups.setdefault(entry[0], []).append(entry)
+
+            for key, entries in groups.items():
+                await self._run_group(key, entries)
+                self._collecting -= len(entries)
+
+    async def _run_group(self, key, entries):
+        # Callers that went away while queued do not need a model slot
+        entries = [entry for entry in entries if not entry[2].done()]
+        if not entries:
+            return
+
+        started = time.perf_counter()
+        for _, _, _, enqueued in entries:
+            self.queue_wait_total += started - enqueued
+            QUEUE_WAIT_SECONDS.observe(started - enqueued, batcher=self.name)
+        BATCH_SIZE.observe(len(entries), batcher=self.name)
+        self.requests_total += len(entries)
+        self.batches_total += 1
+        self.batch_size_counts[len(entries)] += 1
+
+        items = [entry[1] for entry in entries]
+        try:
+            if self.executor is not None:
+                results = await self.executor.run(self.name, self.process_batch, key, items)
+            else:
+                results = await self._loop.run_in_executor(None, self.process_batch, key, items)
+        except Exception as e:
+            for _, _, future, _ in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), result in zip(entries, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """Queue depth and batch-size statistics for tuning the window."""
+        return {
+            "name": self.name,
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "requests_total": self.requests_total,
+            "batches_total": self.batches_total,
+            "mean_batch_size": self.requests_total / self.batches_total if self.batches_total else 0.0,
+            "mean_queue_wait_ms": 1000.0 * self.mean_queue_wait,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_size_counts.items())},
+        }
@@ -0,0 +1,2 @@
+# Benchmarks for the TALQS model servers. Run from the backend/ directory,
+# e.g. ``python -m benchmarks.answer_bulk``.
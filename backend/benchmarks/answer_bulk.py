@@ -0,0 +1,91 @@
+# backend/benchmarks/answer_bulk.py
+"""Compare the batched /answer_bulk path with the old one-question-at-a-time loop.
+
+Usage (from the backend/ directory):
+
+    python -m benchmarks.answer_bulk --context-file case.txt --batch-sizes 1 4 8
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+import qa
+
+SAMPLE_CONTEXT = (
+    "The petitioner, Ramesh Kumar, filed a writ petition against the State of Maharashtra "
+    "challenging the acquisition of his agricultural land. The respondent argued that the "
+    "acquisition was for a public purpose under the Land Acquisition Act. The High Court "
+    "examined the notification, the compensation awarded and the evidence of the survey "
+    "officers. After hearing both sides, the court held that the acquisition proceedings "
+    "were vitiated because the petitioner was not given a hearing, and quashed the "
+    "notification. There were no dissenting opinions. "
+)
+
+
+def answer_sequential(questions, context):
+    """The original /answer_bulk implementation: one generate() call per question."""
+    answers = []
+    model = qa.get_model()
+    tokenizer = qa.get_tokenizer()
+    generator = getattr(model, "t5", model)
+    for question in questions:
+        input_text = f"question: {question} context: {context}"
+        input_ids = tokenizer.encode(
+            input_text, return_tensors="pt", max_length=512, truncation=True
+        ).to(qa.device)
+        with torch.no_grad():
+            output_ids = generator.generate(input_ids=input_ids, **qa.QA_GENERATION_KWARGS)
+        answers.append(tokenizer.decode(output_ids[0], skip_special_tokens=True))
+    return answers
+
+
+def time_runs(fn, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--context-file", help="Text file to use as the QA context")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    if args.context_file:
+        with open(args.context_file, encoding="utf-8") as f:
+            context = f.read()
+    else:
+        context = SAMPLE_CONTEXT * 4
+
+    questions = qa.default_questions
+
+    # Warm up once so the first measured run does not pay for lazy initialisation
+    qa.answer_questions(questions[:1], context)
+
+    baseline, baseline_times = time_runs(lambda: answer_sequential(questions, context), args.repeats)
+    baseline_median = statistics.median(baseline_times)
+    print(f"sequential loop: median {baseline_median:.3f}s over {args.repeats} runs")
+
+    for batch_size in args.batch_sizes:
+        answers, timings = time_runs(
+            lambda: qa.answer_questions(questions, context, max_batch_size=batch_size),
+            args.repeats,
+        )
+        median = statistics.median(timings)
+        matches = sum(a == b for a, b in zip(answers, baseline))
+        print(
+            f"batched (max_batch_size={batch_size}): median {median:.3f}s, "
+            f"speedup {baseline_median / median:.2f}x, "
+            f"{matches}/{len(questions)} answers identical to the loop"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# backend/benchmarks/assisted.py
+"""Compare assisted decoding (t5-small drafting for the t5-base summarizer) with plain decoding.
+
+Every document of a local corpus is summarized three ways: beam search (the
+/summarize default), plain greedy decoding, and greedy decoding assisted by
+the draft model. The report gives median/p95 latency and speed-up per mode.
+It also gives how often the assisted summary is identical to plain greedy
+(it should be, apart from floating-point ties), ROUGE agreement with the
+beam-search summaries, and the draft acceptance rate.
+
+Usage (from the backend/ directory):
+
+    python -m benchmarks.assisted --out assisted.json
+    python -m benchmarks.assisted --corpus docs.jsonl --draft t5-small --max-length 150
+"""
+import argparse
+import json
+import statistics
+import time
+
+import torch
+
+from assisted import count_forward_passes, record_acceptance
+from benchmarks.precision import DEFAULT_CORPUS, build_model, load_corpus
+from benchmarks.rouge import rouge_l, rouge_n
+from model_registry import load_tokenizer
+from server import ASSISTED_STRATEGY, SUMMARY_GENERATION_KWARGS, SUMMARY_STRATEGIES_BY_NAME
+
+MODES = ("beam", "greedy", "assisted")
+
+
+def generate_kwargs(mode, max_length, min_length):
+    base = dict(SUMMARY_GENERATION_KWARGS, max_length=max_length)
+    if mode == "beam":
+        strategy = SUMMARY_STRATEGIES_BY_NAME[f"beam{SUMMARY_GENERATION_KWARGS['num_beams']}"]
+    elif mode == "greedy":
+        strategy = SUMMARY_STRATEGIES_BY_NAME["greedy"]
+    else:
+        strategy = ASSISTED_STRATEGY
+    return dict(strategy.generate_kwargs(base, min_length), min_length=min_length)
+
+
+def run_mode(mode, model, draft, tokenizer, docs, device, max_length, min_length):
+    """Return (summaries, per-document latencies, per-document acceptance rates) for one mode."""
+    kwargs = generate_kwargs(mode, max_length, min_length)
+    summaries, latencies, acceptance = [], [], []
+    for doc in docs:
+        start = time.perf_counter()
+        inputs = tokenizer(["summarize: " + doc["text"]], return_tensors="pt", max_length=512, truncation=True)
+        with torch.no_grad():
+            if mode == "assisted":
+                with count_forward_passes(model.t5, draft) as passes:
+                    output_ids = model.t5.generate(
+                        input_ids=inputs.input_ids.to(device), attention_mask=inputs.attention_mask.to(device),
+                        assistant_model=draft, **kwargs,
+                    )
+                acceptance.append(record_acceptance("benchmark", passes, output_ids.shape[1] - 1))
+            else:
+                output_ids = model.t5.generate(
+                    input_ids=inputs.input_ids.to(device), attention_mask=inputs.attention_mask.to(device), **kwargs,
+                )
+        summaries.append(tokenizer.decode(output_ids[0], skip_special_tokens=True))
+        latencies.append(time.perf_counter() - start)
+    return summaries, latencies, acceptance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--draft", default="t5-small", help="Pretrained checkpoint used as the draft model")
+    parser.add_argument("--max-length", type=int, default=150)
+    parser.add_argument("--min-length", type=int, default=30)
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    docs = load_corpus(args.corpus)
+    tokenizer = load_tokenizer("t5-small")
+    model, _ = build_model("summarize", "fp32", device)
+    from transformers import T5ForConditionalGeneration
+    draft = T5ForConditionalGeneration.from_pretrained(args.draft).to(device).eval()
+
+    # Warm up both models so the first measured document does not pay for lazy initialisation
+    run_mode("assisted", model, draft, tokenizer, docs[:1], device, args.max_length, args.min_length)
+
+    results = {}
+    for mode in MODES:
+        summaries, latencies, acceptance = run_mode(
+            mode, model, draft, tokenizer, docs, device, args.max_length, args.min_length
+        )
+        ordered = sorted(latencies)
+        results[mode] = {
+            "summaries": summaries,
+            "latency_p50": statistics.median(latencies),
+            "latency_p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            "total_seconds": sum(latencies),
+            "acceptance_rate": statistics.mean(acceptance) if acceptance else None,
+        }
+
+    greedy, beam = results["greedy"]["summaries"], results["beam"]["summaries"]
+    report = []
+    for mode in MODES:
+        row = results[mode]
+        summaries = row.pop("summaries")
+        row.update({
+            "mode": mode,
+            "speedup_vs_beam": results["beam"]["total_seconds"] / row["total_seconds"],
+            "speedup_vs_greedy": results["greedy"]["total_seconds"] / row["total_seconds"],
+            "identical_to_greedy": sum(a == b for a, b in zip(summaries, greedy)) / len(docs),
+            "rouge1_vs_beam": statistics.mean(rouge_n(a, b, 1) for a, b in zip(summaries, beam)),
+            "rougeL_vs_beam": statistics.mean(rouge_l(a, b) for a, b in zip(summaries, beam)),
+        })
+        report.append(row)
+        acceptance = "" if row["acceptance_rate"] is None else f", acceptance {row['acceptance_rate']:.2f}"
+        print(
+            f"{mode:>8}: p50 {row['latency_p50']:.3f}s, p95 {row['latency_p95']:.3f}s, "
+            f"{row['speedup_vs_beam']:.2f}x vs beam, {row['speedup_vs_greedy']:.2f}x vs greedy, "
+            f"identical to greedy {row['identical_to_greedy']:.2f}, ROUGE-L vs beam {row['rougeL_vs_beam']:.3f}"
+            f"{acceptance}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"corpus": args.corpus, "documents": len(docs), "draft": args.draft, "results": report},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
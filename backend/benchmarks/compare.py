@@ -0,0 +1,77 @@
+# backend/benchmarks/compare.py
+"""Diff two ``benchmarks.load`` reports and flag regressions.
+
+Prints the relative change of every latency percentile, throughput and
+tokens/sec for the targets present in both reports, and exits with status
+1 when any metric got worse by more than ``--threshold`` percent (or the
+error rate went up), so CI can fail on a regression.
+
+Usage (from the backend/ directory):
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 15
+"""
+import argparse
+import json
+import sys
+
+# (label, path into a target's result, True if higher is better)
+METRICS = [
+    ("p50 ms", ("latency", "p50_ms"), False),
+    ("p95 ms", ("latency", "p95_ms"), False),
+    ("p99 ms", ("latency", "p99_ms"), False),
+    ("req/s", ("throughput_rps",), True),
+    ("tok/s", ("tokens_per_sec",), True),
+]
+
+
+def _lookup(result, path):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(baseline, candidate, threshold):
+    """Return (rows, regressions) for the targets both reports contain."""
+    rows, regressions = [], []
+    for name in sorted(set(baseline["results"]) & set(candidate["results"])):
+        before, after = baseline["results"][name], candidate["results"][name]
+        for label, path, higher_is_better in METRICS:
+            old, new = _lookup(before, path), _lookup(after, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            rows.append((name, label, old, new, change))
+            if worse > threshold:
+                regressions.append(f"{name} {label}: {old:.2f} -> {new:.2f} ({change:+.1f}%)")
+        if after["error_rate"] > before["error_rate"]:
+            regressions.append(f"{name} error rate: {before['error_rate']:.3f} -> {after['error_rate']:.3f}")
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, label, old, new, change in rows:
+        print(f"{name:>24} {label:>7}: {old:10.2f} -> {new:10.2f}  {change:+7.1f}%")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# backend/benchmarks/corpus.py
+"""Deterministic synthetic legal judgments for load testing.
+
+Documents are assembled from templated sentences (parties, courts,
+citations, procedural history, reasoning, disposition) so they look like
+the judgments TALQS is used on without shipping real case files. The same
+seed always yields the same corpus, which keeps benchmark runs comparable.
+
+Usage (from the backend/ directory):
+
+    python -m benchmarks.corpus --sizes small medium large --count 5 --out corpus.jsonl
+"""
+import argparse
+import json
+import random
+
+# Approximate length in words of each document size
+SIZES = {
+    "small": 300,
+    "medium": 2000,
+    "large": 10000,
+    "xlarge": 50000,
+}
+
+PETITIONERS = ["Ramesh Kumar", "Sunita Devi", "Arvind Mehta", "Lakshmi Narayanan", "Farhan Qureshi", "Meera Iyer"]
+RESPONDENTS = ["the State of Maharashtra", "the Union of India", "the Municipal Corporation of Delhi",
+               "Bharat Steel Ltd.", "the Regional Transport Officer", "the State of Karnataka"]
+COURTS = ["the Supreme Court of India", "the High Court of Bombay", "the High Court of Madras",
+          "the High Court of Delhi", "the High Court of Karnataka"]
+STATUTES = ["the Land Acquisition Act, 1894", "the Indian Penal Code, 1860", "the Code of Civil Procedure, 1908",
+            "the Industrial Disputes Act, 1947", "the Motor Vehicles Act, 1988", "Article 226 of the Constitution"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+
+FACT_SENTENCES = [
+    "The {petitioner} filed a petition against {respondent} before {court} on {date}.",
+    "The dispute concerns the interpretation of {statute} as applied to the facts of this case.",
+    "It was contended on behalf of the {petitioner} that the impugned order was passed without a hearing.",
+    "The learned counsel for {respondent} submitted that the proceedings were validly initiated under {statute}.",
+    "The trial court, by its judgment dated {date}, dismissed the suit for want of evidence.",
+    "The appellate authority reversed that finding and remanded the matter for fresh consideration.",
+    "Reliance was placed on {citation}, where a similar question arose for consideration.",
+    "The record shows that notice was served on the {petitioner} only after the order had been executed.",
+    "The survey report prepared on {date} was not furnished to the parties before the hearing.",
+    "Compensation of Rs. {amount} was awarded, which the {petitioner} contends is grossly inadequate.",
+]
+REASONING_SENTENCES = [
+    "We have carefully considered the submissions made on both sides and perused the record.",
+    "The principles of natural justice require that a person be heard before an adverse order is passed.",
+    "In {citation}, this Court held that a statutory power must be exercised reasonably and in good faith.",
+    "The respondent has not been able to show any material justifying the departure from the prescribed procedure.",
+    "The finding of the appellate authority is based on evidence and does not call for interference.",
+    "The provisions of {statute} must be construed strictly, as they affect the rights of citizens.",
+    "There is no merit in the contention that the petition is barred by limitation.",
+]
+DISPOSITIONS = [
+    "In the result, the appeal is allowed and the impugned order is set aside. There shall be no order as to costs.",
+    "Accordingly, the petition is dismissed. The interim order stands vacated.",
+    "The writ petition is allowed and the notification dated {date} is quashed. The respondent shall pay costs of Rs. {amount}.",
+    "The matter is remitted to the trial court for fresh disposal in accordance with law.",
+]
+
+
+def _date(rng):
+    return f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(1985, 2023)}"
+
+
+def _citation(rng):
+    return f"{rng.choice(PETITIONERS)} v. {rng.choice(RESPONDENTS)}, ({rng.randint(1970, 2022)}) {rng.randint(1, 12)} SCC {rng.randint(1, 900)}"
+
+
+def _fill(template, rng, petitioner, respondent, court):
+    return template.format(
+        petitioner="petitioner" if rng.random() < 0.5 else petitioner,
+        respondent=respondent,
+        court=court,
+        date=_date(rng),
+        statute=rng.choice(STATUTES),
+        citation=_citation(rng),
+        amount=f"{rng.randint(10, 900) * 1000:,}",
+    )
+
+
+def generate_document(words, seed=0):
+    """A judgment of roughly ``words`` words, identical for identical ``seed``."""
+    rng = random.Random(seed)
+    petitioner, respondent, court = rng.choice(PETITIONERS), rng.choice(RESPONDENTS), rng.choice(COURTS)
+    parts = [f"IN {court.upper()}", f"{petitioner} ... Petitioner versus {respondent} ... Respondent", "JUDGMENT"]
+    count = sum(len(p.split()) for p in parts)
+
+    paragraph = 1
+    while count < words:
+        templates = FACT_SENTENCES if paragraph % 3 else REASONING_SENTENCES
+        sentences = [_fill(rng.choice(templates), rng, petitioner, respondent, court) for _ in range(rng.randint(3, 6))]
+        text = f"{paragraph}. " + " ".join(sentences)
+        parts.append(text)
+        count += len(text.split())
+        paragraph += 1
+
+    parts.append(_fill(rng.choice(DISPOSITIONS), rng, petitioner, respondent, court))
+    return "\n\n".join(parts)
+
+
+def generate_corpus(sizes, count=3, seed=0):
+    """``count`` documents per size, as ``{"id", "size", "words", "text"}`` dicts."""
+    docs = []
+    for size in sizes:
+        for i in range(count):
+            text = generate_document(SIZES[size], seed=seed * 1000 + SIZES[size] + i)
+            docs.append({"id": f"{size}-{i}", "size": size, "words": len(text.split()), "text": text})
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium", "large"])
+    parser.add_argument("--count", type=int, default=3, help="Documents per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for doc in generate_corpus(args.sizes, args.count, args.seed):
+            f.write(json.dumps(doc) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# backend/benchmarks/load.py
+"""Closed- and open-loop HTTP load generator for the TALQS endpoints.
+
+Closed loop: ``--concurrency`` clients each send their next request as
+soon as the previous one returns, which measures peak throughput.
+Open loop: requests arrive as a Poisson process at ``--rate`` per second
+whatever the server is doing, and latency is measured from the scheduled
+arrival time, so queueing delay is not hidden when the server falls behind.
+
+Each run reports p50/p95/p99 latency (overall and per document size),
+throughput, generated tokens/sec (whitespace tokens of the returned
+answer/summary) and errors, and can write them as JSON for
+``benchmarks.compare``.
+
+Usage (from the backend/ directory):
+
+    # Start the servers on stub models and benchmark everything (CI)
+    python -m benchmarks.load --targets all --launch --stub --duration 20 --out bench.json
+
+    # Against servers that are already running
+    python -m benchmarks.load --targets qa.answer --mode open --rate 5 --sizes medium large
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from benchmarks.corpus import SIZES, generate_corpus
+from benchmarks.targets import BACKEND_DIR, TARGETS
+
+
+class Sample:
+    __slots__ = ("latency", "ok", "status", "tokens", "size")
+
+    def __init__(self, latency, ok, status, tokens, size):
+        self.latency = latency
+        self.ok = ok
+        self.status = status
+        self.tokens = tokens
+        self.size = size
+
+
+def call(target, base_url, doc, i, timeout, scheduled=None, unique=False):
+    """Send one request; latency runs from ``scheduled`` (open loop) or from now.
+
+    ``unique`` makes every request's text distinct so the result caches never hit.
+    """
+    if unique:
+        doc = dict(doc, text=f"Request {i}. {doc['text']}")
+    start = scheduled if scheduled is not None else time.perf_counter()
+    status, tokens = 0, 0
+    try:
+        with urlopen(target.request(base_url, doc, i), timeout=timeout) as response:
+            status = response.status
+            tokens = len(target.output(json.load(response)).split())
+    except HTTPError as e:
+        status = e.code
+    except (URLError, OSError, ValueError, KeyError):
+        pass
+    return Sample(time.perf_counter() - start, status == 200, status, tokens, doc["size"])
+
+
+def closed_loop(target, base_url, docs, concurrency, duration, max_requests, timeout, unique=False):
+    samples, lock = [], threading.Lock()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            if max_requests and i >= max_requests:
+                return
+            sample = call(target, base_url, docs[i % len(docs)], i, timeout, unique=unique)
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def open_loop(target, base_url, docs, rate, duration, max_requests, timeout, max_in_flight, seed=0, unique=False):
+    rng = random.Random(seed)
+    futures = []
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i in itertools.count():
+            next_arrival += rng.expovariate(rate)
+            if next_arrival - start > duration or (max_requests and i >= max_requests):
+                break
+            time.sleep(max(0.0, next_arrival - time.perf_counter()))
+            futures.append(pool.submit(call, target, base_url, docs[i % len(docs)], i, timeout, next_arrival, unique))
+    return [future.result() for future in futures]
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "count": len(ordered),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1] if ordered else None),
+    }
+
+
+def summarize(samples, elapsed):
+    ok = [s for s in samples if s.ok]
+    statuses = {}
+    for s in samples:
+        statuses[str(s.status)] = statuses.get(str(s.status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+        "statuses": statuses,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "tokens_per_sec": sum(s.tokens for s in ok) / elapsed if elapsed else 0.0,
+        "latency": latency_summary([s.latency for s in ok]),
+        "by_size": {
+            size: latency_summary([s.latency for s in ok if s.size == size])
+            for size in sorted({s.size for s in ok}, key=list(SIZES).index)
+        },
+    }
+
+
+def launch(target, stub, timeout):
+    """Start the server script behind ``target`` and wait until its readiness path answers 200."""
+    env = dict(os.environ)
+    if stub:
+        env["TALQS_STUB_MODELS"] = "1"
+    process = subprocess.Popen(
+        [sys.executable, target.script], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{target.script} exited with code {process.returncode}")
+        try:
+            with urlopen(target.base_url + target.ready_path, timeout=2) as response:
+                if response.status == 200:
+                    return process
+        except (URLError, OSError):
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{target.script} was not ready after {timeout:.0f}s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_target(target, base_url, docs, args):
+    if args.warmup:
+        for i in range(args.warmup):
+            call(target, base_url, docs[i % len(docs)], i, args.timeout)
+
+    start = time.perf_counter()
+    if args.mode == "closed":
+        samples = closed_loop(target, base_url, docs, args.concurrency, args.duration, args.requests, args.timeout,
+                              args.unique)
+    else:
+        samples = open_loop(target, base_url, docs, args.rate, args.duration, args.requests, args.timeout,
+                            args.max_in_flight, args.seed, args.unique)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=["all"], help=f"'all' or any of: {', '.join(TARGETS)}")
+    parser.add_argument("--base-url", help="Override the target's default http://127.0.0.1:<port>")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, default=2.0, help="Open-loop arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per target")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0: duration only)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests sent first")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--count", type=int, default=3, help="Documents per size")
+    parser.add_argument("--corpus", help="JSONL corpus from benchmarks.corpus instead of generating one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique", action="store_true", help="Make every request distinct to bypass result caches")
+    parser.add_argument("--launch", action="store_true", help="Start each target's server for its run")
+    parser.add_argument("--stub", action="store_true", help="With --launch: run servers on stub models")
+    parser.add_argument("--launch-timeout", type=float, default=600.0)
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    names = list(TARGETS) if "all" in args.targets else args.targets
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            docs = [json.loads(line) for line in f if line.strip()]
+        for doc in docs:
+            doc.setdefault("size", "custom")
+    else:
+        docs = generate_corpus(args.sizes, args.count, args.seed)
+
+    results = {}
+    for name in names:
+        target = TARGETS[name]
+        process = launch(target, args.stub, args.launch_timeout) if args.launch else None
+        try:
+            result = run_target(target, args.base_url or target.base_url, docs, args)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+        results[name] = result
+        latency = result["latency"]
+        print(
+            f"{name:>24}: {result['requests']} requests, {result['errors']} errors, "
+            f"{result['throughput_rps']:.2f} req/s, {result['tokens_per_sec']:.1f} tok/s, "
+            f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms"
+        )
+
+    if args.out:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+            "config": {k: v for k, v in vars(args).items() if k != "out"},
+            "documents": len(docs),
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# backend/benchmarks/precision.py
+"""Compare fp32, dynamic int8 and bf16 inference on a local fixture corpus.
+
+For every precision mode the model is loaded from scratch and run over the
+corpus. The report gives load time, model footprint (bytes held by weights),
+median/p95 latency per document and agreement with the fp32 outputs
+(exact match, ROUGE-1 and ROUGE-L F1).
+
+Usage (from the backend/ directory):
+
+    python -m benchmarks.precision --task summarize --out precision.json
+    python -m benchmarks.precision --task qa --modes fp32 int8
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+
+from benchmarks.rouge import rouge_l, rouge_n
+from generation import generate_batched
+from model_registry import ModelRegistry, load_custom_model, load_tokenizer
+from precision import PRECISION_MODES, apply_precision
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "legal_corpus.jsonl")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def model_bytes(model):
+    """Bytes held by the model's weights, including packed int8 Linear parameters."""
+    def size(value):
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    # Tied weights appear under several names but share one storage
+    seen, total = set(), 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            if value.data_ptr() in seen:
+                continue
+            seen.add(value.data_ptr())
+        total += size(value)
+    return total
+
+
+def build_model(task, mode, device):
+    os.environ["INFERENCE_PRECISION"] = mode
+    reg = ModelRegistry()
+    if task == "qa":
+        from qa import CustomEncoderDecoderQA, QA_MODEL_PATH
+        factory = lambda **kwargs: CustomEncoderDecoderQA(pretrained_model_name="t5-small", **kwargs)
+        path = QA_MODEL_PATH
+    else:
+        from server import CustomEncoderDecoderSummarizer, SUMMARY_MODEL_PATH
+        factory = lambda **kwargs: CustomEncoderDecoderSummarizer(pretrained_model_name="t5-base", **kwargs)
+        path = SUMMARY_MODEL_PATH
+
+    if os.path.exists(path):
+        model = load_custom_model(reg, task, factory, path, device)
+        return model, reg.info(task)["precision"]
+
+    print(f"{path} not found, benchmarking the pretrained checkpoint")
+    model = factory().to(device).eval()
+    return apply_precision(model, device, mode)
+
+
+def run_task(task, model, tokenizer, docs, device):
+    """Return (outputs, per-document latencies) for the corpus."""
+    outputs, latencies = [], []
+    for doc in docs:
+        start = time.perf_counter()
+        if task == "qa":
+            from qa import QA_GENERATION_KWARGS, default_questions
+            prompts = [f"question: {q} context: {doc['text']}" for q in default_questions]
+            result = generate_batched(model.t5, tokenizer, prompts, device, max_batch_size=len(prompts), **QA_GENERATION_KWARGS)
+        else:
+            from server import SUMMARY_GENERATION_KWARGS
+            result = generate_batched(
+                model.t5, tokenizer, ["summarize: " + doc["text"]], device,
+                max_length=150, min_length=30, **SUMMARY_GENERATION_KWARGS,
+            )
+        latencies.append(time.perf_counter() - start)
+        outputs.extend(result)
+    return outputs, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--task", choices=["summarize", "qa"], default="summarize")
+    parser.add_argument("--modes", nargs="+", choices=PRECISION_MODES, default=list(PRECISION_MODES))
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--out", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    docs = load_corpus(args.corpus)
+    tokenizer = load_tokenizer("t5-small")
+
+    # fp32 is always run first: it is the reference for the agreement metrics
+    modes = ["fp32"] + [mode for mode in args.modes if mode != "fp32"]
+    reference = None
+    report = []
+    for mode in modes:
+        start = time.perf_counter()
+        model, applied = build_model(args.task, mode, device)
+        load_seconds = time.perf_counter() - start
+        if applied != mode:
+            print(f"{mode} is not available here, skipping")
+            continue
+
+        outputs, latencies = run_task(args.task, model, tokenizer, docs, device)
+        if reference is None:
+            reference = outputs
+
+        ordered = sorted(latencies)
+        row = {
+            "mode": mode,
+            "load_seconds": load_seconds,
+            "model_mb": model_bytes(model) / 2 ** 20,
+            "latency_p50": statistics.median(latencies),
+            "latency_p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            "exact_match": sum(a == b for a, b in zip(outputs, reference)) / len(outputs),
+            "rouge1": statistics.mean(rouge_n(a, b, 1) for a, b in zip(outputs, reference)),
+            "rougeL": statistics.mean(rouge_l(a, b) for a, b in zip(outputs, reference)),
+        }
+        report.append(row)
+        print(
+            f"{mode:>5}: load {row['load_seconds']:.2f}s, {row['model_mb']:.1f} MB, "
+            f"p50 {row['latency_p50']:.3f}s, p95 {row['latency_p95']:.3f}s, "
+            f"exact {row['exact_match']:.2f}, ROUGE-1 {row['rouge1']:.3f}, ROUGE-L {row['rougeL']:.3f}"
+        )
+        del model
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"task": args.task, "corpus": args.corpus, "documents": len(docs), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# backend/benchmarks/rouge.py
+"""Small, dependency-free ROUGE implementation for comparing model outputs."""
+import re
+from collections import Counter
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def _f1(overlap, predicted, reference):
+    if overlap == 0 or predicted == 0 or reference == 0:
+        return 0.0
+    precision = overlap / predicted
+    recall = overlap / reference
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(prediction, reference, n=1):
+    pred = tokenize(prediction)
+    ref = tokenize(reference)
+    pred_ngrams = Counter(tuple(pred[i:i + n]) for i in range(len(pred) - n + 1))
+    ref_ngrams = Counter(tuple(ref[i:i + n]) for i in range(len(ref) - n + 1))
+    overlap = sum((pred_ngrams & ref_ngrams).values())
+    return _f1(overlap, sum(pred_ngrams.values()), sum(ref_ngrams.values()))
+
+
+def rouge_l(prediction, reference):
+    pred = tokenize(prediction)
+    ref = tokenize(reference)
+    if not pred or not ref:
+        return 1.0 if pred == ref else 0.0
+    # Longest common subsequence, one row at a time
+    previous = [0] * (len(ref) + 1)
+    for p in pred:
+        current = [0]
+        for j, r in enumerate(ref):
+            current.append(previous[j] + 1 if p == r else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(pred), len(ref))
@@ -0,0 +1,98 @@
+# backend/benchmarks/targets.py
+"""The endpoints the load benchmark can drive.
+
+Each target knows which server script serves it (so ``--launch`` can start
+it, optionally on stub models), how to turn a corpus document into a
+request, and where the generated text sits in the response, which is what
+the tokens/sec figure counts.
+"""
+import json
+import os
+import uuid
+from urllib.request import Request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "Who is the petitioner in the case?",
+    "Who is the respondent in the case?",
+    "What was the court's decision?",
+    "What evidence was presented?",
+]
+
+
+class Target:
+    def __init__(self, name, script, port, ready_path, path, build, output):
+        self.name = name
+        self.script = script
+        self.port = port
+        self.ready_path = ready_path
+        self.path = path
+        self.build = build
+        self.output = output
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def request(self, base_url, doc, i):
+        """The ``urllib`` request for the ``i``-th call with corpus document ``doc``."""
+        body, content_type = self.build(doc, i)
+        return Request(base_url + self.path, data=body, headers={"Content-Type": content_type}, method="POST")
+
+
+def _json(payload):
+    return json.dumps(payload).encode("utf-8"), "application/json"
+
+
+def _multipart_file(filename, text):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+        f"{text}\r\n--{boundary}--\r\n"
+    ).encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+TARGETS = {
+    target.name: target
+    for target in [
+        Target(
+            "qa.answer", "qa_server.py", 8000, "/ready", "/answer",
+            lambda doc, i: _json({"context": doc["text"], "question": QUESTIONS[i % len(QUESTIONS)]}),
+            lambda r: r["answer"],
+        ),
+        Target(
+            "qa.answer_bulk", "qa_server.py", 8000, "/ready", "/answer_bulk",
+            lambda doc, i: _json({"text": doc["text"]}),
+            lambda r: " ".join(item["answer"] for item in r["qa_results"]),
+        ),
+        Target(
+            "summarize", "server.py", 8001, "/ready", "/summarize",
+            lambda doc, i: _json({"text": doc["text"]}),
+            lambda r: r["summary"],
+        ),
+        Target(
+            "summarize.hierarchical", "server.py", 8001, "/ready", "/summarize",
+            lambda doc, i: _json({"text": doc["text"], "mode": "hierarchical"}),
+            lambda r: r["summary"],
+        ),
+        Target(
+            "flask.summarize", os.path.join("summarization", "server.py"), 5000, "/health", "/summarize",
+            lambda doc, i: _json({"text": doc["text"]}),
+            lambda r: r["summary"],
+        ),
+        Target(
+            "app.upload", "app.py", 5000, "/api/questions", "/api/upload",
+            lambda doc, i: _multipart_file(f"{doc['id']}.txt", doc["text"]),
+            lambda r: r["summary"],
+        ),
+        Target(
+            "app.qa", "app.py", 5000, "/api/questions", "/api/qa",
+            lambda doc, i: _json({"question": QUESTIONS[i % len(QUESTIONS)], "documentContent": doc["text"]}),
+            lambda r: r["answer"],
+        ),
+    ]
+}
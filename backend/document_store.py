@@ -0,0 +1,226 @@
+# backend/document_store.py
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+# Sentence boundary: terminal punctuation followed by whitespace, or a blank line (headings, party blocks)
+SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)|\n[ \t]*\n")
+
+# A period after these does not end a sentence ("Rs. 5,000", "Ramesh v. State", "Sec. 4")
+ABBREVIATIONS = frozenset(
+    "rs v vs no nos mr mrs ms dr ltd co pvt art arts sec secs s ss cl para paras j jj hon'ble st ed vol p pp viz etc i.e e.g"
+    .split()
+)
+
+_ARRAYS = ("sentences",)
+
+
+def sentence_spans(text, start=0):
+    """(start, end) character offsets of the sentences in ``text``, shifted by ``start``."""
+    spans, begin = [], 0
+    for match in SENTENCE_END.finditer(text):
+        if not is_boundary(text, match):
+            continue
+        end = match.end()
+        if text[begin:end].strip():
+            spans.append(_strip_span(text, begin, end))
+        begin = end
+    if text[begin:].strip():
+        spans.append(_strip_span(text, begin, len(text)))
+    return [(s + start, e + start) for s, e in spans]
+
+
+def is_boundary(text, match):
+    """False for a SENTENCE_END match that is a single period after a known abbreviation or an initial."""
+    if match.group() != ".":
+        return True
+    start = match.start()
+    word_start = start
+    while word_start > 0 and not text[word_start - 1].isspace() and text[word_start - 1] not in "(\"'":
+        word_start -= 1
+    word = text[word_start:start].lower()
+    return not (word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()))
+
+
+def _strip_span(text, begin, end):
+    while begin < end and text[begin].isspace():
+        begin += 1
+    while end > begin and text[end - 1].isspace():
+        end -= 1
+    return begin, end
+
+
+class Document:
+    """An uploaded document, segmented into sentences once at upload time.
+
+    ``sentences`` holds the (start, end) character offsets of each sentence
+    in ``text``; for a document reloaded from disk it is a read-only memory
+    map. Tokenization is left to the model servers, whose tokenizers differ
+    per model.
+    """
+
+    def __init__(self, doc_id, filename, text, sentences, created=None):
+        self.id = doc_id
+        self.filename = filename
+        self.text = text
+        self.sentences = sentences
+        self.created = created or time.time()
+        self.word_count = len(text.split())
+
+    @property
+    def nbytes(self):
+        """Memory held by this document; memory-mapped arrays live in the page cache and are not counted."""
+        arrays = [getattr(self, name) for name in _ARRAYS]
+        return len(self.text.encode("utf-8")) + sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+
+    def sentence_texts(self):
+        return [self.text[start:end] for start, end in self.sentences]
+
+    def info(self):
+        return {
+            "documentId": self.id,
+            "filename": self.filename,
+            "fileSize": len(self.text),
+            "words": self.word_count,
+            "sentences": len(self.sentences),
+            "created": self.created,
+        }
+
+
+def build_document(text, filename="", doc_id=None):
+    """Segment ``text`` once, producing a ``Document`` ready for the store."""
+    sentences = np.asarray(sentence_spans(text), dtype=np.int64).reshape(-1, 2)
+    return Document(doc_id or uuid.uuid4().hex, filename, text, sentences)
+
+
+def valid_id(doc_id):
+    """Ids are uuid4 hex strings; anything else is rejected before it can reach a file path."""
+    return isinstance(doc_id, str) and re.fullmatch(r"[0-9a-f]{32}", doc_id) is not None
+
+
+class DocumentStore:
+    """Uploaded documents keyed by id, bounded by a memory budget.
+
+    The least recently used documents beyond ``max_bytes``
+    (DOCUMENT_STORE_MAX_BYTES) are spilled to ``spill_dir``
+    (DOCUMENT_STORE_DIR): the text as a file and the arrays as ``.npy``
+    files that are memory-mapped when the document is used again. Spilled
+    documents found in ``spill_dir`` at startup are available again, so
+    ids stay valid across restarts.
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None):
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.environ.get("DOCUMENT_STORE_MAX_BYTES", 256 * 1024 * 1024))
+        self.spill_dir = spill_dir or os.environ.get("DOCUMENT_STORE_DIR") or os.path.join(tempfile.gettempdir(), "talqs-documents")
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._latest = None
+
+        self.spills = 0
+        self.reloads = 0
+
+    def _path(self, doc_id):
+        return os.path.join(self.spill_dir, doc_id)
+
+    def _is_spilled(self, doc_id):
+        return os.path.exists(os.path.join(self._path(doc_id), "meta.json"))
+
+    def add(self, document):
+        with self._lock:
+            self._remember(document)
+            self._latest = document.id
+        return document
+
+    def get(self, doc_id):
+        """The document with ``doc_id``, reloading it from disk if it was spilled; None if unknown."""
+        if not valid_id(doc_id):
+            return None
+        with self._lock:
+            document = self._memory.get(doc_id)
+            if document is not None:
+                self._memory.move_to_end(doc_id)
+                return document
+            if not self._is_spilled(doc_id):
+                return None
+            document = self._load(doc_id)
+            self.reloads += 1
+            self._remember(document)
+            return document
+
+    def latest(self):
+        """The most recently uploaded document, for clients that do not send a documentId."""
+        with self._lock:
+            return self.get(self._latest) if self._latest else None
+
+    def delete(self, doc_id):
+        if not valid_id(doc_id):
+            return False
+        with self._lock:
+            document = self._memory.pop(doc_id, None)
+            if document is not None:
+                self._bytes -= document.nbytes
+            spilled = self._is_spilled(doc_id)
+            if spilled:
+                shutil.rmtree(self._path(doc_id), ignore_errors=True)
+            if self._latest == doc_id:
+                self._latest = None
+            return document is not None or spilled
+
+    def _remember(self, document):
+        previous = self._memory.pop(document.id, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._memory[document.id] = document
+        self._bytes += document.nbytes
+        while self._bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._spill(evicted)
+
+    def _spill(self, document):
+        if self._is_spilled(document.id):
+            return
+        path = self._path(document.id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "text.txt"), "w", encoding="utf-8") as f:
+            f.write(document.text)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(document, name))
+        # meta.json is written last: its presence marks a complete spill
+        meta = {"filename": document.filename, "created": document.created}
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self.spills += 1
+
+    def _load(self, doc_id):
+        path = self._path(doc_id)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "text.txt"), encoding="utf-8") as f:
+            text = f.read()
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        return Document(doc_id, meta["filename"], text, created=meta["created"], **arrays)
+
+    def stats(self):
+        with self._lock:
+            spilled = sum(1 for name in os.listdir(self.spill_dir) if self._is_spilled(name))
+            return {
+                "documents_in_memory": len(self._memory),
+                "bytes_in_memory": self._bytes,
+                "max_bytes": self.max_bytes,
+                "documents_on_disk": spilled,
+                "spill_dir": self.spill_dir,
+                "spills": self.spills,
+                "reloads": self.reloads,
+            }
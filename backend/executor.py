@@ -0,0 +1,221 @@
+# backend/executor.py
+"""A bounded executor for model calls.
+
+Every generate() call used to run in the default thread pool, so under load
+dozens ran at once, each starting torch's full intra-op pool. On a 16-core
+box that oversubscription makes throughput fall as load rises.
+``InferenceExecutor`` runs model calls on a fixed number of slot threads.
+torch's intra-op thread count is process-global, so it is set once, when
+the process-wide executor is created, to the cores divided by the slots:
+with every slot busy the process uses about as many threads as there are
+cores. It applies to all torch work in the process, not only to the
+slots. Requests are admitted up to a
+bound per task; past it they are rejected at once with
+``InferenceSaturated``, which the servers turn into 429 with Retry-After
+instead of letting clients time out.
+
+Calls are queued per task ("answer", "summarize", ...). A free slot takes
+the next call from the waiting task that has used the least slot time, so
+when the QA and summarization servers share one process (model_host.py)
+a burst of long summaries cannot starve short answers.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import torch
+from fastapi.responses import JSONResponse
+
+from metrics import INFERENCE_BUSY_SLOTS, INFERENCE_REJECTIONS, INFERENCE_WAIT_SECONDS
+
+# Model calls that may run at the same time in one server process
+INFERENCE_SLOTS = int(os.environ.get("INFERENCE_SLOTS", 2))
+# Torch intra-op threads of the process, sized per slot; 0 splits the cores evenly between the slots
+INFERENCE_THREADS_PER_SLOT = int(os.environ.get("INFERENCE_THREADS_PER_SLOT", 0))
+# Requests per task admitted (running or waiting for a slot) before new ones are rejected with 429
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", 32))
+
+
+class InferenceSaturated(Exception):
+    """Raised by ``InferenceExecutor.admit`` when the admission queue is full."""
+
+    def __init__(self, task, retry_after):
+        super().__init__(f"The {task} model is at capacity; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def saturated_response(request, exc):
+    """FastAPI exception handler for InferenceSaturated."""
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+
+class InferenceExecutor:
+    """Runs model calls on ``slots`` threads, sized for ``threads_per_slot`` torch threads each.
+
+    Request handlers wrap the work they do for one request in
+    ``admit(task)`` and hand each model call to ``run(task, fn, ...)``
+    (async) or ``call(task, fn, ...)`` (blocking). Background work such as
+    the job workers uses ``call`` without ``admit``: it waits for a slot
+    instead of being rejected.
+    """
+
+    def __init__(self, name, slots=None, threads_per_slot=None, max_pending=None):
+        self.name = name
+        self.slots = max(1, slots or INFERENCE_SLOTS)
+        cores = os.cpu_count() or 1
+        self.threads_per_slot = max(1, threads_per_slot or INFERENCE_THREADS_PER_SLOT or cores // self.slots)
+        self.max_pending = max(1, max_pending or INFERENCE_MAX_PENDING)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._threads = []
+        self._busy = 0
+        # Per task: queued calls, slot seconds used, requests admitted and not yet finished
+        self._lanes = {}
+        self._served = {}
+        self._pending = {}
+
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self.completed = Counter()
+        self.wait_seconds_total = 0.0
+        self.service_seconds = Counter()
+
+    def _ensure_slots(self):
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.slots):
+                thread = threading.Thread(target=self._slot, name=f"{self.name}-slot-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _next_call(self):
+        with self._ready:
+            while True:
+                waiting = [task for task, lane in self._lanes.items() if lane]
+                if waiting:
+                    break
+                self._ready.wait()
+            task = min(waiting, key=self._served.__getitem__)
+            self._busy += 1
+            return task, self._lanes[task].popleft()
+
+    def _slot(self):
+        while True:
+            task, (future, fn, args, kwargs, enqueued) = self._next_call()
+            started = time.perf_counter()
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._busy -= 1
+                continue
+            INFERENCE_WAIT_SECONDS.observe(started - enqueued, executor=self.name, task=task)
+            INFERENCE_BUSY_SLOTS.inc(executor=self.name)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                INFERENCE_BUSY_SLOTS.dec(executor=self.name)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._busy -= 1
+                    self._served[task] += elapsed
+                    self.completed[task] += 1
+                    self.service_seconds[task] += elapsed
+                    self.wait_seconds_total += started - enqueued
+
+    def submit(self, task, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` under ``task``; returns a concurrent.futures.Future."""
+        self._ensure_slots()
+        future = Future()
+        with self._ready:
+            lane = self._lanes.setdefault(task, deque())
+            if not lane:
+                # A task that was idle starts level with the waiting ones instead of cashing in saved-up credit
+                waiting = [self._served[other] for other, queued in self._lanes.items() if queued]
+                self._served[task] = max([self._served.get(task, 0.0)] + ([min(waiting)] if waiting else []))
+            lane.append((future, fn, args, kwargs, time.perf_counter()))
+            self._ready.notify()
+        return future
+
+    async def run(self, task, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(task, fn, *args, **kwargs))
+
+    def call(self, task, fn, *args, **kwargs):
+        return self.submit(task, fn, *args, **kwargs).result()
+
+    @contextmanager
+    def admit(self, task):
+        """Count one ``task`` request against its admission bound for the duration of the block."""
+        with self._lock:
+            pending = self._pending.get(task, 0)
+            if pending >= self.max_pending:
+                self.rejected[task] += 1
+                retry_after = self._retry_after(task, pending)
+            else:
+                self._pending[task] = pending + 1
+                self.admitted[task] += 1
+                retry_after = None
+        if retry_after is not None:
+            INFERENCE_REJECTIONS.inc(executor=self.name, task=task)
+            raise InferenceSaturated(task, retry_after)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending[task] -= 1
+
+    def _retry_after(self, task, pending):
+        # Roughly the time for the task's admitted requests to drain through the slots
+        completed = self.completed[task]
+        per_call = self.service_seconds[task] / completed if completed else 1.0
+        return max(1, math.ceil(per_call * pending / self.slots))
+
+    def stats(self):
+        with self._lock:
+            completed = sum(self.completed.values())
+            return {
+                "name": self.name,
+                "slots": self.slots,
+                "threads_per_slot": self.threads_per_slot,
+                "max_pending_per_task": self.max_pending,
+                "busy_slots": self._busy,
+                "mean_wait_seconds": self.wait_seconds_total / completed if completed else 0.0,
+                "tasks": {
+                    task: {
+                        "pending": self._pending.get(task, 0),
+                        "queued_calls": len(self._lanes.get(task, ())),
+                        "admitted": self.admitted[task],
+                        "rejected": self.rejected[task],
+                        "completed_calls": self.completed[task],
+                        "slot_seconds": self.service_seconds[task],
+                    }
+                    for task in sorted(set(self._lanes) | set(self._pending))
+                },
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_executor():
+    """The process-wide executor, so servers loaded into one process share one CPU budget.
+
+    Creating it sets torch's (process-global) intra-op thread count to its
+    ``threads_per_slot``, once, before any model call runs.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = InferenceExecutor("inference")
+            torch.set_num_threads(_shared.threads_per_slot)
+        return _shared
@@ -0,0 +1,279 @@
+# backend/field_index.py
+"""Per-document index of the fields the default questions ask about.
+
+Most QA traffic is the fixed list of default questions. Several of them ask
+for facts that follow fixed patterns in a judgment: the parties in the
+caption, the cases and provisions cited, dated events, and the
+disposition. ``extract_fields`` finds these with compiled regular
+expressions in one pass over the sentences. ``FieldIndex`` turns them into
+ready answers keyed by the normalized question, so answering a default
+question is a single dict lookup. The questions rules cannot answer (the
+summary, the evidence, the legal issues, ...) are answered by one batched
+model pass when a document is registered with the QA server (POST
+/documents, at upload) and added with ``add_answers``, both there and in
+the gateway. Only free-form questions reach the model afterwards.
+"""
+import re
+from datetime import date
+
+from document_store import sentence_spans
+
+# A party or case name: capitalised words, allowing "of", "and", "&" between them, at most eight words.
+# Words that usually start the next sentence end the name, since captions are often not punctuated,
+# and so does a line break: the line above a caption is usually the court's name.
+_NOT_NAME = r"(?!(?:The|On|In|For|This|That|It|He|She|They|We|Learned|Heard|Per)\b)"
+_NAME = rf"{_NOT_NAME}[A-Z][\w.&'-]*(?:[^\S\n]+(?:{_NOT_NAME}[A-Z][\w.&'-]*|of|and|&)){{0,7}}"
+_VERSUS = r"\s+(?:v\.?|vs\.?|versus)\s+"
+CAPTION = re.compile(rf"(?<![\w.])({_NAME}){_VERSUS}({_NAME})")
+
+_PETITIONER_ROLES = "petitioner|appellant|plaintiff|applicant|complainant"
+_RESPONDENT_ROLES = "respondent|defendant|appellee|opposite party|accused"
+# Only the role words are matched case-insensitively; names must stay capitalised
+_ROLE = rf"(?i:({_PETITIONER_ROLES}|{_RESPONDENT_ROLES})s?(?:\s+no\.\s*\d+)?)"
+# "the petitioner, John Smith" / "Petitioner: John Smith"
+ROLE_BEFORE_NAME = re.compile(rf"\b(?i:the\s+)?{_ROLE}\s*[:,-]?\s+({_NAME})")
+# "John Smith (the petitioner)" / "ABC Corporation, the respondent,"
+NAME_BEFORE_ROLE = re.compile(rf"({_NAME})(?:,\s*|\s*\()(?i:the|hereinafter)\s+{_ROLE}\b")
+
+REPORTER_CITATION = re.compile(
+    r"\(\d{4}\)\s+\d+\s+SCC\s+\d+"                       # (2017) 10 SCC 1
+    r"|AIR\s+\d{4}\s+[A-Z][A-Za-z]*\s+\d+"              # AIR 1973 SC 1461
+    r"|\[\d{4}\]\s+(?:\d+\s+)?[A-Z][A-Za-z]+\s+\d+"     # [2019] UKSC 41
+    r"|\d+\s+U\.\s?S\.\s+\d+"                           # 450 U.S. 175
+    r"|\d+\s+S\.\s?Ct\.\s+\d+"                          # 134 S. Ct. 2347
+    r"|\d+\s+F\.\s?(?:2d|3d|4th|Supp\.(?:\s?[23]d)?)\s+\d+"  # 56 F.3d 1538
+)
+PROVISION = re.compile(
+    r"\b(?:Sections?|Articles?|Rules?|Order)\s+[0-9IVXLC]+[A-Z]?(?:\(\w+\))*"
+    r"(?:(?:,|\s+and|\s+to|\s+read\s+with)\s+[0-9IVXLC]+[A-Z]?(?:\(\w+\))*)*"
+    r"(?:\s+of\s+the\s+(?:[A-Z][\w()]*,?\s+){1,6}?(?:Act|Code|Constitution|Rules)(?:,?\s+\d{4})?)?"
+    r"|(?:\d+\s+U\.S\.C\.\s+)?§+\s*\d+[\w.()-]*"
+)
+
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+           "november", "december"]
+_MONTH = r"(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?"
+DAY_MONTH_YEAR = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?{_MONTH},?\s+(\d{{4}})\b", re.IGNORECASE)
+MONTH_DAY_YEAR = re.compile(rf"\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.IGNORECASE)
+# Numeric dates are read day first, as in the Indian and English judgments this service sees
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{4})\b")
+
+DISPOSITION = re.compile(
+    r"\b(?:appeals?|petitions?|writ\s+petitions?|suits?|applications?|revisions?|case)\b[^.;]{0,80}?"
+    r"\b(?:is|are|stands?|shall\s+stand|be|must\s+be)\s+(?:hereby\s+|accordingly\s+|therefore\s+)?"
+    r"(partly\s+allowed|allowed|dismissed|disposed\s+of|granted|rejected|quashed|set\s+aside)"
+    r"|\b(?:we|this\s+court|the\s+court)\s+(?:hereby\s+|therefore\s+|accordingly\s+)?"
+    r"(affirm|reverse|remand|vacate|uphold|set\s+aside|quash|dismiss|allow)"
+    r"|\b(?:judgment|order|decree|conviction|sentence|decision)\b[^.;]{0,80}?\b(?:is|are|stands?|be)\s+"
+    r"(?:hereby\s+)?(affirmed|reversed|upheld|set\s+aside|quashed|vacated|modified|remanded)",
+    re.IGNORECASE,
+)
+DISSENT = re.compile(r"\bdissent(?:s|ed|ing)?\b", re.IGNORECASE)
+
+# Entries kept per list field, and the longest quoted sentence
+MAX_ITEMS = 10
+MAX_QUOTE_CHARS = 300
+
+
+def normalize_question(question):
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+# Default questions (of app.py and qa_server.py) that the extracted fields answer
+FIELD_QUESTIONS = {
+    normalize_question(question): field
+    for question, field in [
+        ("Who is the petitioner in the case?", "petitioner"),
+        ("Who is the respondent in the case?", "respondent"),
+        ("What was the court's decision?", "disposition"),
+        ("What legal provisions are applied?", "provisions"),
+        ("Were there any precedents cited?", "precedents"),
+        ("Were there any dissenting opinions?", "dissent"),
+        ("What is the timeline of events?", "timeline"),
+        ("What was the timeline of events?", "timeline"),
+    ]
+}
+
+# Other wordings of the questions above, matched against the normalized question as a whole
+_IN_THE_CASE = r"(?: in (?:the|this) (?:case|matter|appeal|petition|suit))?"
+_PROCEEDING = r"(?:the |this )?(?:case|suit|petition|writ petition|appeal|complaint)"
+FIELD_WORDINGS = [(re.compile(pattern), field) for pattern, field in [
+    (rf"^(?:who (?:is|was|are|were) )?(?:the )?(?:{_PETITIONER_ROLES})s?{_IN_THE_CASE}$", "petitioner"),
+    (rf"^who (?:filed|brought|instituted|initiated) {_PROCEEDING}$", "petitioner"),
+    (rf"^(?:who (?:is|was|are|were) )?(?:the )?(?:{_RESPONDENT_ROLES})s?{_IN_THE_CASE}$", "respondent"),
+    (rf"^(?:who (?:is|was) {_PROCEEDING} (?:filed |brought )?against|against whom (?:is|was) {_PROCEEDING} filed)$",
+     "respondent"),
+    (r"^(?:what (?:is|was) the (?:court s |final )?(?:decision|verdict|outcome|judgment|ruling|result)"
+     rf"(?: of the court)?{_IN_THE_CASE}|how (?:was|did) the court (?:decide|rule)(?: the case)?)$", "disposition"),
+    (r"^(?:which|what) (?:laws|sections|provisions|legal provisions|statutes) (?:were|are) "
+     r"(?:applied|invoked|cited|relied on|relied upon)$", "provisions"),
+    (r"^(?:which|what) (?:cases|precedents|judgments|authorities) (?:were|are) "
+     r"(?:cited|relied on|relied upon|referred to)$", "precedents"),
+    (r"^(?:did any judges? dissent|(?:is|was|were) there (?:a |any )?(?:dissent|dissents|dissenting opinions?))$",
+     "dissent"),
+    (r"^what (?:is|was) the (?:timeline|chronology|sequence) of (?:the )?events$", "timeline"),
+]]
+
+
+def question_field(question):
+    """The field ``question`` asks for, when it is one of the default questions or a wording of one."""
+    normalized = normalize_question(question)
+    field = FIELD_QUESTIONS.get(normalized)
+    if field is None:
+        field = next((field for pattern, field in FIELD_WORDINGS if pattern.match(normalized)), None)
+    return field
+
+
+def _unique(items):
+    return list(dict.fromkeys(item for item in items if item))[:MAX_ITEMS]
+
+
+def _clean_name(name):
+    return re.sub(r"\s+", " ", name).strip(" ,.-")
+
+
+def _quote(sentence):
+    sentence = " ".join(sentence.split())
+    return sentence if len(sentence) <= MAX_QUOTE_CHARS else sentence[:MAX_QUOTE_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+def _month(name):
+    name = name.lower().rstrip(".")
+    return next(n for n, month in enumerate(_MONTHS, 1) if month.startswith(name[:3]))
+
+
+def _dates(sentence):
+    found = []
+    for match in DAY_MONTH_YEAR.finditer(sentence):
+        found.append((match.start(), int(match.group(3)), _month(match.group(2)), int(match.group(1))))
+    for match in MONTH_DAY_YEAR.finditer(sentence):
+        found.append((match.start(), int(match.group(3)), _month(match.group(1)), int(match.group(2))))
+    for match in NUMERIC_DATE.finditer(sentence):
+        found.append((match.start(), int(match.group(3)), int(match.group(2)), int(match.group(1))))
+    dates = []
+    for _, year, month, day in sorted(found):
+        try:
+            dates.append(date(year, month, day))
+        except ValueError:
+            continue
+    return dates
+
+
+class FieldExtractor:
+    """Collects the fields sentence by sentence, so extraction can run while a document is read."""
+
+    def __init__(self):
+        self.petitioners, self.respondents, self.cases, self.reporters = [], [], [], []
+        self.provisions, self.events, self.dissents = [], [], []
+        self.disposition = None
+        self.caption = None
+
+    def add(self, sentence):
+        for match in CAPTION.finditer(sentence):
+            parties = (_clean_name(match.group(1)), _clean_name(match.group(2)))
+            if self.caption is None:
+                # The first "X v. Y" names the case itself; later ones are precedents
+                self.caption = parties
+            elif parties != self.caption:
+                self.cases.append(f"{parties[0]} v. {parties[1]}")
+        for match in ROLE_BEFORE_NAME.finditer(sentence):
+            role, name = match.group(1).lower(), _clean_name(match.group(2))
+            (self.petitioners if role in _PETITIONER_ROLES else self.respondents).append(name)
+        for match in NAME_BEFORE_ROLE.finditer(sentence):
+            name, role = _clean_name(match.group(1)), match.group(2).lower()
+            (self.petitioners if role in _PETITIONER_ROLES else self.respondents).append(name)
+        self.reporters.extend(match.group(0) for match in REPORTER_CITATION.finditer(sentence))
+        self.provisions.extend(" ".join(match.group(0).split()) for match in PROVISION.finditer(sentence))
+        for day in _dates(sentence):
+            self.events.append((day, _quote(sentence)))
+        match = DISPOSITION.search(sentence)
+        if match:
+            # The last one wins: the operative order closes a judgment
+            outcome = next(group for group in match.groups() if group)
+            self.disposition = {"outcome": " ".join(outcome.lower().split()), "sentence": _quote(sentence)}
+        if DISSENT.search(sentence):
+            self.dissents.append(_quote(sentence))
+
+    def fields(self):
+        petitioners, respondents = list(self.petitioners), list(self.respondents)
+        if self.caption is not None:
+            petitioners.insert(0, self.caption[0])
+            respondents.insert(0, self.caption[1])
+        events = sorted(self.events, key=lambda event: event[0])
+        return {
+            "petitioner": _unique(petitioners),
+            "respondent": _unique(respondents),
+            "precedents": _unique(self.cases + self.reporters),
+            "provisions": _unique(self.provisions),
+            "timeline": [{"date": day.isoformat(), "event": sentence} for day, sentence in events[:MAX_ITEMS]],
+            "disposition": self.disposition,
+            "dissent": _unique(self.dissents),
+        }
+
+
+def extract_fields(text, sentences=None):
+    """Parties, citations, provisions, dated events, disposition and dissent found in ``text``.
+
+    ``sentences`` can be passed in when the document was already segmented.
+    """
+    if sentences is None:
+        sentences = [text[start:end] for start, end in sentence_spans(text)]
+    extractor = FieldExtractor()
+    for sentence in sentences:
+        extractor.add(sentence)
+    return extractor.fields()
+
+
+def _join(items):
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def _render(field, value):
+    """The answer to a default question from its field, or None when the rules found nothing."""
+    if field in ("petitioner", "respondent"):
+        if not value:
+            return None
+        return f"The {field} is {_join(value)}." if len(value) == 1 else f"The {field}s are {_join(value)}."
+    if field == "disposition":
+        return value["sentence"] if value else None
+    if field == "precedents":
+        return f"The judgment cites {_join(value)}." if value else None
+    if field == "provisions":
+        return f"The court refers to {_join(value)}." if value else None
+    if field == "timeline":
+        return "; ".join(f"{event['date']}: {event['event']}" for event in value) if value else None
+    if field == "dissent":
+        return " ".join(value) if value else "No dissenting opinion is mentioned in the judgment."
+    return None
+
+
+class FieldIndex:
+    """Answers to the default questions of one document, keyed by normalized question."""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._answers = {}
+        for question, field in FIELD_QUESTIONS.items():
+            answer = _render(field, fields.get(field))
+            if answer is not None:
+                self._answers[question] = answer
+        self.rule_answers = len(self._answers)
+
+    @classmethod
+    def from_text(cls, text, sentences=None):
+        return cls(extract_fields(text, sentences))
+
+    def lookup(self, question):
+        return self._answers.get(normalize_question(question))
+
+    def missing(self, questions):
+        """The ``questions`` this index cannot answer yet, for the model to answer once."""
+        return [question for question in questions if normalize_question(question) not in self._answers]
+
+    def add_answers(self, answers):
+        """Store model answers ({question: answer}) so later lookups need no model call."""
+        for question, answer in answers.items():
+            self._answers.setdefault(normalize_question(question), answer)
+
+    def to_dict(self):
+        return {"fields": self.fields, "answered_questions": len(self._answers), "rule_answers": self.rule_answers}
@@ -0,0 +1,265 @@
+# backend/gateway.py
+"""HTTP client side of app.py: calls the FastAPI model servers.
+
+Each backend has one ``requests.Session`` with a pooled, keep-alive
+connection adapter, its own connect/read timeouts and a circuit breaker.
+After ``GATEWAY_CIRCUIT_FAILURES`` consecutive failures the breaker opens,
+and calls fail at once with ``BackendUnavailable`` instead of tying up a
+gateway thread for the full timeout. After ``GATEWAY_CIRCUIT_RESET_SECONDS``
+one trial call is let through, and a success closes the breaker again.
+
+``Gateway.fan_out`` starts several backend calls at once and returns what
+has finished by a deadline. Calls still running are left to finish in the
+background.
+
+To try it locally, run the model servers with stub models:
+
+    TALQS_STUB_MODELS=1 python server.py
+    TALQS_STUB_MODELS=1 python qa_server.py
+    python app.py
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retrieval import context_hash
+
+SUMMARY_SERVER_URL = os.environ.get("SUMMARY_SERVER_URL", "http://localhost:8001")
+QA_SERVER_URL = os.environ.get("QA_SERVER_URL", "http://localhost:8000")
+# Read timeouts per backend; summarizing a whole document takes longer than answering
+SUMMARY_TIMEOUT_SECONDS = float(os.environ.get("GATEWAY_SUMMARY_TIMEOUT", 120))
+QA_TIMEOUT_SECONDS = float(os.environ.get("GATEWAY_QA_TIMEOUT", 60))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("GATEWAY_CONNECT_TIMEOUT", 2))
+# Keep-alive connections kept open per backend
+POOL_SIZE = int(os.environ.get("GATEWAY_POOL_SIZE", 16))
+CIRCUIT_FAILURES = int(os.environ.get("GATEWAY_CIRCUIT_FAILURES", 5))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("GATEWAY_CIRCUIT_RESET_SECONDS", 30))
+# Threads running backend calls for all requests together
+GATEWAY_WORKERS = int(os.environ.get("GATEWAY_WORKERS", 32))
+
+
+class BackendError(Exception):
+    """A backend call failed, timed out or returned an error status."""
+
+    def __init__(self, backend, message, status=None, retry_after=None):
+        super().__init__(f"{backend}: {message}")
+        self.backend = backend
+        self.status = status
+        self.retry_after = retry_after
+
+
+class BackendUnavailable(BackendError):
+    """The backend's circuit breaker is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=CIRCUIT_FAILURES, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one trial call at a time."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected_total += 1
+            return False
+
+    def retry_after(self):
+        if self._opened_at is None:
+            return 0
+        return max(1, int(self.reset_seconds - (time.monotonic() - self._opened_at)) + 1)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.opened_total += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class Backend:
+    """One model server: a pooled session, timeouts and a circuit breaker."""
+
+    def __init__(self, name, base_url, read_timeout, connect_timeout=CONNECT_TIMEOUT_SECONDS, pool_size=POOL_SIZE,
+                 breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        # No automatic retries: a slow backend should trip the breaker, not be hit again
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.calls = 0
+        self.failures = 0
+        self.seconds_total = 0.0
+
+    def post(self, path, payload, timeout=None):
+        """POST ``payload`` as JSON and return the decoded response body."""
+        if not self.breaker.allow():
+            raise BackendUnavailable(self.name, "circuit open", retry_after=self.breaker.retry_after())
+
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            return self._send(path, payload, timeout)
+        except BackendError:
+            raise
+        except Exception as e:
+            # Anything else (a body that is not JSON, ...) is a fault too, and must end a half-open trial
+            self._failed()
+            raise BackendError(self.name, f"invalid response: {e}") from e
+        finally:
+            self.seconds_total += time.perf_counter() - start
+
+    def _send(self, path, payload, timeout):
+        """The call itself; every BackendError it raises has been recorded on the breaker."""
+        try:
+            response = self.session.post(self.base_url + path, json=payload, timeout=timeout or self.timeout)
+        except requests.RequestException as e:
+            self._failed()
+            raise BackendError(self.name, str(e)) from e
+
+        if response.status_code == 429:
+            # Backpressure from a healthy server, not a fault: the breaker stays as it is
+            self.breaker.record_success()
+            raise BackendError(self.name, "at capacity", status=429,
+                               retry_after=response.headers.get("Retry-After"))
+        if response.status_code >= 500:
+            self._failed()
+            raise BackendError(self.name, f"HTTP {response.status_code}", status=response.status_code)
+        if response.status_code >= 400:
+            # The request was wrong, the backend is fine
+            self.breaker.record_success()
+            raise BackendError(self.name, f"HTTP {response.status_code}: {response.text[:200]}",
+                               status=response.status_code)
+        body = response.json()
+        self.breaker.record_success()
+        return body
+
+    def _failed(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def stats(self):
+        return {
+            "url": self.base_url,
+            "timeout_seconds": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "calls": self.calls,
+            "failures": self.failures,
+            "mean_seconds": self.seconds_total / self.calls if self.calls else 0.0,
+            "circuit": self.breaker.stats(),
+        }
+
+
+class Gateway:
+    """The summarization and QA backends plus a shared thread pool for concurrent calls."""
+
+    def __init__(self, summary_url=SUMMARY_SERVER_URL, qa_url=QA_SERVER_URL, workers=GATEWAY_WORKERS):
+        self.summary = Backend("summarize", summary_url, SUMMARY_TIMEOUT_SECONDS)
+        self.qa = Backend("qa", qa_url, QA_TIMEOUT_SECONDS)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gateway")
+
+    def summarize(self, text, mode="truncate"):
+        return self.summary.post("/summarize", {"text": text, "mode": mode})
+
+    def answer(self, question, context):
+        return self.qa.post("/answer", {"question": question, "context": context})
+
+    def register_document(self, text, questions=None):
+        """Register ``text`` with the QA server and answer ``questions`` (default: its default questions) once."""
+        payload = {"text": text}
+        if questions is not None:
+            payload["questions"] = questions
+        return self.qa.post("/documents", payload)
+
+    def answer_document(self, question, text):
+        """Ask about a registered document by id; a server that no longer has it gets the text again."""
+        payload = {"question": question, "document_id": context_hash(text)}
+        try:
+            return self.qa.post("/answer", payload)
+        except BackendError as e:
+            if e.status != 404:
+                raise
+        self.register_document(text, [])
+        return self.qa.post("/answer", payload)
+
+    def answer_bulk(self, text, questions=None):
+        payload = {"text": text}
+        if questions is not None:
+            payload["questions"] = questions
+        return self.qa.post("/answer_bulk", payload)
+
+    def submit(self, fn, *args):
+        return self._pool.submit(fn, *args)
+
+    def fan_out(self, calls, timeout):
+        """Start ``calls`` ({name: (fn, *args)}) concurrently and wait up to ``timeout`` seconds.
+
+        Returns ``(outcomes, futures)``. ``outcomes`` has one entry per call:
+        {"status": "ok", "result": ...}, {"status": "error", "error": ...} or
+        {"status": "pending"}. ``futures`` lets the caller pick up the
+        pending ones later.
+        """
+        futures = {name: self._pool.submit(*call) for name, call in calls.items()}
+        wait(futures.values(), timeout=max(0.0, timeout))
+        return {name: outcome(future) for name, future in futures.items()}, futures
+
+    def stats(self):
+        return {"summarize": self.summary.stats(), "qa": self.qa.stats()}
+
+
+def outcome(future):
+    """The JSON-friendly state of a fan_out future."""
+    if not future.done():
+        return {"status": "pending"}
+    try:
+        return {"status": "ok", "result": future.result()}
+    except BackendUnavailable as e:
+        return {"status": "unavailable", "error": str(e), "retryAfter": e.retry_after}
+    except BackendError as e:
+        return {"status": "error", "error": str(e), "retryAfter": e.retry_after}
+    except Exception as e:
+        return {"status": "error", "error": str(e), "retryAfter": None}
@@ -0,0 +1,83 @@
+# backend/generation.py
+import time
+from contextlib import nullcontext
+
+import torch
+from transformers import StoppingCriteriaList
+
+import adaptive
+from assisted import count_forward_passes, record_acceptance
+from metrics import DEADLINE_STOPS, GenerationStages, maybe_profile
+
+
+def generate_batched(model, tokenizer, prompts, device, max_batch_size=8, max_input_length=512, task="generate",
+                     deadlines=None, **generate_kwargs):
+    """Run ``model.generate`` over many prompts in padded batches.
+
+    Prompts are grouped by length before batching so that each padded
+    tensor wastes as little compute as possible, and the decoded outputs
+    are returned in the same order as ``prompts``. Stage timings and token
+    counts are recorded under ``task`` in the metrics registry, and the
+    time per decoding step feeds the adaptive strategy estimates.
+
+    ``deadlines`` optionally holds one time.monotonic() deadline (or None)
+    per prompt; generation for a prompt stops once its deadline passes.
+    With an ``assistant_model`` (assisted decoding) prompts are decoded one
+    at a time and the draft acceptance rate is recorded.
+    """
+    if not prompts:
+        return []
+
+    assistant_model = generate_kwargs.get("assistant_model")
+    # transformers' assisted generation takes a single prompt per call
+    max_batch_size = 1 if assistant_model is not None else max(1, int(max_batch_size))
+    order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+    outputs = [None] * len(prompts)
+
+    stages = GenerationStages(task, model)
+    num_beams = generate_kwargs.get("num_beams", 1)
+
+    for start in range(0, len(order), max_batch_size):
+        batch_indices = order[start:start + max_batch_size]
+        with stages.stage("tokenize"):
+            inputs = tokenizer(
+                [prompts[i] for i in batch_indices],
+                return_tensors="pt",
+                padding=True,
+                max_length=max_input_length,
+                truncation=True,
+            )
+        stages.record_inputs(inputs.attention_mask, max_input_length)
+
+        kwargs = dict(generate_kwargs)
+        batch_deadlines = [deadlines[i] for i in batch_indices] if deadlines else None
+        if batch_deadlines and any(d is not None for d in batch_deadlines):
+            kwargs["stopping_criteria"] = StoppingCriteriaList([adaptive.DeadlineCriteria(batch_deadlines)])
+
+        counting = count_forward_passes(model, assistant_model) if assistant_model is not None else nullcontext()
+        started = time.perf_counter()
+        with maybe_profile(task), stages.generate(), counting as passes, torch.no_grad():
+            output_ids = model.generate(
+                input_ids=inputs.input_ids.to(device),
+                attention_mask=inputs.attention_mask.to(device),
+                **kwargs,
+            )
+        if passes is not None:
+            record_acceptance(task, passes, output_ids.shape[1] - 1)
+        else:
+            # Assisted steps are cheaper than plain ones and would skew the deadline estimates
+            adaptive.timer.record(task, time.perf_counter() - started, output_ids.shape[1] - 1,
+                                  len(batch_indices) * num_beams)
+        stages.record_outputs(output_ids, tokenizer.pad_token_id)
+        if batch_deadlines:
+            now = time.monotonic()
+            stopped = sum(1 for d in batch_deadlines if d is not None and now >= d)
+            if stopped:
+                DEADLINE_STOPS.inc(stopped, task=task)
+
+        with stages.stage("detokenize"):
+            decoded = tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        for index, text in zip(batch_indices, decoded):
+            outputs[index] = text
+
+    return outputs
@@ -0,0 +1,160 @@
+# backend/hierarchical.py
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# Leave room for the "summarize: " prefix and the end-of-sequence token in a 512-token window
+DEFAULT_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 500))
+DEFAULT_MAX_MODEL_CALLS = int(os.environ.get("SUMMARY_MAX_MODEL_CALLS", 32))
+DEFAULT_BATCH_SIZE = int(os.environ.get("SUMMARY_CHUNK_BATCH_SIZE", 4))
+
+
+def default_workers():
+    """How many chunk batches can run side by side without oversubscribing the CPU."""
+    configured = os.environ.get("SUMMARY_MAP_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) // max(1, torch.get_num_threads()))
+
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+def chunk_text(text, tokenizer, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split ``text`` into sentence-aligned chunks of at most ``max_tokens`` tokens.
+
+    Sentences are tokenized in one batch call. A single sentence longer than
+    the limit is cut on word boundaries so no chunk is silently truncated.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+
+    chunks = []
+    current, current_tokens = [], 0
+    for sentence, length in zip(sentences, lengths):
+        if length > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_sentence(sentence, length, max_tokens))
+            continue
+        if current and current_tokens + length > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += length
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _split_long_sentence(sentence, length, max_tokens):
+    # Approximate the token budget per word from the sentence's own ratio
+    words = sentence.split()
+    words_per_chunk = max(1, int(len(words) * max_tokens / length))
+    return [" ".join(words[i:i + words_per_chunk]) for i in range(0, len(words), words_per_chunk)]
+
+
+def _evenly_spaced(items, count):
+    """Pick ``count`` items spread across the whole list, keeping their order."""
+    if count >= len(items):
+        return items
+    if count <= 1:
+        return items[:1]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+def hierarchical_summarize(
+    text,
+    tokenizer,
+    summarize_batch,
+    chunk_tokens=DEFAULT_CHUNK_TOKENS,
+    max_model_calls=DEFAULT_MAX_MODEL_CALLS,
+    batch_size=DEFAULT_BATCH_SIZE,
+    workers=None,
+):
+    """Map-reduce summarization for documents longer than the model's input window.
+
+    ``summarize_batch(texts)`` must return one summary per input text. The
+    document is split into token-aware chunks that are summarized in
+    batches (several batches at once when ``workers`` > 1); the joined
+    partial summaries are then re-chunked and summarized again until they
+    fit in a single chunk. ``max_model_calls`` caps the total number of
+    chunk summarizations; when a level would exceed it, an evenly spaced
+    subset of its chunks is used and the rest are reported as skipped. If
+    the budget runs out before the partial summaries fit in one chunk, they
+    are returned joined in document order.
+    """
+    workers = workers or default_workers()
+    stages = []
+    model_calls = 0
+    chunks_skipped = 0
+
+    start = time.perf_counter()
+    chunks = chunk_text(text, tokenizer, chunk_tokens)
+    stages.append({"stage": "chunk", "level": 0, "seconds": time.perf_counter() - start})
+    chunk_count = len(chunks)
+
+    if not chunks:
+        return {"summary": "", "chunk_count": 0, "model_calls": 0, "chunks_skipped": 0, "stages": stages}
+
+    level = 0
+    summary = None
+    while summary is None:
+        # Keep one call in reserve for the final pass over the joined summaries
+        budget = max_model_calls - model_calls - (0 if len(chunks) == 1 else 1)
+        if budget <= 0:
+            summary = " ".join(chunks)
+            break
+        if len(chunks) > budget:
+            chunks_skipped += len(chunks) - budget
+            chunks = _evenly_spaced(chunks, budget)
+
+        start = time.perf_counter()
+        partials = _summarize_chunks(chunks, summarize_batch, batch_size, workers)
+        model_calls += len(chunks)
+        stages.append({
+            "stage": "map" if level == 0 else "reduce",
+            "level": level,
+            "inputs": len(chunks),
+            "seconds": time.perf_counter() - start,
+        })
+
+        if len(partials) == 1:
+            summary = partials[0]
+            break
+
+        level += 1
+        start = time.perf_counter()
+        chunks = chunk_text(" ".join(partials), tokenizer, chunk_tokens)
+        stages.append({"stage": "chunk", "level": level, "seconds": time.perf_counter() - start})
+
+    return {
+        "summary": summary,
+        "chunk_count": chunk_count,
+        "model_calls": model_calls,
+        "chunks_skipped": chunks_skipped,
+        "stages": stages,
+    }
+
+
+def _summarize_chunks(chunks, summarize_batch, batch_size, workers):
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    if workers > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = list(pool.map(summarize_batch, batches))
+    else:
+        results = [summarize_batch(batch) for batch in batches]
+    return [summary for batch in results for summary in batch]
@@ -0,0 +1,167 @@
+# backend/incremental.py
+import hashlib
+import os
+import time
+
+from hierarchical import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_MAX_MODEL_CALLS,
+    _evenly_spaced,
+    _split_long_sentence,
+    _summarize_chunks,
+    default_workers,
+    split_sentences,
+)
+from result_cache import make_key, normalize_text
+
+# A chunk ends after a sentence whose hash is divisible by this, so chunks average about this many sentences
+CDC_AVERAGE_SENTENCES = int(os.environ.get("SUMMARY_CDC_AVERAGE_SENTENCES", 8))
+# Content-defined boundaries are ignored until a chunk holds this fraction of the token limit
+CDC_MIN_FILL = float(os.environ.get("SUMMARY_CDC_MIN_FILL", 0.25))
+
+
+def _is_boundary(sentence):
+    digest = hashlib.sha1(normalize_text(sentence).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % CDC_AVERAGE_SENTENCES == 0
+
+
+def content_defined_chunks(text, tokenizer, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split ``text`` into sentence-aligned chunks whose boundaries depend only on nearby content.
+
+    Unlike chunk_text, which fills every chunk up to ``max_tokens`` so that
+    one inserted sentence shifts every later boundary, a chunk here ends
+    after a sentence whose hash marks it as a boundary. An edit therefore
+    changes the chunk it falls in, and at most its neighbour, while the
+    chunks before and after keep their exact text. Chunks never exceed
+    ``max_tokens``.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+    min_tokens = int(max_tokens * CDC_MIN_FILL)
+
+    chunks = []
+    current, current_tokens = [], 0
+    for sentence, length in zip(sentences, lengths):
+        if length > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_sentence(sentence, length, max_tokens))
+            continue
+        if current and current_tokens + length > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += length
+        if current_tokens >= min_tokens and _is_boundary(sentence):
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def incremental_summarize(
+    text,
+    tokenizer,
+    summarize_batch,
+    cache,
+    model_id,
+    params=None,
+    chunk_tokens=DEFAULT_CHUNK_TOKENS,
+    max_model_calls=DEFAULT_MAX_MODEL_CALLS,
+    batch_size=DEFAULT_BATCH_SIZE,
+    workers=None,
+):
+    """Summarize a document, reusing stored summaries of the chunks an earlier version already had.
+
+    Works level by level like hierarchical_summarize, but every level is
+    split with content_defined_chunks. Each chunk summary is stored in
+    ``cache`` (a ResultCache) under the hash of the chunk text, ``model_id``
+    and ``params``, so only new or edited chunks reach ``summarize_batch``.
+    An edit usually changes one chunk per level, and an unchanged document
+    needs no model call at all.
+
+    Returns the summary and the number of first-level chunks reused and
+    recomputed, along with model calls, skipped chunks and per-stage
+    timings. ``max_model_calls`` caps the chunks actually summarized in the
+    same way as for hierarchical_summarize.
+    """
+    workers = workers or default_workers()
+    stages = []
+    model_calls = 0
+    chunks_skipped = 0
+    chunk_count = None
+    reused = recomputed = 0
+
+    level = 0
+    summary = None
+    while summary is None:
+        start = time.perf_counter()
+        chunks = content_defined_chunks(text, tokenizer, chunk_tokens)
+        stages.append({"stage": "chunk", "level": level, "seconds": time.perf_counter() - start})
+        if not chunks:
+            summary = ""
+            break
+
+        keys = [make_key(chunk, "summarize:chunk", model_id, params) for chunk in chunks]
+        partials = [cache.get(key) for key in keys]
+        missing = [i for i, partial in enumerate(partials) if partial is None]
+        level_reused = len(chunks) - len(missing)
+        if chunk_count is None:
+            chunk_count, reused = len(chunks), level_reused
+
+        # Keep one call in reserve for the final pass over the joined summaries
+        budget = max_model_calls - model_calls - (0 if len(chunks) == 1 else 1)
+        if budget <= 0 and missing:
+            summary = " ".join(partial if partial is not None else chunk for partial, chunk in zip(partials, chunks))
+            break
+        if len(missing) > budget:
+            kept = set(_evenly_spaced(missing, budget))
+            chunks_skipped += len(missing) - len(kept)
+            missing = [i for i in missing if i in kept]
+
+        start = time.perf_counter()
+        if missing:
+            summaries = _summarize_chunks([chunks[i] for i in missing], summarize_batch, batch_size, workers)
+            for index, partial in zip(missing, summaries):
+                partials[index] = partial
+                cache.put(keys[index], partial, model_id)
+        model_calls += len(missing)
+        if level == 0:
+            recomputed = len(missing)
+        stages.append({
+            "stage": "map" if level == 0 else "reduce",
+            "level": level,
+            "inputs": len(missing),
+            "reused": level_reused,
+            "seconds": time.perf_counter() - start,
+        })
+
+        partials = [partial for partial in partials if partial is not None]
+        if len(partials) == 1:
+            summary = partials[0]
+            break
+
+        joined = " ".join(partials)
+        if len(joined) >= len(text):
+            # Summaries that no longer shrink the text would never converge to one chunk
+            summary = joined
+            break
+        level += 1
+        text = joined
+
+    return {
+        "summary": summary,
+        "chunk_count": chunk_count or 0,
+        "chunks_reused": reused,
+        "chunks_recomputed": recomputed,
+        "model_calls": model_calls,
+        "chunks_skipped": chunks_skipped,
+        "stages": stages,
+    }
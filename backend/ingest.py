@@ -0,0 +1,136 @@
+# backend/ingest.py
+import codecs
+import os
+import uuid
+from array import array
+
+import numpy as np
+
+from document_store import SENTENCE_END, Document, is_boundary
+
+# Bytes read from an upload per step
+INGEST_CHUNK_BYTES = int(os.environ.get("INGEST_CHUNK_BYTES", 64 * 1024))
+
+# Text without sentence punctuation is cut at whitespace once the pending sentence grows past this
+MAX_SENTENCE_CHARS = int(os.environ.get("INGEST_MAX_SENTENCE_CHARS", 20000))
+
+
+class SentenceSplitter:
+    """Incremental sentence segmentation over text that arrives in pieces.
+
+    ``feed`` returns the (start, end, text) of every sentence completed by
+    the new piece; only the unfinished last sentence is kept. A boundary
+    at the very end of the pending text is not trusted until more text
+    arrives, since "Rs." or "..." may continue in the next piece.
+    """
+
+    def __init__(self, max_sentence_chars=MAX_SENTENCE_CHARS):
+        self.max_sentence_chars = max_sentence_chars
+        self._pending = ""
+        self._offset = 0
+
+    def feed(self, piece):
+        self._pending += piece
+        return self._split(final=False)
+
+    def finish(self):
+        return self._split(final=True)
+
+    def _split(self, final):
+        sentences, begin = [], 0
+        for match in SENTENCE_END.finditer(self._pending):
+            if not final and match.end() == len(self._pending):
+                break
+            if not is_boundary(self._pending, match):
+                continue
+            self._emit(sentences, begin, match.end())
+            begin = match.end()
+
+        if final:
+            self._emit(sentences, begin, len(self._pending))
+            begin = len(self._pending)
+        elif len(self._pending) - begin > self.max_sentence_chars:
+            cut = self._pending.rfind(" ", begin, len(self._pending) - 1)
+            if cut > begin:
+                self._emit(sentences, begin, cut)
+                begin = cut
+
+        self._pending = self._pending[begin:]
+        self._offset += begin
+        return sentences
+
+    def _emit(self, sentences, begin, end):
+        while begin < end and self._pending[begin].isspace():
+            begin += 1
+        while end > begin and self._pending[end - 1].isspace():
+            end -= 1
+        if begin < end:
+            sentences.append((self._offset + begin, self._offset + end, self._pending[begin:end]))
+
+
+class DocumentBuilder:
+    """Builds a ``Document`` from text pieces as they arrive.
+
+    Every completed sentence is recorded and added to the running word
+    count. The ``on_sentence(text)`` callback lets per-sentence work start
+    while the upload is still being read. Apart from the document text
+    itself, memory use is bounded by the piece size.
+    """
+
+    def __init__(self, filename="", on_sentence=None):
+        self.filename = filename
+        self.on_sentence = on_sentence
+
+        self._splitter = SentenceSplitter()
+        self._pieces = []
+        # A compact typed buffer: a list of Python ints costs ~36 bytes per offset
+        self._sentences = array("q")
+
+        self.chars = 0
+        self.word_count = 0
+
+    def feed(self, piece):
+        if not piece:
+            return
+        self._pieces.append(piece)
+        self.chars += len(piece)
+        for sentence in self._splitter.feed(piece):
+            self._add_sentence(*sentence)
+
+    def _add_sentence(self, start, end, text):
+        self._sentences.extend((start, end))
+        self.word_count += len(text.split())
+        if self.on_sentence is not None:
+            self.on_sentence(text)
+
+    def finish(self, doc_id=None):
+        """Flush the last sentence and return the ``Document``."""
+        for sentence in self._splitter.finish():
+            self._add_sentence(*sentence)
+
+        text = "".join(self._pieces)
+        self._pieces = [text]
+        # The offsets share memory with the typed buffer instead of copying it
+        return Document(
+            doc_id or uuid.uuid4().hex,
+            self.filename,
+            text,
+            np.frombuffer(self._sentences, dtype=np.int64).reshape(-1, 2),
+        )
+
+
+def ingest_stream(stream, builder, chunk_bytes=INGEST_CHUNK_BYTES, encoding="utf-8"):
+    """Read a binary stream in ``chunk_bytes`` steps into ``builder`` and return the finished document.
+
+    Multi-byte characters split across reads are handled by an incremental
+    decoder; invalid UTF-8 raises ``UnicodeDecodeError`` as a full decode would.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+        builder.feed(decoder.decode(data))
+    builder.feed(decoder.decode(b"", final=True))
+    return builder.finish()
+
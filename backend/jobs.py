@@ -0,0 +1,398 @@
+# backend/jobs.py
+"""Asynchronous jobs over many documents, persisted in sqlite.
+
+A job is a list of documents plus the parameters of one task (summarize,
+answer_bulk, ...). ``JobStore`` keeps jobs and one row per document in a
+local sqlite file under JOBS_DIR, so finished results survive a restart and
+unfinished documents are picked up again. ``JobQueue`` runs background
+threads that claim pending documents in batches. A batch may span several
+jobs with the same task and parameters, so the task handler can send them
+through the model together. ``job_router`` exposes submit, progress,
+result-download and cancel endpoints as a FastAPI ``APIRouter``.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Documents claimed per handler call; they may come from several jobs with the same task
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", 8))
+
+# Background threads draining the queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+
+# Seconds an idle worker sleeps before looking for new work
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 0.5))
+
+# Upper bound on documents in one submitted job
+JOB_MAX_DOCUMENTS = int(os.environ.get("JOB_MAX_DOCUMENTS", 10000))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    document_id TEXT,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_by_status ON items (status, job_id, idx);
+"""
+
+# Item states; a job is "done" once none of its items is pending or running
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+def default_db_path(name):
+    directory = os.environ.get("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "talqs-jobs")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.sqlite3")
+
+
+class JobStore:
+    """Jobs and their documents in one sqlite file, shared by the request handlers and the workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self.recovered = self._recover()
+
+    def _recover(self):
+        """Documents that were running when the process stopped go back to the queue."""
+        with self._lock:
+            cursor = self._db.execute("UPDATE items SET status = ? WHERE status = ?", (PENDING, RUNNING))
+            return cursor.rowcount
+
+    def create(self, kind, params, documents):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, sort_keys=True), "queued", len(documents), now, now),
+            )
+            self._db.executemany(
+                "INSERT INTO items (job_id, idx, document_id, text, status) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, doc.get("id"), doc["text"], PENDING) for i, doc in enumerate(documents)],
+            )
+            self._db.execute("COMMIT")
+        return job_id
+
+    def claim(self, batch_size):
+        """Mark up to ``batch_size`` pending documents as running and return them.
+
+        All claimed documents share the task and parameters of the oldest
+        pending one. Returns (kind, params, [(job_id, idx, text)]) or None.
+        """
+        with self._lock:
+            first = self._db.execute(
+                "SELECT j.kind, j.params FROM items i JOIN jobs j ON j.id = i.job_id "
+                "WHERE i.status = ? ORDER BY j.created, i.idx LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if first is None:
+                return None
+            kind, params = first
+            rows = self._db.execute(
+                "SELECT i.job_id, i.idx, i.text FROM items i JOIN jobs j ON j.id = i.job_id "
+                "WHERE i.status = ? AND j.kind = ? AND j.params = ? ORDER BY j.created, i.idx LIMIT ?",
+                (PENDING, kind, params, batch_size),
+            ).fetchall()
+            now = time.time()
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE items SET status = ? WHERE job_id = ? AND idx = ?", [(RUNNING, j, i) for j, i, _ in rows]
+            )
+            self._db.executemany(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'",
+                [(now, j) for j in {j for j, _, _ in rows}],
+            )
+            self._db.execute("COMMIT")
+            return kind, json.loads(params), rows
+
+    def finish(self, outcomes):
+        """Store (job_id, idx, result, error) outcomes and close jobs that have nothing left to do."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            for job_id, idx, result, error in outcomes:
+                # A job cancelled while its documents were running keeps them cancelled
+                self._db.execute(
+                    "UPDATE items SET status = ?, result = ?, error = ? WHERE job_id = ? AND idx = ? AND status = ?",
+                    (FAILED if error else DONE, None if error else json.dumps(result), error, job_id, idx, RUNNING),
+                )
+            for job_id in {outcome[0] for outcome in outcomes}:
+                open_items = self._db.execute(
+                    "SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN (?, ?)", (job_id, PENDING, RUNNING)
+                ).fetchone()[0]
+                self._db.execute(
+                    "UPDATE jobs SET status = CASE WHEN ? = 0 AND status != ? THEN 'done' ELSE status END, "
+                    "updated = ? WHERE id = ?",
+                    (open_items, CANCELLED, now, job_id),
+                )
+            self._db.execute("COMMIT")
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._db.execute("BEGIN")
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (CANCELLED, time.time(), job_id),
+            )
+            self._db.execute(
+                "UPDATE items SET status = ? WHERE job_id = ? AND status IN (?, ?)", (CANCELLED, job_id, PENDING, RUNNING)
+            )
+            self._db.execute("COMMIT")
+            return cursor.rowcount > 0
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._db.execute(
+                "SELECT id, kind, params, status, total, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        total = job[4]
+        finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+        return {
+            "job_id": job[0],
+            "kind": job[1],
+            "params": json.loads(job[2]),
+            "status": job[3],
+            "total": total,
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0) + counts.get(RUNNING, 0),
+            "progress": finished / total if total else 1.0,
+            "created": job[5],
+            "updated": job[6],
+        }
+
+    def results(self, job_id, include_pending=False):
+        """Yield one dict per finished document of ``job_id`` (every document with ``include_pending``)."""
+        query = "SELECT idx, document_id, status, result, error FROM items WHERE job_id = ?"
+        if not include_pending:
+            query += f" AND status IN ('{DONE}', '{FAILED}')"
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY idx", (job_id,)).fetchall()
+        for idx, document_id, status, result, error in rows:
+            yield {
+                "index": idx,
+                "document_id": document_id,
+                "status": status,
+                "result": json.loads(result) if result is not None else None,
+                "error": error,
+            }
+
+    def list(self, limit=50):
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()]
+        return [self.status(job_id) for job_id in ids]
+
+    def stats(self):
+        with self._lock:
+            jobs = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            items = dict(self._db.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+        return {"path": self.path, "jobs": jobs, "documents": items, "recovered_at_startup": self.recovered}
+
+
+class JobQueue:
+    """Background workers that drain a ``JobStore``.
+
+    ``register(kind, handler, params_model)`` adds a task: ``handler(params,
+    texts)`` must return one JSON-serialisable result per text. When
+    ``params_model`` (a pydantic model) is given, submitted parameters are
+    validated and completed with its defaults. A batch that raises is
+    retried one document at a time, so a single bad document only fails
+    itself. With an ``executor`` (an InferenceExecutor) handlers run in its
+    slots, sharing the thread budget with the request handlers. A handler
+    that returns a different number of results is treated as a failed batch.
+    """
+
+    def __init__(self, store, batch_size=JOB_BATCH_SIZE, workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS,
+                 executor=None):
+        self.store = store
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self._handlers = {}
+        self._wake = threading.Event()
+        self._threads = []
+        self._running = False
+
+        self.batches = 0
+        self.documents = 0
+
+    def register(self, kind, handler, params_model=None):
+        self._handlers[kind] = (handler, params_model)
+
+    @property
+    def kinds(self):
+        return list(self._handlers)
+
+    def validate(self, kind, params):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(self._handlers)}")
+        params_model = self._handlers[kind][1]
+        return params_model(**(params or {})).model_dump() if params_model is not None else dict(params or {})
+
+    def submit(self, kind, documents, params=None):
+        job_id = self.store.create(kind, self.validate(kind, params), documents)
+        self._wake.set()
+        return job_id
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.store.recovered:
+            logger.info("Resuming %d job documents interrupted by the last shutdown", self.store.recovered)
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            claimed = self.store.claim(self.batch_size)
+            if claimed is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self.store.finish(self._process(*claimed))
+
+    def _process(self, kind, params, rows):
+        handler = self._handlers.get(kind, (None, None))[0]
+        if handler is None:
+            return [(job_id, idx, None, f"No handler for job kind {kind!r}") for job_id, idx, _ in rows]
+
+        self.batches += 1
+        self.documents += len(rows)
+        try:
+            texts = [text for _, _, text in rows]
+            if self.executor is not None:
+                results = self.executor.call(f"job:{kind}", handler, params, texts)
+            else:
+                results = handler(params, texts)
+            results = list(results)
+            if len(results) != len(rows):
+                # zip would drop the unmatched documents and leave them running forever
+                raise ValueError(f"Handler for {kind!r} returned {len(results)} results for {len(rows)} documents")
+            return [(job_id, idx, result, None) for (job_id, idx, _), result in zip(rows, results)]
+        except Exception as e:
+            if len(rows) == 1:
+                logger.warning("Job document %s/%s failed: %s", rows[0][0], rows[0][1], e)
+                return [(rows[0][0], rows[0][1], None, str(e))]
+        # Find the failing documents without losing the rest of the batch
+        return [outcome for row in rows for outcome in self._process(kind, params, [row])]
+
+    def stats(self):
+        return {
+            "kinds": self.kinds,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "batches_processed": self.batches,
+            "documents_processed": self.documents,
+            **self.store.stats(),
+        }
+
+
+class JobDocument(BaseModel):
+    text: str
+    # Caller's identifier, echoed back with the result
+    id: Optional[str] = None
+
+
+class JobRequest(BaseModel):
+    documents: List[JobDocument]
+    kind: Optional[str] = None
+    params: Dict[str, Any] = {}
+
+
+def job_router(queue, default_kind):
+    """FastAPI routes for ``queue``: POST /jobs, GET /jobs, GET /jobs/{id}, GET /jobs/{id}/results, DELETE /jobs/{id}."""
+    router = APIRouter()
+
+    @router.post("/jobs", status_code=202)
+    def submit_job(request: JobRequest):
+        if not request.documents:
+            raise HTTPException(status_code=400, detail="No documents provided")
+        if len(request.documents) > JOB_MAX_DOCUMENTS:
+            raise HTTPException(status_code=413, detail=f"At most {JOB_MAX_DOCUMENTS} documents per job")
+        if any(not doc.text.strip() for doc in request.documents):
+            raise HTTPException(status_code=400, detail="Documents cannot be empty")
+        try:
+            job_id = queue.submit(
+                request.kind or default_kind, [doc.model_dump() for doc in request.documents], request.params
+            )
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        logger.info("Queued job %s with %d documents", job_id, len(request.documents))
+        return queue.store.status(job_id)
+
+    @router.get("/jobs")
+    def list_jobs(limit: int = 50):
+        return {"jobs": queue.store.list(limit), "queue": queue.stats()}
+
+    @router.get("/jobs/{job_id}")
+    def job_status(job_id: str):
+        status = queue.store.status(job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return status
+
+    @router.get("/jobs/{job_id}/results")
+    def job_results(job_id: str, include_pending: bool = False):
+        """Results as JSON lines, one per finished document; available while the job is still running."""
+        if queue.store.status(job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        lines = (json.dumps(row) + "\n" for row in queue.store.results(job_id, include_pending))
+        return StreamingResponse(
+            lines,
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{job_id}.jsonl"'},
+        )
+
+    @router.delete("/jobs/{job_id}")
+    def cancel_job(job_id: str):
+        if queue.store.status(job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"cancelled": queue.store.cancel(job_id), **queue.store.status(job_id)}
+
+    return router
@@ -0,0 +1,347 @@
+# backend/metrics.py
+"""In-process metrics in the Prometheus text exposition format, plus a sampling profiler.
+
+Counters, gauges and histograms are kept in one module-level registry and
+rendered by ``render()`` for the servers' ``/metrics`` endpoints, so no
+client library is needed. ``instrument_encoder`` and ``GenerationStages``
+split a generate() call into tokenize / encode / decode-loop / detokenize
+time; ``maybe_profile`` runs cProfile for a PROFILE_SAMPLE_RATE fraction
+of calls and writes the stats to PROFILE_DIR.
+"""
+import cProfile
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a cached lookup up to a long beam search on CPU
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+RATE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# One registry per process; every server module imported into it reports here
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "talqs_stage_seconds", "Time spent in each inference stage.", ("task", "stage"))
+INPUT_TOKENS = registry.histogram(
+    "talqs_input_tokens", "Prompt length in tokens after truncation.", ("task",), buckets=TOKEN_BUCKETS)
+OUTPUT_TOKENS = registry.histogram(
+    "talqs_output_tokens", "Generated sequence length in tokens.", ("task",), buckets=TOKEN_BUCKETS)
+TRUNCATIONS = registry.counter(
+    "talqs_truncations_total", "Prompts cut at the model's maximum input length.", ("task",))
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "talqs_queue_wait_seconds", "Time a request waited for a micro-batch to start.", ("batcher",))
+BATCH_SIZE = registry.histogram(
+    "talqs_batch_size", "Requests per micro-batch.", ("batcher",), buckets=BATCH_BUCKETS)
+REQUEST_SECONDS = registry.histogram(
+    "talqs_request_seconds", "End-to-end HTTP request latency.", ("endpoint", "status"))
+PROFILES = registry.counter(
+    "talqs_profiles_total", "Calls captured by the sampling profiler.", ("task",))
+STRATEGY_CHOICES = registry.counter(
+    "talqs_decoding_strategy_total", "Requests served with each decoding strategy.", ("task", "strategy"))
+DEADLINE_STOPS = registry.counter(
+    "talqs_deadline_stops_total", "Requests whose generation was cut short by their deadline.", ("task",))
+COALESCED_REQUESTS = registry.counter(
+    "talqs_coalesced_requests_total",
+    "Requests that started a computation (leader) or joined an identical one in flight (follower).",
+    ("endpoint", "role"))
+COALESCING_FAILURES = registry.counter(
+    "talqs_coalescing_failures_total", "Shared computations that failed for all their callers.", ("endpoint",))
+INFERENCE_WAIT_SECONDS = registry.histogram(
+    "talqs_inference_wait_seconds", "Time a model call waited for a free inference slot.", ("executor", "task"))
+INFERENCE_BUSY_SLOTS = registry.gauge(
+    "talqs_inference_busy_slots", "Inference slots currently running a model call.", ("executor",))
+INFERENCE_REJECTIONS = registry.counter(
+    "talqs_inference_rejections_total", "Requests rejected with 429 because the admission queue was full.",
+    ("executor", "task"))
+ASSISTED_DRAFT_TOKENS = registry.counter(
+    "talqs_assisted_draft_tokens_total", "Tokens proposed by the draft model in assisted decoding.", ("task",))
+ASSISTED_ACCEPTED_TOKENS = registry.counter(
+    "talqs_assisted_accepted_tokens_total", "Draft tokens accepted by the target model.", ("task",))
+ASSISTED_ACCEPTANCE = registry.histogram(
+    "talqs_assisted_acceptance_rate", "Fraction of drafted tokens accepted, per generate() call.", ("task",),
+    buckets=RATE_BUCKETS)
+SEMANTIC_CACHE_LOOKUPS = registry.counter(
+    "talqs_semantic_cache_lookups_total", "Semantic cache lookups by result (hit, field_hit, miss, empty).", ("cache", "result"))
+SEMANTIC_CACHE_SIMILARITY = registry.histogram(
+    "talqs_semantic_cache_similarity", "Cosine similarity of the nearest cached question per lookup.", ("cache",),
+    buckets=SIMILARITY_BUCKETS)
+
+
+def render():
+    return registry.render()
+
+
+def configure_logging():
+    """Log to stderr at LOG_LEVEL (default INFO) unless the process already configured logging."""
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+# Encoder time for the generate() call running on this thread
+_encoder_timing = threading.local()
+
+
+def instrument_encoder(model):
+    """Time ``model``'s encoder forward passes so generate() can be split into encode and decode-loop time.
+
+    The hooks are installed once per model and accumulate into a
+    thread-local, so concurrent generate() calls on the same model do not
+    mix their timings. Models without ``get_encoder`` are left alone.
+    """
+    get_encoder = getattr(model, "get_encoder", None)
+    encoder = get_encoder() if callable(get_encoder) else None
+    if encoder is None or getattr(encoder, "_talqs_timed", False):
+        return
+
+    def before(module, args):
+        _encoder_timing.started = time.perf_counter()
+
+    def after(module, args, output):
+        started = getattr(_encoder_timing, "started", None)
+        if started is not None:
+            _encoder_timing.seconds = getattr(_encoder_timing, "seconds", 0.0) + time.perf_counter() - started
+
+    encoder.register_forward_pre_hook(before)
+    encoder.register_forward_hook(after)
+    encoder._talqs_timed = True
+
+
+class GenerationStages:
+    """Records the stages of one batched generate() call for ``task``.
+
+    Usage::
+
+        stages = GenerationStages(task, model)
+        with stages.stage("tokenize"):
+            inputs = tokenizer(...)
+        stages.record_inputs(inputs.attention_mask, max_input_length)
+        with stages.generate():
+            output_ids = model.generate(...)
+        stages.record_outputs(output_ids, tokenizer.pad_token_id)
+        with stages.stage("detokenize"):
+            texts = tokenizer.batch_decode(...)
+    """
+
+    def __init__(self, task, model=None):
+        self.task = task
+        if model is not None:
+            instrument_encoder(model)
+
+    @contextmanager
+    def stage(self, name):
+        with STAGE_SECONDS.time(task=self.task, stage=name):
+            yield
+
+    @contextmanager
+    def generate(self):
+        """Time generate(), split into the encoder pass and the decoding loop (beam search)."""
+        _encoder_timing.seconds = 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            encode = getattr(_encoder_timing, "seconds", 0.0)
+            _encoder_timing.seconds = 0.0
+            if encode:
+                STAGE_SECONDS.observe(encode, task=self.task, stage="encode")
+            STAGE_SECONDS.observe(total - encode, task=self.task, stage="decode_loop")
+
+    def record_inputs(self, attention_mask, max_input_length):
+        for length in attention_mask.sum(dim=1).tolist():
+            INPUT_TOKENS.observe(length, task=self.task)
+            if max_input_length and length >= max_input_length:
+                TRUNCATIONS.inc(task=self.task)
+
+    def record_outputs(self, output_ids, pad_token_id):
+        for length in (output_ids != pad_token_id).sum(dim=1).tolist():
+            OUTPUT_TOKENS.observe(length, task=self.task)
+
+
+def profile_sample_rate():
+    """PROFILE_SAMPLE_RATE: fraction of generate() calls to profile (0 disables)."""
+    try:
+        return float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+    except ValueError:
+        return 0.0
+
+
+@contextmanager
+def maybe_profile(task):
+    """Run cProfile for a sampled fraction of calls and dump stats to PROFILE_DIR/<task>-<time>.prof.
+
+    Load a dump with ``python -m pstats <file>`` or snakeviz.
+    """
+    rate = profile_sample_rate()
+    if rate <= 0 or random.random() >= rate:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        directory = os.environ.get("PROFILE_DIR", "profiles")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{task}-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+        PROFILES.inc(task=task)
+        logging.getLogger(__name__).info("Wrote profile %s", path)
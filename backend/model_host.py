@@ -0,0 +1,164 @@
+# backend/model_host.py
+"""One process serving QA and summarization over a single model registry.
+
+qa_server.py and server.py each load their own models when run as separate
+processes. Imported together here, they share everything the registry
+holds under the same name (the t5-small tokenizer, and the plain t5-small
+used for assisted drafting and as the QA fallback). Parameters that are
+identical across the loaded models are also pointed at one tensor. That
+rewrites the models' parameter tables, so it is done at startup, after
+every model is loaded and before the host accepts requests or starts the
+job queues; nothing can be running a model meanwhile. All model calls run
+on the one shared InferenceExecutor, which gives each task a fair share
+of a single CPU budget.
+
+The Flask summarizer in summarization/ (the t5-base SummarizerModel with
+its own worker processes) is not hosted here. It shares no base checkpoint
+with these models, so there would be nothing to share, and its worker pool
+already maps one copy of its weights into every worker.
+
+Task routes keep their paths (/summarize, /answer, /answer_bulk, their
+/stream variants, /questions, /documents), and POST /tasks/{task}
+dispatches by name.
+Routes both servers define are merged (/health, /ready, /metrics,
+/scheduler/stats, /cache/...). Each server's full API, including its job
+endpoints, stays available under /qa and /summarizer.
+
+Usage (from the backend/ directory):
+
+    uvicorn model_host:app --port 8002
+"""
+import json
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import ValidationError
+from starlette.routing import Mount
+from typing import Any, Dict, Optional
+
+import qa_server
+import server
+from executor import InferenceSaturated, saturated_response, shared_executor
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, render as render_metrics
+from model_registry import registry, share_identical_parameters, warmup_mode
+
+app = FastAPI()
+app.add_exception_handler(InferenceSaturated, saturated_response)
+inference = shared_executor()
+
+TASK_ROUTES = ("/questions", "/summarize", "/summarize/stream", "/answer", "/answer/stream", "/answer_bulk", "/documents")
+for module in (qa_server, server):
+    for route in module.app.routes:
+        if getattr(route, "path", None) in TASK_ROUTES:
+            app.router.routes.append(route)
+
+# Request schema and handler per task name for POST /tasks/{task}
+TASKS = {
+    "summarize": (server.SummaryRequest, server.summarize),
+    "answer": (qa_server.QARequest, qa_server.answer_question),
+    "answer_bulk": (qa_server.BulkQARequest, qa_server.answer_bulk_questions),
+}
+
+MODEL_KEYS = list(dict.fromkeys([
+    qa_server.TOKENIZER_KEY, qa_server.QA_MODEL_KEY, server.TOKENIZER_KEY, server.SUMMARY_MODEL_KEY,
+]))
+# Bytes freed by pointing identical parameters of different models at one tensor
+shared_parameter_bytes = 0
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # Requests to the mounted servers are recorded by their own middleware
+    if not isinstance(route, Mount):
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=getattr(route, "path", "unmatched"),
+            status=str(response.status_code),
+        )
+    return response
+
+def load_and_share():
+    global shared_parameter_bytes
+    keys = MODEL_KEYS + ([server.DRAFT_MODEL_KEY] if server.assisted_decoding_enabled() else [])
+    registry.warm_up(keys, background=False)
+    models = [registry.get(key) for key in keys if registry.is_loaded(key)]
+    shared_parameter_bytes = share_identical_parameters(models)
+    print(f"Loaded {len(models)} models and tokenizers; "
+          f"{shared_parameter_bytes / 2**20:.1f} MiB of identical parameters shared")
+
+@app.on_event("startup")
+def start_host():
+    # The mounted servers' own startup hooks do not run, so the host loads every model once and
+    # starts both job queues. Sharing swaps parameters in place, so it has to finish before any
+    # request or job can use a model: loading blocks startup whatever MODEL_WARMUP says, except
+    # in lazy mode, where models load on first use and are not shared.
+    if warmup_mode() == "lazy":
+        print("MODEL_WARMUP=lazy: models load on first use; identical parameters are not shared")
+    else:
+        load_and_share()
+    qa_server.start_job_workers()
+    server.start_job_workers()
+
+@app.post("/tasks/{task}")
+async def run_task(task: str, payload: Dict[str, Any]):
+    """Run ``task`` ("summarize", "answer" or "answer_bulk") with the body its own route takes."""
+    if task not in TASKS:
+        raise HTTPException(status_code=404, detail=f"Unknown task {task!r}; expected one of {', '.join(TASKS)}")
+    schema, handler = TASKS[task]
+    try:
+        request = schema(**payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    return await handler(request)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint; both servers record into the same process-wide registry."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/health")
+def health_check():
+    return {"status": "healthy", "tasks": list(TASKS)}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 once every task's tokenizer and model are loaded, 503 before."""
+    status = registry.status(MODEL_KEYS)
+    status["shared_parameter_bytes"] = shared_parameter_bytes
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    qa_stats = qa_server.scheduler_stats()
+    summary_stats = server.scheduler_stats()
+    return {
+        "answer": qa_stats["answer"],
+        "summarize": summary_stats["summarize"],
+        "passage_indexes": qa_stats["passage_indexes"],
+        "decode_timing": qa_stats["decode_timing"],
+        "coalescing": qa_stats["coalescing"] + [summary_stats["coalescing"]],
+        "inference": inference.stats(),
+    }
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"answer": qa_server.cache_stats(), "summarize": server.cache_stats()}
+
+@app.post("/cache/invalidate")
+def invalidate_cache(model_id: Optional[str] = None):
+    """Drop cached answers and summaries, e.g. after replacing model weights."""
+    return {
+        "removed": qa_server.invalidate_cache(model_id)["removed"] + server.invalidate_cache(model_id)["removed"]
+    }
+
+# Each server's complete API, including what is merged above, stays reachable under a prefix
+app.mount("/qa", qa_server.app)
+app.mount("/summarizer", server.app)
+
+if __name__ == "__main__":
+    import uvicorn
+    print("Starting model host on port 8002...")
+    uvicorn.run(app, host="0.0.0.0", port=8002)
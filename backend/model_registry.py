@@ -0,0 +1,282 @@
+# backend/model_registry.py
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+from precision import apply_precision
+from stub_model import StubSeq2SeqModel, StubTokenizer, stub_models_enabled
+
+
+class ModelRegistry:
+    """Loads every model and tokenizer at most once and shares it.
+
+    Loaders are registered by name and run on first ``get`` (or during
+    ``warm_up``). A loader receives the registry, so it can pull in shared
+    dependencies such as a tokenizer and record timings for its own
+    phases with ``registry.phase``. When two servers register the same
+    name in one process, the first loader wins and both share the object.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._objects = {}
+        self._info = {}
+        self._errors = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._warmup_thread = None
+        self._created = time.perf_counter()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders.setdefault(name, loader)
+
+    def registered(self, name):
+        return name in self._loaders
+
+    def _load_lock(self, name):
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.RLock())
+
+    def get(self, name):
+        obj = self._objects.get(name)
+        if obj is not None:
+            return obj
+
+        with self._load_lock(name):
+            if name in self._objects:
+                return self._objects[name]
+            if name not in self._loaders:
+                raise KeyError(f"No loader registered for {name!r}")
+
+            print(f"Loading {name}...")
+            start = time.perf_counter()
+            try:
+                obj = self._loaders[name](self)
+            except Exception as e:
+                self._errors[name] = str(e)
+                print(f"Error loading {name}: {e}")
+                raise
+            elapsed = time.perf_counter() - start
+            self._timings.setdefault(name, {})["total"] = elapsed
+            self._errors.pop(name, None)
+            self._objects[name] = obj
+            print(f"Loaded {name} in {elapsed:.2f}s")
+            return obj
+
+    @contextmanager
+    def phase(self, name, phase):
+        """Record how long one loading phase of ``name`` took."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._timings.setdefault(name, {})[phase] = time.perf_counter() - start
+
+    def set_info(self, name, **info):
+        self._info.setdefault(name, {}).update(info)
+
+    def info(self, name):
+        return self._info.get(name, {})
+
+    def is_loaded(self, name):
+        return name in self._objects
+
+    def warm_up(self, names, background=True):
+        """Load ``names`` now, or in a daemon thread when ``background`` is set."""
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # recorded in status(); requests will retry the load
+
+        if not background:
+            run()
+            return
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+
+    def status(self, names):
+        return {
+            "ready": all(self.is_loaded(name) for name in names),
+            "models": {
+                name: {
+                    "loaded": self.is_loaded(name),
+                    "error": self._errors.get(name),
+                    "timings": self._timings.get(name, {}),
+                    **self._info.get(name, {}),
+                }
+                for name in names
+            },
+            "uptime_seconds": time.perf_counter() - self._created,
+        }
+
+
+# One registry per process, shared by every server module imported into it
+registry = ModelRegistry()
+
+
+def warmup_mode():
+    """MODEL_WARMUP: "background" (default), "eager" (block startup) or "lazy" (first request)."""
+    return os.environ.get("MODEL_WARMUP", "background").lower()
+
+
+def load_tokenizer(name):
+    if stub_models_enabled():
+        return StubTokenizer()
+    try:
+        from transformers import T5Tokenizer
+        tokenizer = T5Tokenizer.from_pretrained(name)
+        print("Successfully loaded T5Tokenizer")
+    except ImportError:
+        # Fall back to a tokenizer that doesn't require SentencePiece
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+        print("Using AutoTokenizer as fallback")
+    return tokenizer
+
+
+def register_tokenizer(name):
+    """Register the tokenizer for checkpoint ``name`` and return its registry key."""
+    key = f"tokenizer:{name}"
+    registry.register(key, lambda reg: load_tokenizer(name))
+    return key
+
+
+def register_pretrained(name, device):
+    """Register a plain pretrained T5 checkpoint and return its registry key."""
+    def load(reg):
+        if stub_models_enabled():
+            reg.set_info(name, weights="stub", precision="stub")
+            return StubSeq2SeqModel()
+        from transformers import T5ForConditionalGeneration
+        model = T5ForConditionalGeneration.from_pretrained(name).to(device)
+        model.eval()
+        with reg.phase(name, "precision"):
+            model, precision = apply_precision(model, device)
+        reg.set_info(name, weights=name, precision=precision)
+        return model
+
+    registry.register(name, load)
+    return name
+
+
+def read_checkpoint(path, device):
+    """Read a state dict, memory-mapping the file where the checkpoint format and torch version allow it.
+
+    Checkpoints the memory-mapped load cannot read are loaded in full, as
+    before: the legacy non-zipfile format (RuntimeError) and pickles holding
+    more than tensors (UnpicklingError). The checkpoint paths are local
+    files configured by the operator, so they are unpickled the way
+    ``torch.load`` did before torch 2.6 made ``weights_only`` the default.
+    """
+    try:
+        return torch.load(path, map_location=device, mmap=True, weights_only=True)
+    except TypeError:
+        # torch < 2.1 has no mmap argument
+        return torch.load(path, map_location=device)
+    except (RuntimeError, pickle.UnpicklingError) as e:
+        print(f"Memory-mapped load of {path} failed ({type(e).__name__}); loading a copy instead")
+        return torch.load(path, map_location=device, weights_only=False)
+
+
+def build_from_state_dict(factory, state_dict):
+    """Build the architecture from ``factory`` and fill it with ``state_dict``.
+
+    ``factory(load_pretrained=False)`` must construct the architecture
+    without fetching pretrained weights, since the state dict overwrites
+    all of them. The architecture is created on the meta device and the
+    given tensors (memory-mapped or in shared memory) are assigned in
+    place, so weights are neither initialised nor copied; older torch
+    versions fall back to a regular ``load_state_dict``. Assigning replaces
+    every parameter, which unties the output projection from the input
+    embeddings, so the weights are tied again afterwards.
+    """
+    try:
+        with torch.device("meta"):
+            model = factory(load_pretrained=False)
+        model.load_state_dict(state_dict, assign=True)
+        tie_weights(model)
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            raise RuntimeError("checkpoint does not cover every parameter")
+    except (AttributeError, TypeError, RuntimeError) as e:
+        print(f"Assigning checkpoint tensors failed ({e}); loading a copy instead")
+        model = factory(load_pretrained=False)
+        model.load_state_dict(state_dict)
+    return model
+
+
+def tie_weights(model):
+    """Re-tie shared weights (T5's lm_head and embeddings) of ``model`` and the transformers models in it."""
+    for module in model.modules():
+        if hasattr(module, "tie_weights") and hasattr(module, "config"):
+            module.tie_weights()
+
+
+def load_custom_model(reg, name, factory, checkpoint_path, device):
+    """Build a wrapper model straight from a fine-tuned checkpoint.
+
+    The checkpoint is memory-mapped and assigned with
+    ``build_from_state_dict``. The INFERENCE_PRECISION mode is applied last
+    and recorded as the ``precision`` info of ``name``.
+    """
+    if stub_models_enabled():
+        reg.set_info(name, precision="stub")
+        return StubSeq2SeqModel()
+
+    with reg.phase(name, "read_checkpoint"):
+        state_dict = read_checkpoint(checkpoint_path, device)
+
+    with reg.phase(name, "build_and_load"):
+        model = build_from_state_dict(factory, state_dict)
+
+    with reg.phase(name, "to_device"):
+        model = model.to(device)
+        model.eval()
+
+    with reg.phase(name, "precision"):
+        model, precision = apply_precision(model, device)
+    reg.set_info(name, precision=precision)
+    return model
+
+
+def share_identical_parameters(models):
+    """Point parameters that are equal across ``models`` at a single tensor.
+
+    Tasks built from the same base checkpoint keep identical copies of
+    every weight their fine-tuning did not change, and a task that falls
+    back to the plain checkpoint holds it in full. Equal parameters (same
+    shape, dtype, device and values) are replaced by the first one seen, so
+    the copies can be freed. Models are read-only at inference time, so
+    sharing is safe. Returns the number of bytes no longer referenced.
+    """
+    seen = {}
+    replaced = {}
+    for model in models:
+        if not isinstance(model, torch.nn.Module):
+            continue
+        for module in model.modules():
+            for name, param in list(module._parameters.items()):
+                if param is None:
+                    continue
+                if id(param) in replaced:
+                    module._parameters[name] = replaced[id(param)][0]
+                    continue
+                # The sum narrows the candidates; torch.equal confirms the match
+                with torch.no_grad():
+                    key = (tuple(param.shape), param.dtype, param.device, float(param.detach().float().sum()))
+                candidates = seen.setdefault(key, [])
+                match = next((other for other in candidates if other is param or torch.equal(other, param)), None)
+                if match is None:
+                    candidates.append(param)
+                elif match is not param:
+                    module._parameters[name] = match
+                    replaced[id(param)] = (match, param.numel() * param.element_size())
+    return sum(size for _, size in replaced.values())
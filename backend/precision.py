@@ -0,0 +1,52 @@
+# backend/precision.py
+import os
+
+import torch
+import torch.nn as nn
+
+PRECISION_MODES = ("fp32", "int8", "bf16")
+
+
+def inference_precision():
+    """INFERENCE_PRECISION: "fp32" (default), "int8" (dynamic quantization) or "bf16"."""
+    mode = os.environ.get("INFERENCE_PRECISION", "fp32").lower()
+    if mode not in PRECISION_MODES:
+        print(f"Unknown INFERENCE_PRECISION {mode!r}, using fp32")
+        return "fp32"
+    return mode
+
+
+def bf16_supported(device):
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def apply_precision(model, device, mode=None):
+    """Convert a loaded model to the requested inference precision.
+
+    ``int8`` swaps every nn.Linear for a dynamically quantized one (weights
+    stored as int8, activations quantized on the fly); it is CPU-only.
+    ``bf16`` casts the weights to bfloat16 where the hardware supports it.
+    Returns ``(model, mode)`` with the mode that was actually applied, so
+    callers can include it in the model identity.
+    """
+    mode = mode or inference_precision()
+
+    if mode == "int8":
+        if device.type != "cpu":
+            print("int8 dynamic quantization is CPU-only, keeping fp32")
+            return model, "fp32"
+        torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model, "int8"
+
+    if mode == "bf16":
+        if not bf16_supported(device):
+            print("bf16 is not supported on this device, keeping fp32")
+            return model, "fp32"
+        return model.to(torch.bfloat16), "bf16"
+
+    return model, "fp32"
@@ -0,0 +1,244 @@
+# backend/qa.py
+"""The QA model and the question-answering helpers, without a web server.
+
+qa_server.py serves these over HTTP; the offline CLI in summarization/
+and the benchmarks import this module directly. The model is loaded
+lazily through the shared registry on the first ``get_model()`` call.
+"""
+import logging
+import os
+import time
+
+import torch
+import torch.nn as nn
+from transformers import T5Config, T5ForConditionalGeneration
+
+from adaptive import choose_strategy, strategy_ladder
+from field_index import FIELD_QUESTIONS, FieldIndex, normalize_question
+from generation import generate_batched
+from metrics import STAGE_SECONDS, STRATEGY_CHOICES
+from model_registry import load_custom_model, register_pretrained, register_tokenizer, registry
+from result_cache import ResultCache, make_key, model_identity
+from retrieval import IndexCache, best_sentence, retrieve_context
+from semantic_cache import SemanticCache, embed_questions
+
+logger = logging.getLogger(__name__)
+
+# Define the QA model architecture (same style as summarizer)
+class CustomEncoderDecoderQA(nn.Module):
+    def __init__(self, pretrained_model_name="t5-small", d_model=512, load_pretrained=True):
+        super().__init__()
+        if load_pretrained:
+            self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
+        else:
+            # A fine-tuned checkpoint is about to overwrite every weight, so only the architecture is needed
+            self.t5 = T5ForConditionalGeneration(T5Config.from_pretrained(pretrained_model_name))
+        self.encoder = self.t5.encoder
+        self.decoder = self.t5.decoder
+        self.d_model = d_model
+        self.fc = nn.Linear(self.encoder.config.d_model, d_model)
+        self.positional_encoding = self._get_positional_encoding(d_model)
+
+    def _get_positional_encoding(self, d_model, max_len=512):
+        position = torch.arange(max_len, dtype=torch.float64, device="cpu").unsqueeze(1)
+        even = torch.arange(0, d_model, 2, dtype=torch.float64, device="cpu")
+        angles = position / (10000 ** (even / d_model))
+        pos_encoding = torch.zeros(max_len, d_model, device="cpu")
+        pos_encoding[:, 0::2] = torch.sin(angles)
+        pos_encoding[:, 1::2] = torch.cos(angles[:, :d_model // 2])
+        return pos_encoding
+
+    def forward(self, input_ids, decoder_input_ids=None, attention_mask=None, labels=None):
+        encoder_outputs = self.encoder(input_ids=input_ids, attention_mask=attention_mask)
+        encoder_hidden_states = encoder_outputs.last_hidden_state
+        return self.t5(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            labels=labels,
+            decoder_input_ids=decoder_input_ids
+        )
+
+# Device setup
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+logger.info("Using device: %s", device)
+
+QA_MODEL_PATH = "models/summary_model/model_weight_1.pth"  # Using the smaller model file
+
+# Models are loaded once through the shared registry, in the background at startup
+TOKENIZER_KEY = register_tokenizer("t5-small")
+BASE_MODEL_KEY = register_pretrained("t5-small", device)
+QA_MODEL_KEY = "qa"
+
+def load_qa_model(reg):
+    # First try to load the custom model weights
+    try:
+        logger.info("Loading the QA model from %s", QA_MODEL_PATH)
+        qa_model = load_custom_model(
+            reg,
+            QA_MODEL_KEY,
+            lambda **kwargs: CustomEncoderDecoderQA(pretrained_model_name="t5-small", **kwargs),
+            QA_MODEL_PATH,
+            device,
+        )
+        model_id = model_identity("qa-t5-small", QA_MODEL_PATH, reg.info(QA_MODEL_KEY).get("precision"))
+        logger.info("Loaded the custom QA model")
+    except Exception as e:
+        logger.warning("Could not load the custom QA model (%s); using t5-small", e)
+        # Using base T5 model for now, shared with anything else that needs t5-small
+        qa_model = reg.get(BASE_MODEL_KEY)
+        model_id = model_identity("qa-t5-small", precision=reg.info(BASE_MODEL_KEY).get("precision"))
+
+    reg.set_info(QA_MODEL_KEY, model_id=model_id)
+    result_cache.retain_only(model_id)
+    return qa_model
+
+registry.register(QA_MODEL_KEY, load_qa_model)
+
+def get_model():
+    return registry.get(QA_MODEL_KEY)
+
+def get_tokenizer():
+    return registry.get(TOKENIZER_KEY)
+
+def qa_model_id():
+    get_model()
+    return registry.info(QA_MODEL_KEY)["model_id"]
+
+# Cached answers are tied to the exact weights that produced them
+result_cache = ResultCache("qa")
+
+# Default legal questions
+default_questions = [
+    "Who is the petitioner in the case?",
+    "Who is the respondent in the case?",
+    "What is the case summary?",
+    "What was the court's decision?",
+    "Were there any dissenting opinions?",
+    "What evidence was presented?",
+    "What are the key legal issues in the case?",
+    "What was the timeline of events?",
+]
+
+# Generation settings shared by the single and bulk QA endpoints
+QA_GENERATION_KWARGS = dict(
+    max_length=100,
+    num_beams=4,
+    no_repeat_ngram_size=2,
+    repetition_penalty=1.5,
+    length_penalty=1.0,
+    early_stopping=True,
+)
+
+# Decoding strategies for requests with a deadline, from the configured beam search to the extractive tier
+QA_STRATEGIES = strategy_ladder(QA_GENERATION_KWARGS["num_beams"])
+QA_STRATEGIES_BY_NAME = {strategy.name: strategy for strategy in QA_STRATEGIES}
+
+# Maximum number of question prompts decoded together in one generate() call
+QA_MAX_BATCH_SIZE = int(os.environ.get("QA_MAX_BATCH_SIZE", 8))
+
+# Passage indexes for recently seen documents, so repeated questions skip re-indexing
+passage_indexes = IndexCache()
+# Answers to the default questions per document: rule-extracted fields (parties, citations, dates,
+# disposition), plus the model answers to the rest once a full-quality bulk pass has run
+field_indexes = IndexCache(build=FieldIndex.from_text)
+
+def answer_from_fields(questions, text):
+    """Answers the field index of ``text`` has for ``questions``; None for the ones left to the model.
+
+    The index is built when a question is one the rules answer; otherwise
+    only an index that already exists (a registered document, or one a bulk pass
+    has answered) is consulted.
+    """
+    if any(normalize_question(question) in FIELD_QUESTIONS for question in questions):
+        index = field_indexes.get(text)
+    else:
+        index = field_indexes.peek(text)
+    if index is None:
+        return [None] * len(questions)
+    return [index.lookup(question) for question in questions]
+
+def generate_answers(pairs, max_batch_size=QA_MAX_BATCH_SIZE, strategy=None, deadlines=None):
+    """Answer a list of (question, context) pairs with batched generation.
+
+    Long contexts are narrowed to the passages most relevant to each
+    question before they are cut to the model's 512-token window.
+    ``strategy`` (default: the configured beam search) sets the decoding;
+    the extractive strategy answers with the best-matching sentence instead.
+    """
+    strategy = strategy or QA_STRATEGIES[0]
+    if strategy.extractive:
+        with STAGE_SECONDS.time(task="answer", stage="extract"):
+            return [best_sentence(passage_indexes, question, context) for question, context in pairs]
+
+    with STAGE_SECONDS.time(task="answer", stage="retrieve"):
+        prompts = [
+            f"question: {question} context: {retrieve_context(passage_indexes, question, context)}"
+            for question, context in pairs
+        ]
+    # The fallback model is a bare T5ForConditionalGeneration without the .t5 wrapper
+    qa_model = get_model()
+    generator = getattr(qa_model, "t5", qa_model)
+    return generate_batched(
+        generator,
+        get_tokenizer(),
+        prompts,
+        device,
+        max_batch_size=max_batch_size,
+        task="answer",
+        deadlines=deadlines,
+        **strategy.generate_kwargs(QA_GENERATION_KWARGS),
+    )
+
+def answer_questions(questions, context, max_batch_size=QA_MAX_BATCH_SIZE, strategy=None, deadline=None):
+    """Answer several questions about one context with batched generation."""
+    return generate_answers(
+        [(question, context) for question in questions], max_batch_size, strategy, [deadline] * len(questions)
+    )
+
+def embed_with_qa_encoder(questions):
+    qa_model = get_model()
+    return embed_questions(getattr(qa_model, "t5", qa_model).get_encoder(), get_tokenizer(), questions, device)
+
+# Answers to earlier phrasings of a question about the same document, for rephrased questions
+semantic_cache = SemanticCache("answer", embed_with_qa_encoder)
+
+def answer_cache_key(question, context):
+    return make_key(context, f"answer:{question}", qa_model_id(), QA_GENERATION_KWARGS)
+
+def choose_answer_strategy(deadline, rows=1, expected_wait=0.0):
+    strategy = choose_strategy(
+        "answer", QA_STRATEGIES, deadline, QA_GENERATION_KWARGS["max_length"], rows=rows, expected_wait=expected_wait
+    )
+    STRATEGY_CHOICES.inc(task="answer", strategy=strategy.name)
+    return strategy
+
+def deadline_exceeded(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+def answer_questions_cached(questions, context, deadline=None):
+    """Like answer_questions, but only generates answers that are not cached yet.
+
+    Returns the answers and the strategy used for the generated ones. Only
+    answers produced with the configured decoding are cached, so a request
+    with a tight deadline never degrades the answers of later requests.
+    """
+    return answer_pairs_cached([(question, context) for question in questions], deadline)
+
+def answer_pairs_cached(pairs, deadline=None):
+    """answer_questions_cached for (question, context) pairs that may come from different documents."""
+    keys = [answer_cache_key(question, context) for question, context in pairs]
+    answers = [result_cache.get(key) for key in keys]
+
+    strategy = QA_STRATEGIES[0]
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        strategy = choose_answer_strategy(deadline, rows=len(missing))
+        generated = generate_answers(
+            [pairs[i] for i in missing], strategy=strategy, deadlines=[deadline] * len(missing)
+        )
+        cacheable = strategy is QA_STRATEGIES[0] and not deadline_exceeded(deadline)
+        for i, answer in zip(missing, generated):
+            if cacheable:
+                result_cache.put(keys[i], answer, qa_model_id())
+            answers[i] = answer
+    return answers, strategy
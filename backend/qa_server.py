@@ -1,108 +1,86 @@
 # backend/qa_server.py
-import torch
-import math
-import torch.nn as nn
-from transformers import T5Tokenizer, T5ForConditionalGeneration
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import re
-
-# Define the QA model architecture (same style as summarizer)
-class CustomEncoderDecoderQA(nn.Module):
-    def __init__(self, pretrained_model_name="t5-small", d_model=512):
-        super().__init__()
-        self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
-        self.encoder = self.t5.encoder
-        self.decoder = self.t5.decoder
-        self.d_model = d_model
-        self.fc = nn.Linear(self.encoder.config.d_model, d_model)
-        self.positional_encoding = self._get_positional_encoding(d_model)
-
-    def _get_positional_encoding(self, d_model, max_len=512):
-        pos_encoding = torch.zeros(max_len, d_model)
-        for pos in range(max_len):
-            for i in range(0, d_model, 2):
-                pos_encoding[pos, i] = math.sin(pos / (10000 ** (i / d_model)))
-                if i + 1 < d_model:
-                    pos_encoding[pos, i + 1] = math.cos(pos / (10000 ** (i / d_model)))
-        return pos_encoding
-
-    def forward(self, input_ids, decoder_input_ids=None, attention_mask=None, labels=None):
-        encoder_outputs = self.encoder(input_ids=input_ids, attention_mask=attention_mask)
-        encoder_hidden_states = encoder_outputs.last_hidden_state
-        return self.t5(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            labels=labels,
-            decoder_input_ids=decoder_input_ids
-        )
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from adaptive import deadline_from_ms, timer as decode_timer
+from batching import MicroBatcher
+from executor import InferenceSaturated, saturated_response, shared_executor
+from jobs import JobQueue, JobStore, default_db_path, job_router
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, STRATEGY_CHOICES, configure_logging, render as render_metrics
+from model_registry import registry, warmup_mode
+# The model, the questions and the generation helpers are shared with the offline CLI
+from qa import (
+    QA_GENERATION_KWARGS, QA_MODEL_KEY, QA_STRATEGIES, QA_STRATEGIES_BY_NAME, TOKENIZER_KEY, answer_cache_key,
+    answer_from_fields, answer_pairs_cached, answer_questions_cached, choose_answer_strategy, deadline_exceeded,
+    default_questions, device, field_indexes, generate_answers, get_model, get_tokenizer, passage_indexes,
+    qa_model_id, result_cache, semantic_cache,
+)
+from result_cache import make_key
+from retrieval import context_hash, retrieve_context
+from singleflight import SingleFlight
+from streaming import admit_stream, stream_generate, streaming_kwargs, streaming_response
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Set up FastAPI app
 app = FastAPI()
 
-# Device setup
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"Using device: {device}")
-
-# Initialize model and tokenizer
-try:
-    print("Loading QA model and tokenizer...")
-    tokenizer = T5Tokenizer.from_pretrained("t5-small")
-    model = T5ForConditionalGeneration.from_pretrained("t5-small")
-    model.eval()
-    model.to(device)
-    print("QA model loaded successfully")
-except Exception as e:
-    print(f"Error loading QA model: {str(e)}")
-    model = None
-    tokenizer = None
-
-# Load tokenizer and model
-# Using a different tokenizer approach that doesn't require SentencePiece
-try:
-    from transformers import T5Tokenizer
-    tokenizer = T5Tokenizer.from_pretrained("t5-small")
-    print("Successfully loaded T5Tokenizer")
-except ImportError:
-    # Fall back to a simpler tokenizer
-    from transformers import AutoTokenizer
-    tokenizer = AutoTokenizer.from_pretrained("t5-small", use_fast=True)
-    print("Using AutoTokenizer as fallback")
-
-# First try to load the custom model weights
-try:
-    model_path = "models/summary_model/model_weight_1.pth"  # Using the smaller model file
-    print(f"Attempting to load model from {model_path}...")
-    model = CustomEncoderDecoderQA(pretrained_model_name="t5-small").to(device)  
-    model.load_state_dict(torch.load(model_path, map_location=device))
-    model.eval()
-    print("Successfully loaded custom QA model")
-except Exception as e:
-    print(f"Error loading custom QA model: {str(e)}")
-    model_path = "models/summary_model/model_weight_1.pth"  # Using the smaller model file
-    print(f"Attempting to load model from {model_path}...")
-    model = T5ForConditionalGeneration.from_pretrained("t5-small").to(device)  # Using base T5 model for now
-    # model.load_state_dict(torch.load(model_path, map_location=device))
-    model.eval()
-    print("Successfully loaded T5 base model")
+# Model calls run in a fixed number of slots that split the torch threads between them, shared with
+# every other server in this process; requests beyond the admission bound get 429 with Retry-After
+inference = shared_executor()
+app.add_exception_handler(InferenceSaturated, saturated_response)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        endpoint=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage timings, token counts, truncations and queue wait."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.on_event("startup")
+def warm_up_models():
+    mode = warmup_mode()
+    if mode != "lazy":
+        registry.warm_up([TOKENIZER_KEY, QA_MODEL_KEY], background=(mode != "eager"))
+
+@app.get("/health")
+def health_check():
+    """Liveness: the process is up, whether or not the model has finished loading."""
+    return {"status": "healthy"}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 once the tokenizer and QA model are loaded, 503 before."""
+    status = registry.status([TOKENIZER_KEY, QA_MODEL_KEY])
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 # Input schema
 class QARequest(BaseModel):
-    context: str
     question: str
-
-# Default legal questions
-default_questions = [
-    "Who is the petitioner in the case?",
-    "Who is the respondent in the case?",
-    "What is the case summary?",
-    "What was the court's decision?",
-    "Were there any dissenting opinions?",
-    "What evidence was presented?",
-    "What are the key legal issues in the case?",
-    "What was the timeline of events?",
-]
+    # The document, sent in full or as the id returned by POST /documents
+    context: Optional[str] = None
+    document_id: Optional[str] = None
+    # Latency budget in milliseconds; the decoding strategy is chosen to fit it
+    deadline_ms: Optional[int] = None
 
 @app.get("/questions")
 def get_default_questions():
@@ -111,61 +89,268 @@ def get_default_questions():
 # ✅ New route for answering all default questions from a single context
 class BulkQARequest(BaseModel):
     text: str
+    deadline_ms: Optional[int] = None
+    # Questions to answer; the default legal questions when omitted
+    questions: Optional[List[str]] = None
 
-@app.post("/answer_bulk")
-def answer_bulk_questions(request: BulkQARequest):
-    print("Received QA request")
-    print("Context preview:", request.text[:100])  # Just print a preview
-
-    context = request.text
-    results = []
-
-    for question in default_questions:
-        print(f"Asking: {question}")
-        input_text = f"question: {question} context: {context}"
-        input_ids = tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True).to(device)
-
-        with torch.no_grad():
-            output_ids = model.t5.generate(
-                input_ids=input_ids,
-                max_length=100,
-                num_beams=4,
-                no_repeat_ngram_size=2,
-                repetition_penalty=1.5,
-                length_penalty=1.0,
-                early_stopping=True,
+# Texts of registered documents by id, so questions about them do not resend the whole document
+QA_REGISTERED_DOCUMENTS = int(os.environ.get("QA_REGISTERED_DOCUMENTS", 64))
+registered_documents = OrderedDict()
+registered_documents_lock = threading.Lock()
+
+def register_text(text):
+    document_id = context_hash(text)
+    with registered_documents_lock:
+        registered_documents[document_id] = text
+        registered_documents.move_to_end(document_id)
+        while len(registered_documents) > QA_REGISTERED_DOCUMENTS:
+            registered_documents.popitem(last=False)
+    return document_id
+
+def request_context(request):
+    """The document text of a QA request; 404 for an id that is not (or no longer) registered."""
+    if request.document_id is not None:
+        with registered_documents_lock:
+            text = registered_documents.get(request.document_id)
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Unknown document_id {request.document_id}")
+        return text
+    if request.context is None:
+        raise HTTPException(status_code=422, detail="Either context or document_id is required")
+    return request.context
+
+def answer_batch(strategy_name, items):
+    """Micro-batch handler: items are (question, context, deadline) and share a strategy."""
+    return generate_answers(
+        [(question, context) for question, context, _ in items],
+        strategy=QA_STRATEGIES_BY_NAME[strategy_name],
+        deadlines=[deadline for _, _, deadline in items],
+    )
+
+# Concurrent /answer requests arriving within a short window share one generate() call
+qa_batcher = MicroBatcher(answer_batch, name="answer", executor=inference)
+
+# Identical requests arriving while one is being answered share its result.
+# Only requests without a deadline are coalesced: each deadline needs its own strategy.
+answer_flights = SingleFlight("answer")
+answer_bulk_flights = SingleFlight("answer_bulk")
+
+async def answer_document_questions(text, questions, deadline=None):
+    """Answer ``questions`` about ``text``: the field index first, one batched model pass for the rest.
+
+    Model answers produced with the configured decoding are added to the
+    document's field index, so asking them again needs no model call.
+    """
+    loop = asyncio.get_running_loop()
+    answers = await loop.run_in_executor(None, answer_from_fields, questions, text)
+    missing = [question for question, answer in zip(questions, answers) if answer is None]
+    from_fields = len(questions) - len(missing)
+    if from_fields:
+        STRATEGY_CHOICES.inc(from_fields, task="answer_bulk", strategy="field_index")
+
+    async def answer():
+        with inference.admit("answer_bulk"):
+            return await inference.run("answer_bulk", answer_questions_cached, missing, text, deadline)
+
+    strategy_name = "field_index"
+    if missing:
+        if deadline is None:
+            # qa_model_id() waits for the model to load, so the key is computed off the event loop
+            key = await loop.run_in_executor(
+                None, make_key, text, "answer_bulk", qa_model_id(), [missing, QA_GENERATION_KWARGS]
             )
-        answer = tokenizer.decode(output_ids[0], skip_special_tokens=True)
-        results.append({"question": question, "answer": answer})
+            generated, strategy = await answer_bulk_flights.run(key, answer)
+        else:
+            generated, strategy = await answer()
+        strategy_name = strategy.name
+        if strategy_name == QA_STRATEGIES[0].name and not deadline_exceeded(deadline):
+            index = await loop.run_in_executor(None, field_indexes.get, text)
+            index.add_answers(dict(zip(missing, generated)))
+        generated = iter(generated)
+        answers = [answer if answer is not None else next(generated) for answer in answers]
+    if strategy_name in ("field_index", QA_STRATEGIES[0].name) and not deadline_exceeded(deadline):
+        # Rephrasings of these questions can reuse the answers; embedding them does not delay the response
+        inference.submit("answer_embed", semantic_cache.add, text, questions, answers)
 
-    return {"qa_results": results}
+    return {
+        "qa_results": [{"question": question, "answer": answer} for question, answer in zip(questions, answers)],
+        "strategy": strategy_name,
+        "answered_from_fields": from_fields,
+        "deadline_exceeded": deadline_exceeded(deadline),
+    }
+
+@app.post("/answer_bulk")
+async def answer_bulk_questions(request: BulkQARequest):
+    logger.debug("Bulk QA request (%d characters)", len(request.text))
+    return await answer_document_questions(
+        request.text, request.questions or default_questions, deadline_from_ms(request.deadline_ms)
+    )
+
+class RegisterDocumentRequest(BaseModel):
+    text: str
+    # Questions answered once now; the default legal questions when omitted, none when empty
+    questions: Optional[List[str]] = None
+    deadline_ms: Optional[int] = None
+
+@app.post("/documents")
+async def register_document(request: RegisterDocumentRequest):
+    """Keep a document for /answer requests by ``document_id`` and answer its standing questions once.
+
+    The document's field index is built now and the model answers to the
+    questions the rules cannot answer are added to it. The document is
+    stored before the model pass starts, so questions sent meanwhile
+    already find it.
+    """
+    document_id = register_text(request.text)
+    questions = default_questions if request.questions is None else request.questions
+    logger.debug("Registered document %s (%d characters, %d questions)", document_id, len(request.text), len(questions))
+    if questions:
+        result = await answer_document_questions(request.text, questions, deadline_from_ms(request.deadline_ms))
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, field_indexes.get, request.text)
+        result = {"qa_results": [], "strategy": "field_index", "answered_from_fields": 0, "deadline_exceeded": False}
+    return {"document_id": document_id, **result}
+
+def run_answer_bulk_job(params, texts):
+    """Job handler: the default questions for several documents, decoded in shared batches."""
+    questions = params["questions"] or default_questions
+    answers = [answer for text in texts for answer in answer_from_fields(questions, text)]
+    pairs = [(question, text) for text in texts for question in questions]
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    generated, _ = answer_pairs_cached([pairs[i] for i in missing])
+    for i, answer in zip(missing, generated):
+        answers[i] = answer
+    return [
+        {"qa_results": [
+            {"question": question, "answer": answer}
+            for question, answer in zip(questions, answers[n * len(questions):(n + 1) * len(questions)])
+        ]}
+        for n in range(len(texts))
+    ]
+
+class AnswerBulkJobParams(BaseModel):
+    # Questions asked of every document; the default legal questions when empty
+    questions: List[str] = []
+
+# Bulk QA over many documents runs as background jobs that survive restarts
+job_queue = JobQueue(JobStore(default_db_path("qa")), executor=inference)
+job_queue.register("answer_bulk", run_answer_bulk_job, AnswerBulkJobParams)
+app.include_router(job_router(job_queue, "answer_bulk"))
+
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start()
 
 # Single question answering endpoint
 @app.post("/answer")
-def answer_question(request: QARequest):
-    print(f"Answering question: {request.question}")
-    print("Context preview:", request.context[:100])  # Just print a preview
-
-    input_text = f"question: {request.question} context: {request.context}"
-    input_ids = tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True).to(device)
-
-    with torch.no_grad():
-        output_ids = model.t5.generate(
-            input_ids=input_ids,
-            max_length=100,
-            num_beams=4,
-            no_repeat_ngram_size=2,
-            repetition_penalty=1.5,
-            length_penalty=1.0,
-            early_stopping=True,
-        )
-    answer = tokenizer.decode(output_ids[0], skip_special_tokens=True)
-    print(f"Answer: {answer}")
-    
-    return {"answer": answer}
+async def answer_question(request: QARequest):
+    context = request_context(request)
+    logger.debug("Question %r (%d characters of context)", request.question, len(context))
+
+    deadline = deadline_from_ms(request.deadline_ms)
+    loop = asyncio.get_running_loop()
+    # Default questions the rules (or the registration's model pass) answered come from the field index
+    answer = (await loop.run_in_executor(None, answer_from_fields, [request.question], context))[0]
+    if answer is not None:
+        STRATEGY_CHOICES.inc(task="answer", strategy="field_index")
+        return {"answer": answer, "strategy": "field_index", "deadline_exceeded": False}
+    # The key waits for the model to load and the cache may read sqlite: both stay off the event loop
+    key = await loop.run_in_executor(None, answer_cache_key, request.question, context)
+    answer = await loop.run_in_executor(None, result_cache.get, key)
+    strategy_name = QA_STRATEGIES[0].name
+    if answer is None:
+        async def generate():
+            with inference.admit("answer"):
+                # An earlier, differently worded question about this document may have the answer; the
+                # question is only embedded when the document has embedded questions to compare it with
+                vector = None
+                if semantic_cache.needs_embedding(context, request.question):
+                    vector = (await inference.run("answer", semantic_cache.embed, [request.question]))[0]
+                answer, similarity, matched = semantic_cache.lookup(context, request.question, vector)
+                if answer is not None:
+                    logger.debug("Reusing the answer to %r (similarity %.3f)", matched, similarity)
+                    STRATEGY_CHOICES.inc(task="answer", strategy="semantic_cache")
+                    return answer, "semantic_cache"
+                strategy = choose_answer_strategy(deadline, expected_wait=qa_batcher.mean_queue_wait)
+                if strategy.extractive:
+                    answer = (await inference.run(
+                        "answer", generate_answers, [(request.question, context)], 1, strategy
+                    ))[0]
+                else:
+                    # Requests are only batched with others decoded the same way
+                    answer = await qa_batcher.submit((request.question, context, deadline), key=strategy.name)
+            if strategy is QA_STRATEGIES[0] and not deadline_exceeded(deadline):
+                result_cache.put(key, answer, qa_model_id())
+                if vector is None:
+                    inference.submit("answer_embed", semantic_cache.add, context, [request.question], [answer])
+                else:
+                    semantic_cache.add(context, [request.question], [answer], vector[None])
+            return answer, strategy.name
+
+        if deadline is None:
+            answer, strategy_name = await answer_flights.run(key, generate)
+        else:
+            answer, strategy_name = await generate()
+    logger.debug("Answered with strategy %s", strategy_name)
+
+    return {"answer": answer, "strategy": strategy_name, "deadline_exceeded": deadline_exceeded(deadline)}
+
+class StreamQARequest(QARequest):
+    do_sample: Optional[bool] = False
+    temperature: Optional[float] = 1.0
+    top_p: Optional[float] = 0.95
+
+@app.post("/answer/stream")
+async def answer_question_stream(request: StreamQARequest, http_request: Request):
+    """Stream the answer as Server-Sent Events while it is being generated."""
+    context = request_context(request)
+    logger.debug("Streaming the answer to %r", request.question)
+    admission = admit_stream(inference, "answer_stream")
+
+    def prepare():
+        qa_model = get_model()
+        passages = retrieve_context(passage_indexes, request.question, context)
+        return getattr(qa_model, "t5", qa_model), get_tokenizer(), f"question: {request.question} context: {passages}"
+
+    events = stream_generate(
+        http_request,
+        inference,
+        "answer_stream",
+        prepare,
+        device,
+        admission=admission,
+        max_length=QA_GENERATION_KWARGS["max_length"],
+        no_repeat_ngram_size=QA_GENERATION_KWARGS["no_repeat_ngram_size"],
+        repetition_penalty=QA_GENERATION_KWARGS["repetition_penalty"],
+        **streaming_kwargs(request.do_sample, request.temperature, request.top_p),
+    )
+    return streaming_response(events, admission)
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    return {
+        "answer": qa_batcher.stats(),
+        "passage_indexes": passage_indexes.stats(),
+        "field_indexes": field_indexes.stats(),
+        "decode_timing": decode_timer.stats(),
+        "inference": inference.stats(),
+        "coalescing": [answer_flights.stats(), answer_bulk_flights.stats()],
+    }
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {**result_cache.stats(), "semantic": semantic_cache.stats()}
+
+@app.post("/cache/invalidate")
+def invalidate_cache(model_id: Optional[str] = None):
+    """Drop cached answers, e.g. after replacing the model weights.
+
+    The semantic cache and the field indexes do not record model ids and are always cleared.
+    """
+    return {"removed": result_cache.invalidate(model_id) + semantic_cache.clear() + field_indexes.clear()}
 
 # Start the server if this file is run directly
 if __name__ == "__main__":
     import uvicorn
-    print("Starting QA server on port 8000...")
+    logger.info("Starting QA server on port 8000")
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,154 @@
+# backend/result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies of a document share cache entries."""
+    return " ".join(text.split())
+
+
+def model_identity(name, weights_path=None, precision=None):
+    """Identify a loaded model; changes whenever the weights file or inference precision changes."""
+    if precision and precision != "fp32":
+        name = f"{name}/{precision}"
+    if weights_path and os.path.exists(weights_path):
+        stat = os.stat(weights_path)
+        return f"{name}@{stat.st_size}-{int(stat.st_mtime)}"
+    return name
+
+
+def make_key(context, task, model_id, params=None):
+    """Content-addressed key for (normalized context, task, model, generation parameters)."""
+    context_digest = hashlib.sha256(normalize_text(context).encode("utf-8")).hexdigest()
+    payload = json.dumps([context_digest, task, model_id, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache for generated answers and summaries.
+
+    The in-process tier is an LRU bounded by the total size of the stored
+    JSON payloads (``RESULT_CACHE_MAX_BYTES``). When ``RESULT_CACHE_DIR`` is
+    set, entries are also written to ``<dir>/<name>.sqlite3`` so they
+    survive restarts; disk hits are promoted back into memory. Every entry
+    records the model identity that produced it so it can be invalidated
+    when the weights change.
+    """
+
+    def __init__(self, name, max_bytes=None, cache_dir=None):
+        self.name = name
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        cache_dir = cache_dir if cache_dir is not None else os.environ.get("RESULT_CACHE_DIR")
+
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, f"{name}.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, model_id TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_model_id ON results (model_id)")
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[0])
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, model_id FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, row[0], row[1])
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value, model_id):
+        payload = json.dumps(value)
+        with self._lock:
+            self._remember(key, payload, model_id)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, model_id, value, created) VALUES (?, ?, ?, ?)",
+                    (key, model_id, payload, time.time()),
+                )
+                self._db.commit()
+
+    def _remember(self, key, payload, model_id):
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        self._memory[key] = (payload, model_id, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, model_id=None):
+        """Drop entries produced by ``model_id`` (or everything). Returns the number removed."""
+        with self._lock:
+            keys = [k for k, entry in self._memory.items() if model_id is None or entry[1] == model_id]
+            for k in keys:
+                self._bytes -= self._memory.pop(k)[2]
+            removed = len(keys)
+
+            if self._db is not None:
+                if model_id is None:
+                    cursor = self._db.execute("DELETE FROM results")
+                else:
+                    cursor = self._db.execute("DELETE FROM results WHERE model_id = ?", (model_id,))
+                self._db.commit()
+                removed = max(removed, cursor.rowcount)
+            return removed
+
+    def retain_only(self, model_id):
+        """Drop on-disk entries left behind by any other model, e.g. after new weights were deployed."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM results WHERE model_id != ?", (model_id,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "name": self.name,
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_enabled": self._db is not None,
+            }
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return stats
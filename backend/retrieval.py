@@ -0,0 +1,199 @@
+# backend/retrieval.py
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from document_store import sentence_spans
+
+TERM_PATTERN = re.compile(r"\w+")
+
+DEFAULT_PASSAGE_WORDS = int(os.environ.get("QA_PASSAGE_WORDS", 100))
+DEFAULT_PASSAGE_OVERLAP = int(os.environ.get("QA_PASSAGE_OVERLAP", 30))
+DEFAULT_TOP_K = int(os.environ.get("QA_RETRIEVAL_TOP_K", 3))
+
+# Shorter sentences are only used as an extractive answer when nothing longer matches
+MIN_ANSWER_WORDS = 4
+
+
+def context_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_passages(text, passage_words=DEFAULT_PASSAGE_WORDS, overlap_words=DEFAULT_PASSAGE_OVERLAP):
+    """Split ``text`` into overlapping passages of ``passage_words`` words."""
+    words = text.split()
+    if not words:
+        return []
+    stride = max(1, passage_words - overlap_words)
+    passages = []
+    for start in range(0, len(words), stride):
+        passages.append(" ".join(words[start:start + passage_words]))
+        if start + passage_words >= len(words):
+            break
+    return passages
+
+
+class PassageIndex:
+    """BM25 index over the passages of a single document.
+
+    Term weights for every (passage, term) pair are precomputed into a CSR
+    matrix once, so scoring a question is a column gather and a row sum.
+    """
+
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = passages
+
+        rows, terms = [], []
+        for row, passage in enumerate(passages):
+            tokens = TERM_PATTERN.findall(passage.lower())
+            rows.extend([row] * len(tokens))
+            terms.extend(tokens)
+
+        self.vocabulary = {}
+        term_ids = np.fromiter(
+            (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in terms),
+            dtype=np.int64,
+            count=len(terms),
+        )
+
+        counts = sparse.csr_matrix(
+            (np.ones(len(term_ids), dtype=np.float32), (np.array(rows, dtype=np.int64), term_ids)),
+            shape=(len(passages), len(self.vocabulary)),
+        )
+        counts.sum_duplicates()
+
+        n_passages = counts.shape[0]
+        doc_lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if n_passages else 0.0
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log(1.0 + (n_passages - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        # BM25 term-frequency saturation, applied to the stored counts row by row
+        row_of_entry = np.repeat(np.arange(n_passages), np.diff(counts.indptr))
+        norm = k1 * (1.0 - b + b * doc_lengths[row_of_entry] / max(avg_length, 1e-9))
+        tf = counts.data
+        counts.data = (tf * (k1 + 1.0) / (tf + norm) * idf[counts.indices]).astype(np.float32)
+        self.weights = counts.tocsc()
+
+    def scores(self, question):
+        term_ids = sorted({self.vocabulary[t] for t in TERM_PATTERN.findall(question.lower()) if t in self.vocabulary})
+        if not term_ids:
+            return np.zeros(len(self.passages), dtype=np.float32)
+        return np.asarray(self.weights[:, term_ids].sum(axis=1)).ravel()
+
+    def top_passages(self, question, top_k=DEFAULT_TOP_K):
+        """Indices of the ``top_k`` best passages for ``question``, in document order."""
+        scores = self.scores(question)
+        if top_k >= len(scores):
+            return list(range(len(scores)))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return sorted(best.tolist())
+
+    def context_for(self, question, top_k=DEFAULT_TOP_K):
+        return " ".join(self.passages[i] for i in self.top_passages(question, top_k))
+
+
+class IndexCache:
+    """LRU cache of per-document indexes keyed by the hash of the document text.
+
+    ``build(text)`` creates the index for a document not seen recently; by
+    default it is a PassageIndex over the document's passages. Builds run
+    outside the cache lock, so lookups of other documents are not held up,
+    and concurrent requests for the same new document wait for one build.
+    """
+
+    def __init__(self, max_entries=None, build=None):
+        self.build = build or (lambda text: PassageIndex(chunk_passages(text)))
+        self.max_entries = int(max_entries if max_entries is not None else os.environ.get("QA_INDEX_CACHE_SIZE", 32))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        index = self._entries.get(key)
+        if index is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return index
+
+    def get(self, text):
+        key = context_hash(text)
+        with self._lock:
+            index = self._lookup(key)
+            if index is not None:
+                return index
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                # Built by the request this one waited for
+                index = self._lookup(key)
+                if index is not None:
+                    return index
+                self.misses += 1
+            index = None
+            try:
+                index = self.build(text)
+            finally:
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+                    if index is not None:
+                        self._entries[key] = index
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                            self.evictions += 1
+            return index
+
+    def peek(self, text):
+        """The cached index of ``text``, or None without building one."""
+        with self._lock:
+            return self._lookup(context_hash(text))
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def retrieve_context(cache, question, context, top_k=DEFAULT_TOP_K):
+    """The part of ``context`` most relevant to ``question``.
+
+    Documents that already fit in ``top_k`` passages are returned unchanged.
+    """
+    if len(context.split()) <= DEFAULT_PASSAGE_WORDS * top_k:
+        return context
+    return cache.get(context).context_for(question, top_k)
+
+
+def best_sentence(cache, question, context):
+    """The sentence of the best passage that matches ``question`` most closely.
+
+    This is the extractive answer tier: BM25 only, no model call.
+    """
+    passage = retrieve_context(cache, question, context, top_k=1)
+    sentences = [passage[start:end] for start, end in sentence_spans(passage)]
+    # Passages are cut at word counts, so their first and last sentences may be fragments
+    complete = [sentence for sentence in sentences if len(sentence.split()) >= MIN_ANSWER_WORDS]
+    sentences = complete or sentences
+    if not sentences:
+        return ""
+    return sentences[int(np.argmax(PassageIndex(sentences).scores(question)))]
@@ -0,0 +1,203 @@
+# backend/semantic_cache.py
+"""Per-document cache of answers, looked up by question meaning.
+
+Questions asking for the same field of a judgment (``field_index.question_field``:
+"Who filed the case?" / "Who is the petitioner?") share their answer; other
+questions share one when their encoder embeddings are at least
+``SEMANTIC_CACHE_THRESHOLD`` similar, and never across different fields.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from field_index import question_field
+from metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_SIMILARITY, SIMILARITY_BUCKETS
+from retrieval import context_hash
+
+# Cosine similarity from which a cached question counts as the same question
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("QA_SEMANTIC_CACHE_THRESHOLD", 0.95))
+# Documents with cached questions, and questions kept per document (the oldest are replaced)
+SEMANTIC_CACHE_DOCUMENTS = int(os.environ.get("QA_SEMANTIC_CACHE_DOCUMENTS", 64))
+SEMANTIC_CACHE_ENTRIES = int(os.environ.get("QA_SEMANTIC_CACHE_ENTRIES", 256))
+
+
+def embed_questions(encoder, tokenizer, questions, device, max_length=64):
+    """L2-normalized mean-pooled encoder states of ``questions`` as a float32 (n, d) array."""
+    inputs = tokenizer(
+        [f"question: {question}" for question in questions],
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=max_length,
+    )
+    input_ids = inputs["input_ids"].to(device)
+    mask = inputs["attention_mask"].to(device)
+    with torch.inference_mode():
+        states = encoder(input_ids=input_ids, attention_mask=mask).last_hidden_state
+        weights = mask.unsqueeze(-1).to(states.dtype)
+        pooled = (states * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+        pooled = torch.nn.functional.normalize(pooled.float(), dim=-1)
+    return pooled.cpu().numpy()
+
+
+class _DocumentEntries:
+    """Answers of one document: by field, and by question embedding in a fixed-size ring."""
+
+    def __init__(self, capacity):
+        self.fields = {}
+        self.vectors = None
+        self.questions = [None] * capacity
+        self.answers = [None] * capacity
+        self.count = 0
+        self.next = 0
+
+    def nearest(self, vector):
+        """Slot and similarity of the nearest embedded question."""
+        if not self.count:
+            return None, 0.0
+        similarities = self.vectors[:self.count].astype(np.float32) @ vector
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+
+    def add(self, question, vector, answer):
+        if self.vectors is None:
+            self.vectors = np.zeros((len(self.answers), len(vector)), dtype=np.float16)
+        slot = self.next
+        self.vectors[slot] = vector
+        self.questions[slot] = question
+        self.answers[slot] = answer
+        self.next = (slot + 1) % len(self.answers)
+        self.count = min(self.count + 1, len(self.answers))
+
+    def size(self):
+        return len(self.fields) + self.count
+
+
+class SemanticCache:
+    """Answers keyed by (document, question field or embedding); ``embed(questions)`` returns normalized vectors.
+
+    Only questions without a field are embedded, and only when the document
+    has embedded questions to compare with (``needs_embedding``), so most
+    misses cost no encoder pass.
+    """
+
+    def __init__(self, name, embed, threshold=None, max_documents=None, max_entries=None):
+        self.name = name
+        self.embed = embed
+        self.threshold = threshold if threshold is not None else SEMANTIC_CACHE_THRESHOLD
+        self.max_documents = max(1, max_documents or SEMANTIC_CACHE_DOCUMENTS)
+        self.max_entries = max(1, max_entries or SEMANTIC_CACHE_ENTRIES)
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.field_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._similarity_counts = np.zeros(len(SIMILARITY_BUCKETS) + 1, dtype=np.int64)
+
+    def needs_embedding(self, context, question):
+        """Whether ``lookup`` needs the embedding of ``question`` to find an answer."""
+        if question_field(question) is not None:
+            return False
+        with self._lock:
+            entries = self._documents.get(context_hash(context))
+            return entries is not None and entries.count > 0
+
+    def lookup(self, context, question, vector=None):
+        """The cached answer to the same field as ``question``, or to the question nearest to ``vector``.
+
+        Returns ``(answer, similarity, matched_question)``; the answer is None
+        on a miss. Questions with a field only match that field, with
+        similarity 1.0; the others match the nearest embedded question from
+        the threshold on, and never a question with a field.
+        """
+        key = context_hash(context)
+        field = question_field(question)
+        similarity = None
+        with self._lock:
+            entries = self._documents.get(key)
+            if entries is not None:
+                self._documents.move_to_end(key)
+            if field is not None:
+                hit = entries is not None and field in entries.fields
+                if hit:
+                    self.field_hits += 1
+                    matched, answer = entries.fields[field]
+                    similarity = 1.0
+                result = "field_hit" if hit else "miss"
+            elif entries is None or not entries.count or vector is None:
+                hit, result = False, "empty"
+            else:
+                slot, similarity = entries.nearest(vector)
+                self._similarity_counts[np.searchsorted(SIMILARITY_BUCKETS, similarity)] += 1
+                hit = similarity >= self.threshold
+                if hit:
+                    self.hits += 1
+                    answer, matched = entries.answers[slot], entries.questions[slot]
+                result = "hit" if hit else "miss"
+            if not hit:
+                self.misses += 1
+        if field is None and similarity is not None:
+            SEMANTIC_CACHE_SIMILARITY.observe(similarity, cache=self.name)
+        SEMANTIC_CACHE_LOOKUPS.inc(cache=self.name, result=result)
+        return (answer, similarity, matched) if hit else (None, similarity or 0.0, None)
+
+    def add(self, context, questions, answers, vectors=None):
+        """Store ``answers`` to ``questions`` of ``context``, under their field or their embedding.
+
+        ``vectors`` holds one embedding per question; without it the
+        questions that have no field are embedded here, in one batch.
+        """
+        fields = [question_field(question) for question in questions]
+        if vectors is None:
+            unfielded = [question for question, field in zip(questions, fields) if field is None]
+            embedded = iter(self.embed(unfielded) if unfielded else ())
+            vectors = [next(embedded) if field is None else None for field in fields]
+        key = context_hash(context)
+        with self._lock:
+            entries = self._documents.get(key)
+            if entries is None:
+                entries = self._documents[key] = _DocumentEntries(self.max_entries)
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+                    self.evictions += 1
+            self._documents.move_to_end(key)
+            for question, field, vector, answer in zip(questions, fields, vectors, answers):
+                if field is not None:
+                    entries.fields.setdefault(field, (question, answer))
+                    continue
+                slot, similarity = entries.nearest(vector)
+                if slot is not None and similarity >= 0.999:
+                    # The same question again: keep the first answer instead of filling the ring with copies
+                    continue
+                entries.add(question, vector, answer)
+
+    def clear(self):
+        with self._lock:
+            removed = sum(entries.size() for entries in self._documents.values())
+            self._documents.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.field_hits + self.misses
+            return {
+                "documents": len(self._documents),
+                "max_documents": self.max_documents,
+                "max_entries_per_document": self.max_entries,
+                "entries": sum(entries.size() for entries in self._documents.values()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "field_hits": self.field_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.field_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "similarity_histogram": {
+                    f"le_{bound}": int(count)
+                    for bound, count in zip(SIMILARITY_BUCKETS + ("inf",), np.cumsum(self._similarity_counts))
+                },
+            }
@@ -1,17 +1,39 @@
+import asyncio
 import torch
-from transformers import T5Tokenizer, T5ForConditionalGeneration
-from fastapi import FastAPI, HTTPException
+from transformers import T5Config
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-import math
 import torch.nn as nn
+import logging
 import os
-from typing import Optional
+import time
+from typing import Literal, Optional
+
+from adaptive import Strategy, choose_strategy, deadline_from_ms, strategy_ladder, timer as decode_timer
+from assisted import assisted_decoding_enabled
+from batching import MicroBatcher
+from executor import InferenceSaturated, saturated_response, shared_executor
+from generation import generate_batched
+from hierarchical import DEFAULT_CHUNK_TOKENS, DEFAULT_MAX_MODEL_CALLS, hierarchical_summarize
+from incremental import incremental_summarize
+from jobs import JobQueue, JobStore, default_db_path, job_router
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, STRATEGY_CHOICES, configure_logging, render as render_metrics
+from model_registry import load_custom_model, register_pretrained, register_tokenizer, registry, warmup_mode
+from result_cache import ResultCache, make_key, model_identity
+from singleflight import SingleFlight
+from streaming import admit_stream, stream_generate, streaming_kwargs, streaming_response
+from textrank import textrank_summary
 
 class CustomEncoderDecoderSummarizer(nn.Module):
-    def __init__(self, pretrained_model_name="t5-base", d_model=768):
+    def __init__(self, pretrained_model_name="t5-base", d_model=768, load_pretrained=True):
         super().__init__()
         from transformers import T5ForConditionalGeneration
-        self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
+        if load_pretrained:
+            self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
+        else:
+            # A fine-tuned checkpoint is about to overwrite every weight, so only the architecture is needed
+            self.t5 = T5ForConditionalGeneration(T5Config.from_pretrained(pretrained_model_name))
         self.encoder = self.t5.encoder
         self.decoder = self.t5.decoder
         self.d_model = d_model
@@ -19,12 +41,12 @@ class CustomEncoderDecoderSummarizer(nn.Module):
         self.positional_encoding = self._get_positional_encoding(d_model)
 
     def _get_positional_encoding(self, d_model, max_len=512):
-        pos_encoding = torch.zeros(max_len, d_model)
-        for pos in range(max_len):
-            for i in range(0, d_model, 2):
-                pos_encoding[pos, i] = math.sin(pos / (10000 ** (i / d_model)))
-                if i + 1 < d_model:
-                    pos_encoding[pos, i + 1] = math.cos(pos / (10000 ** (i / d_model)))
+        position = torch.arange(max_len, dtype=torch.float64, device="cpu").unsqueeze(1)
+        even = torch.arange(0, d_model, 2, dtype=torch.float64, device="cpu")
+        angles = position / (10000 ** (even / d_model))
+        pos_encoding = torch.zeros(max_len, d_model, device="cpu")
+        pos_encoding[:, 0::2] = torch.sin(angles)
+        pos_encoding[:, 1::2] = torch.cos(angles[:, :d_model // 2])
         return pos_encoding
 
     def forward(self, input_ids, decoder_input_ids=None, attention_mask=None, labels=None):
@@ -41,46 +63,181 @@ class CustomEncoderDecoderSummarizer(nn.Module):
 # Setup device
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI()
 
+# Model calls run in a fixed number of slots that split the torch threads between them, shared with
+# every other server in this process; requests beyond the admission bound get 429 with Retry-After
+inference = shared_executor()
+app.add_exception_handler(InferenceSaturated, saturated_response)
+
 # Check if we should use a simple model (faster but lower quality)
 USE_SIMPLE_MODEL = True
 
-# Initialize tokenizer and model
-try:
-    print("Loading tokenizer...")
-    tokenizer = T5Tokenizer.from_pretrained("t5-small" if USE_SIMPLE_MODEL else "t5-base")
-    print("Successfully loaded T5Tokenizer")
-    
-    print("Loading model...")
-    if USE_SIMPLE_MODEL:
-        model = T5ForConditionalGeneration.from_pretrained("t5-small")
-    else:
-        model = T5ForConditionalGeneration.from_pretrained("t5-base")
-    model.eval()
-    print("Model loaded successfully")
-    
-except Exception as e:
-    print(f"Error loading model: {str(e)}")
-    print("Falling back to simple summarization")
-    # Fall back to a simpler tokenizer
-    from transformers import AutoTokenizer
-    tokenizer = AutoTokenizer.from_pretrained("t5-base", use_fast=True)
-    print("Using AutoTokenizer as fallback")
-
-model = CustomEncoderDecoderSummarizer(pretrained_model_name="t5-base").to(device)
-model.load_state_dict(torch.load("models/summary_model/model_weight.pth", map_location=device))
-model.eval()
-
-# Setup FastAPI app
-app = FastAPI()
+SUMMARY_MODEL_PATH = "models/summary_model/model_weight.pth"
+
+# The tokenizer and fine-tuned t5-base summarizer are loaded once through the
+# shared registry, in the background at startup
+TOKENIZER_KEY = register_tokenizer("t5-small" if USE_SIMPLE_MODEL else "t5-base")
+SUMMARY_MODEL_KEY = "summarizer"
+
+def load_summary_model(reg):
+    summary_model = load_custom_model(
+        reg,
+        SUMMARY_MODEL_KEY,
+        lambda **kwargs: CustomEncoderDecoderSummarizer(pretrained_model_name="t5-base", **kwargs),
+        SUMMARY_MODEL_PATH,
+        device,
+    )
+    model_id = model_identity("summarizer-t5-base", SUMMARY_MODEL_PATH, reg.info(SUMMARY_MODEL_KEY).get("precision"))
+    reg.set_info(SUMMARY_MODEL_KEY, model_id=model_id)
+    result_cache.retain_only(model_id)
+    return summary_model
+
+registry.register(SUMMARY_MODEL_KEY, load_summary_model)
+
+# Plain t5-small drafts tokens for the fine-tuned t5-base in assisted decoding (same vocabulary);
+# it is only loaded at startup when ASSISTED_DECODING=1, otherwise on the first assisted request
+DRAFT_MODEL_KEY = register_pretrained("t5-small", device)
+
+def get_model():
+    return registry.get(SUMMARY_MODEL_KEY)
+
+def get_tokenizer():
+    return registry.get(TOKENIZER_KEY)
+
+def summary_model_id():
+    get_model()
+    return registry.info(SUMMARY_MODEL_KEY)["model_id"]
+
+# Cached summaries are tied to the exact weights that produced them
+result_cache = ResultCache("summarize")
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        endpoint=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage timings, token counts, truncations and queue wait."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.on_event("startup")
+def warm_up_models():
+    mode = warmup_mode()
+    if mode != "lazy":
+        keys = [TOKENIZER_KEY, SUMMARY_MODEL_KEY] + ([DRAFT_MODEL_KEY] if assisted_decoding_enabled() else [])
+        registry.warm_up(keys, background=(mode != "eager"))
+
+@app.get("/health")
+def health_check():
+    """Liveness: the process is up, whether or not the model has finished loading."""
+    return {"status": "healthy"}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 once the tokenizer and summarizer are loaded, 503 before."""
+    status = registry.status([TOKENIZER_KEY, SUMMARY_MODEL_KEY])
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 # Pydantic model for request body validation
 class SummaryRequest(BaseModel):
     text: str
     max_length: Optional[int] = 150
     min_length: Optional[int] = 30
+    # "truncate" summarizes the first 512 tokens; "hierarchical" map-reduces the whole document;
+    # "incremental" does the same but reuses stored summaries of chunks an earlier version already had;
+    # "extractive" picks sentences with TextRank and needs no model
+    mode: Optional[str] = "truncate"
+    # Latency budget in milliseconds; the decoding strategy is chosen to fit it
+    deadline_ms: Optional[int] = None
+    # Greedy decoding with t5-small drafting tokens; defaults to ASSISTED_DECODING. Ignored with a deadline
+    assisted: Optional[bool] = None
+
+# Beam search settings for /summarize; max_length and min_length come from the request
+SUMMARY_GENERATION_KWARGS = dict(
+    length_penalty=2.0,
+    num_beams=4,
+    early_stopping=True,
+)
+
+# Decoding strategies for requests with a deadline, from the configured beam search to the extractive tier
+SUMMARY_STRATEGIES = strategy_ladder(SUMMARY_GENERATION_KWARGS["num_beams"])
+ASSISTED_STRATEGY = Strategy("assisted", 1, assisted=True)
+SUMMARY_STRATEGIES_BY_NAME = {strategy.name: strategy for strategy in SUMMARY_STRATEGIES + [ASSISTED_STRATEGY]}
+
+def summarize_batch(key, texts, deadlines=None):
+    """Summarize texts that share the same (max_length, min_length, strategy) in one padded batch."""
+    max_length, min_length, strategy_name = key
+    strategy = SUMMARY_STRATEGIES_BY_NAME[strategy_name]
+    if strategy.extractive:
+        return [textrank_summary(text)["summary"] for text in texts]
+    generate_kwargs = strategy.generate_kwargs(dict(SUMMARY_GENERATION_KWARGS, max_length=max_length), min_length)
+    if strategy.assisted:
+        generate_kwargs["assistant_model"] = registry.get(DRAFT_MODEL_KEY)
+    return generate_batched(
+        get_model().t5,
+        get_tokenizer(),
+        ["summarize: " + text for text in texts],
+        device,
+        max_batch_size=len(texts),
+        task="summarize",
+        deadlines=deadlines,
+        min_length=min_length,
+        **generate_kwargs,
+    )
+
+# Concurrent /summarize requests arriving within a short window share one generate() call
+summary_batcher = MicroBatcher(
+    lambda key, items: summarize_batch(key, [text for text, _ in items], [deadline for _, deadline in items]),
+    name="summarize",
+    executor=inference,
+)
+
+def use_assisted(request):
+    return request.assisted if request.assisted is not None else assisted_decoding_enabled()
+
+def summary_cache_key(text, mode, max_length, min_length, decoding):
+    # Assisted (greedy) and beam-search summaries differ, so they are cached separately
+    return make_key(
+        text,
+        f"summarize:{mode}",
+        summary_model_id(),
+        {"max_length": max_length, "min_length": min_length, "decoding": decoding},
+    )
+
+def choose_summary_strategy(request, deadline):
+    """The best strategy for ``request`` that is expected to finish before ``deadline``."""
+    if deadline is None and use_assisted(request):
+        STRATEGY_CHOICES.inc(task="summarize", strategy=ASSISTED_STRATEGY.name)
+        return ASSISTED_STRATEGY
+    calls = 1
+    if request.mode in ("hierarchical", "incremental"):
+        # Roughly 0.75 words per token, plus the final reduce pass
+        calls = min(DEFAULT_MAX_MODEL_CALLS, 1 + int(len(request.text.split()) / (0.75 * DEFAULT_CHUNK_TOKENS)))
+    strategy = choose_strategy(
+        "summarize", SUMMARY_STRATEGIES, deadline, request.max_length, request.min_length, rows=calls,
+        expected_wait=summary_batcher.mean_queue_wait,
+    )
+    STRATEGY_CHOICES.inc(task="summarize", strategy=strategy.name)
+    return strategy
+
+def deadline_exceeded(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+# Concurrent identical /summarize requests without a deadline share one computation
+summary_flights = SingleFlight("summarize")
 
 @app.post("/summarize")
 async def summarize(request: SummaryRequest):
@@ -88,42 +245,173 @@ async def summarize(request: SummaryRequest):
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text cannot be empty")
             
-        print(f"Received summarization request (text length: {len(request.text)})")
-        
-        # Tokenize input text with a summarization prefix
-        inputs = tokenizer("summarize: " + request.text, 
-                         return_tensors="pt", 
-                         max_length=512, 
-                         truncation=True)
-        
-        # Generate summary
-        summary_ids = model.t5.generate(
-            inputs.input_ids.to(device),
-            max_length=request.max_length,
-            min_length=request.min_length,
-            length_penalty=2.0,
-            num_beams=4,
-            early_stopping=True
-        )
-        
-        # Decode and return summary
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        print(f"Generated summary (length: {len(summary)})")
-        return {"summary": summary}
+        logger.debug("Summarization request (%d characters, mode %s)", len(request.text), request.mode)
+        deadline = deadline_from_ms(request.deadline_ms)
+
+        if request.mode == "extractive":
+            result = await asyncio.get_running_loop().run_in_executor(None, textrank_summary, request.text)
+            return {"mode": "extractive", **result}
+
+        # summary_model_id() waits for the model to load and the cache may read sqlite,
+        # so the lookup runs off the event loop
+        def lookup():
+            cache_key = summary_cache_key(
+                request.text,
+                request.mode,
+                request.max_length,
+                request.min_length,
+                "assisted" if deadline is None and use_assisted(request) else "beam",
+            )
+            return cache_key, result_cache.get(cache_key)
+
+        cache_key, cached = await asyncio.get_running_loop().run_in_executor(None, lookup)
+        if cached is not None:
+            return cached
+
+        async def generate():
+            strategy = choose_summary_strategy(request, deadline)
+            key = (request.max_length, request.min_length, strategy.name)
+            # Chunks are summarized one batch at a time within the slot, so the slot bound holds
+            with inference.admit("summarize"):
+                if request.mode == "hierarchical":
+                    result = await inference.run(
+                        "summarize", hierarchical_summarize,
+                        request.text, get_tokenizer(),
+                        lambda texts: summarize_batch(key, texts, [deadline] * len(texts)),
+                        workers=1,
+                    )
+                    logger.debug("Hierarchical summary from %d chunks", result["chunk_count"])
+                    response = {"mode": "hierarchical", **result}
+                elif request.mode == "incremental":
+                    # The deadline only picks the decoding: chunk summaries cut short by it must not be stored
+                    result = await inference.run(
+                        "summarize", incremental_summarize,
+                        request.text, get_tokenizer(), lambda texts: summarize_batch(key, texts),
+                        result_cache, summary_model_id(),
+                        {"max_length": request.max_length, "min_length": request.min_length,
+                         "decoding": strategy.name},
+                        workers=1,
+                    )
+                    logger.debug("Incremental summary: %d chunks reused, %d recomputed",
+                                 result["chunks_reused"], result["chunks_recomputed"])
+                    return {"mode": "incremental", **result, "strategy": strategy.name,
+                            "deadline_exceeded": deadline_exceeded(deadline)}
+                else:
+                    # Requests are only batched with others that use the same length limits and decoding
+                    summary = await summary_batcher.submit((request.text, deadline), key=key)
+                    response = {"summary": summary}
+            response["strategy"] = strategy.name
+
+            # Only summaries from the configured or assisted decoding are cached for later requests
+            if strategy in (SUMMARY_STRATEGIES[0], ASSISTED_STRATEGY) and not deadline_exceeded(deadline):
+                await asyncio.get_running_loop().run_in_executor(
+                    None, result_cache.put, cache_key, response, summary_model_id()
+                )
+            return {**response, "deadline_exceeded": deadline_exceeded(deadline)}
+
+        if deadline is None:
+            # Identical requests arriving meanwhile wait for this one instead of decoding again
+            return await summary_flights.run(cache_key, generate)
+        return await generate()
         
-    except Exception as e:
-        print(f"Error in summarization: {str(e)}")
-        # Fallback to simple summarization if model fails
-        words = request.text.split()
-        if len(words) > 100:
-            summary = " ".join(words[:100]) + "... [Summary truncated]"
-        else:
-            summary = request.text
-        return {"summary": summary, "warning": "Using fallback summarization"}
+    except InferenceSaturated:
+        raise
+    except Exception:
+        logger.exception("Summarization failed; falling back to the extractive summary")
+        # Fall back to the extractive summarizer if the model fails
+        summary = (await asyncio.get_running_loop().run_in_executor(None, textrank_summary, request.text))["summary"]
+        return {"summary": summary, "mode": "extractive", "warning": "Using fallback summarization"}
+
+class SummarizeJobParams(BaseModel):
+    max_length: int = 150
+    min_length: int = 30
+    mode: Literal["truncate", "hierarchical", "extractive"] = "truncate"
+    assisted: Optional[bool] = None
+
+def run_summarize_job(params, texts):
+    """Job handler: summaries for several documents; in truncate mode they share padded batches."""
+    params = SummarizeJobParams(**params)
+    if params.mode == "extractive":
+        return [{"mode": "extractive", **textrank_summary(text)} for text in texts]
+
+    strategy = ASSISTED_STRATEGY if use_assisted(params) else SUMMARY_STRATEGIES[0]
+    key = (params.max_length, params.min_length, strategy.name)
+    cache_keys = [
+        summary_cache_key(text, params.mode, params.max_length, params.min_length,
+                          "assisted" if strategy.assisted else "beam")
+        for text in texts
+    ]
+    results = [result_cache.get(cache_key) for cache_key in cache_keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if params.mode == "hierarchical":
+        for i in missing:
+            result = hierarchical_summarize(texts[i], get_tokenizer(), lambda chunks: summarize_batch(key, chunks))
+            results[i] = {"mode": "hierarchical", **result, "strategy": strategy.name}
+    elif missing:
+        summaries = summarize_batch(key, [texts[i] for i in missing])
+        for i, summary in zip(missing, summaries):
+            results[i] = {"summary": summary, "strategy": strategy.name}
+
+    for i in missing:
+        result_cache.put(cache_keys[i], results[i], summary_model_id())
+    return results
+
+# Bulk summarization of many documents runs as background jobs that survive restarts
+job_queue = JobQueue(JobStore(default_db_path("summarize")), executor=inference)
+job_queue.register("summarize", run_summarize_job, SummarizeJobParams)
+app.include_router(job_router(job_queue, "summarize"))
+
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start()
+
+class StreamSummaryRequest(SummaryRequest):
+    do_sample: Optional[bool] = False
+    temperature: Optional[float] = 1.0
+    top_p: Optional[float] = 0.95
+
+@app.post("/summarize/stream")
+async def summarize_stream(request: StreamSummaryRequest, http_request: Request):
+    """Stream the summary as Server-Sent Events while it is being generated."""
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+    logger.debug("Streaming summarization request (%d characters)", len(request.text))
+    admission = admit_stream(inference, "summarize_stream")
+    events = stream_generate(
+        http_request,
+        inference,
+        "summarize_stream",
+        lambda: (get_model().t5, get_tokenizer(), "summarize: " + request.text),
+        device,
+        admission=admission,
+        max_length=request.max_length,
+        min_length=request.min_length,
+        **streaming_kwargs(request.do_sample, request.temperature, request.top_p),
+    )
+    return streaming_response(events, admission)
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    return {
+        "summarize": summary_batcher.stats(),
+        "decode_timing": decode_timer.stats(),
+        "inference": inference.stats(),
+        "coalescing": summary_flights.stats(),
+    }
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.post("/cache/invalidate")
+def invalidate_cache(model_id: Optional[str] = None):
+    """Drop cached summaries, e.g. after replacing the model weights."""
+    return {"removed": result_cache.invalidate(model_id)}
 
 # Start the server if this file is run directly
 if __name__ == "__main__":
     import uvicorn
-    print("Starting summarization server on port 8001...")
-    print(f"Using {'simple' if USE_SIMPLE_MODEL else 'full'} model")
+    logger.info("Starting summarization server on port 8001 with the %s model", "simple" if USE_SIMPLE_MODEL else "full")
     uvicorn.run(app, host="0.0.0.0", port=8001, log_level="info")
@@ -0,0 +1,83 @@
+# backend/singleflight.py
+"""Coalescing of identical in-flight requests.
+
+When several clients send the same work at nearly the same time (a shared
+document opened in several browsers), ``SingleFlight.run(key, fn)`` starts
+``fn()`` once and lets every caller with the same key await that one
+computation.
+
+The computation runs as its own task, and every caller, including the
+first, waits on it through ``asyncio.shield``. A caller that disconnects
+therefore stops waiting without cancelling the work the others are waiting
+for. The task is cancelled only when no caller is left. If it fails, every
+caller gets the same exception, and the next request with the key starts
+afresh.
+"""
+import asyncio
+
+from metrics import COALESCED_REQUESTS, COALESCING_FAILURES
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent ``run`` calls per key within one event loop."""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+
+        self.leaders = 0
+        self.followers = 0
+        self.failures = 0
+
+    async def run(self, key, fn):
+        """Await ``fn()``, or the identical call already in flight for ``key``."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._landed(key, flight))
+            self.leaders += 1
+            COALESCED_REQUESTS.inc(endpoint=self.name, role="leader")
+        else:
+            self.followers += 1
+            COALESCED_REQUESTS.inc(endpoint=self.name, role="follower")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting for the result any more; the next call with the key starts afresh
+                # instead of joining the cancelled task before it has landed
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _landed(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self.failures += 1
+            COALESCING_FAILURES.inc(endpoint=self.name)
+
+    @property
+    def in_flight(self):
+        return len(self._flights)
+
+    def stats(self):
+        calls = self.leaders + self.followers
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "computations": self.leaders,
+            "coalesced": self.followers,
+            "failures": self.failures,
+            "deduplicated_fraction": self.followers / calls if calls else 0.0,
+        }
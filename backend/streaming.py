@@ -0,0 +1,159 @@
+# backend/streaming.py
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import ExitStack
+
+import torch
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+from metrics import STAGE_SECONDS, GenerationStages
+
+logger = logging.getLogger(__name__)
+
+# How often the stream checks whether the client is still connected while waiting for tokens
+POLL_SECONDS = 0.25
+
+
+class CancelledByClient(StoppingCriteria):
+    """Stops generate() as soon as ``event`` is set."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _next_chunk(streamer):
+    try:
+        return next(streamer)
+    except StopIteration:
+        return None
+    except queue.Empty:
+        return ""
+
+
+def _next_streamer(streamers):
+    try:
+        return streamers.get(timeout=POLL_SECONDS)
+    except queue.Empty:
+        return ""
+
+
+def admit_stream(executor, task):
+    """Count a stream against ``task``'s admission bound until ``stream_generate`` releases it.
+
+    Raises InferenceSaturated (a 429) while the handler can still answer
+    with an error status, before the streamed response has started.
+    """
+    admission = ExitStack()
+    admission.enter_context(executor.admit(task))
+    return admission
+
+
+async def stream_generate(request, executor, task, prepare, device, max_input_length=512, admission=None,
+                          **generate_kwargs):
+    """Yield Server-Sent Events with text decoded while ``model.generate`` runs.
+
+    ``prepare()`` returns ``(model, tokenizer, prompt)``. It runs together
+    with generate() as one call in a slot of ``executor`` under ``task``,
+    so loading the model, retrieving context and tokenizing stay off the
+    event loop, and streams count against the slot bound like every other
+    model call. generate() feeds a TextIteratorStreamer. If the client
+    disconnects (or the response is closed) the stopping criterion is
+    tripped, so the model stops at the next decoding step, and a call
+    still waiting for a slot is dropped. ``admission`` (from
+    ``admit_stream``) is released when the stream ends. Time to the first
+    streamed text is recorded as the ``first_token`` stage.
+    """
+    stages = GenerationStages(task)
+    start = time.perf_counter()
+    streamers = queue.Queue()
+    cancelled = threading.Event()
+
+    def run():
+        try:
+            model, tokenizer, prompt = prepare()
+            with stages.stage("tokenize"):
+                inputs = tokenizer(prompt, return_tensors="pt", max_length=max_input_length, truncation=True)
+            stages.record_inputs(inputs.attention_mask, max_input_length)
+            streamer = TextIteratorStreamer(
+                tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=POLL_SECONDS
+            )
+        except Exception:
+            logger.exception("Preparing the streamed generation failed")
+            streamers.put(None)
+            return
+        streamers.put(streamer)
+        try:
+            with torch.no_grad():
+                model.generate(
+                    input_ids=inputs.input_ids.to(device),
+                    attention_mask=inputs.attention_mask.to(device),
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([CancelledByClient(cancelled)]),
+                    **generate_kwargs,
+                )
+        except Exception:
+            logger.exception("Streamed generation failed")
+            streamer.end()
+
+    call = executor.submit(task, run)
+    loop = asyncio.get_running_loop()
+    pieces = []
+    try:
+        streamer = ""
+        while streamer == "":
+            if await request.is_disconnected():
+                logger.debug("Client disconnected before generation started")
+                return
+            streamer = await loop.run_in_executor(None, _next_streamer, streamers)
+        if streamer is None:
+            yield sse_event({"error": "generation failed"}, event="error")
+            return
+        while True:
+            if await request.is_disconnected():
+                logger.debug("Client disconnected, stopping generation")
+                return
+            chunk = await loop.run_in_executor(None, _next_chunk, streamer)
+            if chunk is None:
+                break
+            if chunk:
+                if not pieces:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, task=task, stage="first_token")
+                pieces.append(chunk)
+                yield sse_event({"text": chunk})
+        yield sse_event({"text": "".join(pieces)}, event="done")
+    finally:
+        cancelled.set()
+        call.cancel()
+        if admission is not None:
+            admission.close()
+
+
+def streaming_response(events, admission=None):
+    """The SSE response for ``events``; ``admission`` is also released if the stream never starts."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(admission.close) if admission is not None else None,
+    )
+
+
+def streaming_kwargs(do_sample=False, temperature=1.0, top_p=0.95):
+    """Decoding settings for streamed responses: greedy by default, sampling on request."""
+    if do_sample:
+        return dict(num_beams=1, do_sample=True, temperature=temperature, top_p=top_p)
+    return dict(num_beams=1, do_sample=False)
@@ -0,0 +1,149 @@
+# backend/stub_model.py
+import os
+import threading
+import time
+
+import torch
+from torch import nn
+
+PAD_ID, EOS_ID, UNK_ID = 0, 1, 2
+
+
+def stub_models_enabled():
+    """TALQS_STUB_MODELS=1 swaps every T5 model and tokenizer for the stubs below.
+
+    Used by the benchmark suite in CI to exercise the servers' non-model
+    code (batching, caching, retrieval, HTTP handling) without weights.
+    """
+    return os.environ.get("TALQS_STUB_MODELS", "0") == "1"
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the subset of the Hugging Face API the servers use."""
+
+    pad_token_id = PAD_ID
+    eos_token_id = EOS_ID
+
+    def __init__(self):
+        self._ids = {"<pad>": PAD_ID, "</s>": EOS_ID, "<unk>": UNK_ID}
+        self._words = ["<pad>", "</s>", "<unk>"]
+        self._lock = threading.Lock()
+
+    def _id(self, word):
+        token_id = self._ids.get(word)
+        if token_id is None:
+            with self._lock:
+                token_id = self._ids.setdefault(word, len(self._words))
+                if token_id == len(self._words):
+                    self._words.append(word)
+        return token_id
+
+    def _encode(self, text, add_special_tokens=True, max_length=None, truncation=False):
+        ids = [self._id(word) for word in text.split()]
+        if add_special_tokens:
+            ids.append(EOS_ID)
+        if truncation and max_length is not None:
+            ids = ids[:max_length]
+        return ids
+
+    def __call__(self, texts, return_tensors=None, padding=False, max_length=None, truncation=False,
+                 add_special_tokens=True):
+        single = isinstance(texts, str)
+        batch = [self._encode(t, add_special_tokens, max_length, truncation) for t in ([texts] if single else texts)]
+        if return_tensors != "pt":
+            return {"input_ids": batch[0] if single else batch}
+
+        width = max((len(ids) for ids in batch), default=0)
+        input_ids = torch.full((len(batch), width), PAD_ID, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, ids in enumerate(batch):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+        return _Encoding(input_ids=input_ids, attention_mask=attention_mask)
+
+    def encode(self, text, return_tensors=None, max_length=None, truncation=False):
+        ids = self._encode(text, True, max_length, truncation)
+        return torch.tensor([ids], dtype=torch.long) if return_tensors == "pt" else ids
+
+    def decode(self, ids, skip_special_tokens=False, **kwargs):
+        if isinstance(ids, torch.Tensor):
+            ids = ids.tolist()
+        words = [self._words[i] if i < len(self._words) else "<unk>" for i in ids]
+        if skip_special_tokens:
+            words = [w for w in words if w not in ("<pad>", "</s>", "<unk>")]
+        return " ".join(words)
+
+    def batch_decode(self, sequences, skip_special_tokens=False, **kwargs):
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+
+class _Encoding(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class StubEncoder(nn.Module):
+    """Fixed random embedding per token id, so equal words get equal hidden states."""
+
+    def __init__(self, buckets=4096, d_model=64):
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.embed = nn.Embedding(buckets, d_model)
+        with torch.no_grad():
+            self.embed.weight.copy_(torch.randn(buckets, d_model, generator=generator))
+
+    def forward(self, input_ids=None, attention_mask=None, **kwargs):
+        return _Encoding(last_hidden_state=self.embed(input_ids % self.embed.num_embeddings))
+
+
+class StubSeq2SeqModel(nn.Module):
+    """Stands in for T5ForConditionalGeneration (and the custom wrappers via ``.t5``).
+
+    ``generate`` echoes the leading input tokens, honours max/min length,
+    streamers and stopping criteria, and can simulate decoding cost with
+    STUB_SECONDS_PER_TOKEN (per token, per beam).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.seconds_per_token = float(os.environ.get("STUB_SECONDS_PER_TOKEN", 0))
+        self.encoder = StubEncoder()
+
+    @property
+    def t5(self):
+        return self
+
+    def get_encoder(self):
+        return self.encoder
+
+    def generate(self, input_ids=None, attention_mask=None, max_length=20, min_length=0, num_beams=1,
+                 streamer=None, stopping_criteria=None, **kwargs):
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        rows = []
+        for ids, mask in zip(input_ids, attention_mask):
+            tokens = [t for t in ids[mask.bool()].tolist() if t != EOS_ID]
+            length = max(min_length, min(max_length - 2, len(tokens)))
+            rows.append([PAD_ID] + (tokens * (length // max(1, len(tokens)) + 1))[:length] + [EOS_ID])
+
+        width = max(len(r) for r in rows)
+        output = torch.full((len(rows), width), PAD_ID, dtype=torch.long)
+        for i, row in enumerate(rows):
+            output[i, :len(row)] = torch.tensor(row, dtype=torch.long)
+
+        if streamer is not None:
+            streamer.put(output[:, :1])
+        for step in range(1, width):
+            if self.seconds_per_token:
+                time.sleep(self.seconds_per_token * num_beams)
+            if streamer is not None:
+                streamer.put(output[0, step:step + 1])
+            if stopping_criteria is not None and all(stopping_criteria(output[:, :step + 1], None)):
+                output = output[:, :step + 1]
+                break
+        if streamer is not None:
+            streamer.end()
+        return output
@@ -0,0 +1,228 @@
+"""Summarize and/or answer the default questions for a directory or JSONL file of documents, offline.
+
+Documents are sent in batches to a pool of worker processes. Each worker
+loads its own models once and runs batched generation over every batch
+it gets. Results are appended to a JSONL file as soon as a batch is
+finished. A document whose content hash is already in the output with all
+requested tasks is skipped, so an interrupted run can simply be started
+again.
+
+Usage (from backend/summarization):
+
+    python cli.py cases/ --out results.jsonl
+    python cli.py cases.jsonl --tasks summarize qa --workers 4 --batch-size 8 --out results.jsonl
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# The QA model and the shared helpers live in the parent backend/ directory; spawned workers
+# import this module first, so they get the path too
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TASKS = ("summarize", "qa")
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_documents(source, extensions=(".txt",)):
+    """Yield {id, text} from a directory of text files (recursively) or a JSONL file with a "text" field."""
+    if os.path.isdir(source):
+        for root, _, files in sorted(os.walk(source)):
+            for name in sorted(files):
+                if name.endswith(extensions):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        yield {"id": os.path.relpath(path, source), "text": f.read()}
+        return
+
+    with open(source, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield {"id": str(record.get("id", line_number)), "text": record["text"]}
+
+
+def completed_hashes(path, tasks):
+    """Content hashes already in the output file with a result for every task in ``tasks``."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run; the document is processed again
+                continue
+            if all(task in record.get("results", {}) for task in tasks):
+                done.add(record["sha256"])
+    return done
+
+
+def _init_worker(tasks, model_path, tokenizer_path, threads):
+    import torch
+    torch.set_num_threads(threads)
+
+    _worker["tasks"] = tasks
+    if "summarize" in tasks:
+        from model import SummarizerModel
+        summarizer = SummarizerModel.get_instance()
+        summarizer.initialize(model_path, tokenizer_path)
+        _worker["summarizer"] = summarizer
+    if "qa" in tasks:
+        # The QA model, retrieval and question list, without the web server
+        import qa
+        qa.get_model()
+        _worker["qa"] = qa
+
+
+def _process_batch(documents, batch_size):
+    """Run the requested tasks over one batch of documents inside a worker."""
+    texts = [doc["text"] for doc in documents]
+    results = [{} for _ in documents]
+    seconds = {}
+
+    if "summarize" in _worker["tasks"]:
+        start = time.perf_counter()
+        for result, summary in zip(results, _worker["summarizer"].summarize_batch(texts, batch_size)):
+            result["summarize"] = summary
+        seconds["summarize"] = time.perf_counter() - start
+
+    if "qa" in _worker["tasks"]:
+        qa = _worker["qa"]
+        questions = qa.default_questions
+        start = time.perf_counter()
+        # Questions of every document in the batch share generate() calls
+        answers = qa.generate_answers([(q, text) for text in texts for q in questions])
+        for n, result in enumerate(results):
+            result["qa"] = [
+                {"question": q, "answer": a}
+                for q, a in zip(questions, answers[n * len(questions):(n + 1) * len(questions)])
+            ]
+        seconds["qa"] = time.perf_counter() - start
+
+    return [
+        {"id": doc["id"], "sha256": doc["sha256"], "words": len(doc["text"].split()), "results": result}
+        for doc, result in zip(documents, results)
+    ], seconds, os.getpid()
+
+
+def batches(documents, size):
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(args):
+    tasks = tuple(dict.fromkeys(args.tasks))
+    done = set() if args.overwrite else completed_hashes(args.out, tasks)
+    stats = {"documents": 0, "words": 0, "skipped": 0, "failed": 0, "model_seconds": {task: 0.0 for task in tasks}}
+    seen = set()
+
+    def pending_documents():
+        for doc in read_documents(args.source):
+            doc["sha256"] = content_hash(doc["text"])
+            # Duplicates within the input are processed once too
+            if doc["sha256"] in done or doc["sha256"] in seen or not doc["text"].strip():
+                stats["skipped"] += 1
+                continue
+            seen.add(doc["sha256"])
+            yield doc
+
+    cpu_count = os.cpu_count() or 1
+    threads = args.threads or max(1, cpu_count // args.workers)
+    print(f"Running {', '.join(tasks)} with {args.workers} workers x {threads} threads, "
+          f"batches of {args.batch_size}; {len(done)} documents already done")
+
+    start = time.perf_counter()
+    with open(args.out, "w" if args.overwrite else "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(tasks, args.model_path, args.tokenizer_path, threads),
+    ) as pool:
+        queued = {}
+        source = batches(pending_documents(), args.batch_size)
+        exhausted = False
+        while True:
+            # Keep a couple of batches per worker in flight so input is read lazily
+            while not exhausted and len(queued) < 2 * args.workers:
+                batch = next(source, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                queued[pool.submit(_process_batch, batch, args.batch_size)] = batch
+            if not queued:
+                break
+
+            finished, _ = wait(queued, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = queued.pop(future)
+                try:
+                    records, seconds, pid = future.result()
+                except Exception as e:
+                    stats["failed"] += len(batch)
+                    print(f"Batch starting with {batch[0]['id']} failed: {e}", file=sys.stderr)
+                    continue
+                for record in records:
+                    out.write(json.dumps({**record, "worker": pid}) + "\n")
+                    stats["documents"] += 1
+                    stats["words"] += record["words"]
+                out.flush()
+                for task, value in seconds.items():
+                    stats["model_seconds"][task] += value
+                elapsed = time.perf_counter() - start
+                print(f"{stats['documents']} documents, {stats['documents'] / elapsed:.2f} docs/s", end="\r")
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["documents_per_second"] = stats["documents"] / elapsed if elapsed else 0.0
+    stats["words_per_second"] = stats["words"] / elapsed if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of .txt files or a JSONL file with a \"text\" field per line")
+    parser.add_argument("--out", required=True, help="JSONL output; existing results are kept and skipped")
+    parser.add_argument("--tasks", nargs="+", choices=TASKS, default=["summarize"])
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes, each with its own models")
+    parser.add_argument("--threads", type=int, default=0, help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Documents per batch sent to a worker")
+    parser.add_argument("--model-path", default=os.environ.get("MODEL_PATH", "models/summary_model/epoch10.pth"))
+    parser.add_argument("--tokenizer-path", default=os.environ.get("TOKENIZER_PATH", "t5-base"))
+    parser.add_argument("--overwrite", action="store_true", help="Start a fresh output file instead of resuming")
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+    args.batch_size = max(1, args.batch_size)
+
+    stats = run(args)
+    print()
+    print(
+        f"Processed {stats['documents']} documents ({stats['words']} words) in {stats['seconds']:.1f}s: "
+        f"{stats['documents_per_second']:.2f} docs/s, {stats['words_per_second']:.0f} words/s; "
+        f"{stats['skipped']} skipped, {stats['failed']} failed"
+    )
+    for task, seconds in stats["model_seconds"].items():
+        print(f"  {task}: {seconds:.1f}s of model time across workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,24 @@
 import torch
 from torch import nn
-from transformers import T5Tokenizer, T5ForConditionalGeneration
+from transformers import StoppingCriteriaList, T5Config, T5Tokenizer, T5ForConditionalGeneration
 import os
-import math
+import sys
+import threading
+import time
+
+# Shared helpers (batched generation, chunking) live in the parent backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import adaptive
+from adaptive import DeadlineCriteria, choose_strategy, strategy_ladder
+from generation import generate_batched
+from hierarchical import hierarchical_summarize
+from incremental import incremental_summarize
+from metrics import DEADLINE_STOPS, STRATEGY_CHOICES, GenerationStages, maybe_profile
+from model_registry import build_from_state_dict, read_checkpoint
+from precision import apply_precision
+from result_cache import ResultCache
+from stub_model import StubSeq2SeqModel, StubTokenizer, stub_models_enabled
+from textrank import textrank_summary
 
 # Set device
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -10,9 +26,13 @@ print(f"Using device: {device}")
 
 # Custom Model Wrapper
 class CustomEncoderDecoderSummarizer(nn.Module):
-    def __init__(self, pretrained_model_name="t5-base", d_model=768):
+    def __init__(self, pretrained_model_name="t5-base", d_model=768, load_pretrained=True):
         super().__init__()
-        self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
+        if load_pretrained:
+            self.t5 = T5ForConditionalGeneration.from_pretrained(pretrained_model_name)
+        else:
+            # A fine-tuned checkpoint is about to overwrite every weight, so only the architecture is needed
+            self.t5 = T5ForConditionalGeneration(T5Config.from_pretrained(pretrained_model_name))
         self.encoder = self.t5.encoder
         self.decoder = self.t5.decoder
         self.d_model = d_model
@@ -20,12 +40,12 @@ class CustomEncoderDecoderSummarizer(nn.Module):
         self.positional_encoding = self._get_positional_encoding(d_model)
 
     def _get_positional_encoding(self, d_model, max_len=512):
+        position = torch.arange(max_len, dtype=torch.float64).unsqueeze(1)
+        even = torch.arange(0, d_model, 2, dtype=torch.float64)
+        angles = position / (10000 ** (even / d_model))
         pos_encoding = torch.zeros(max_len, d_model)
-        for pos in range(max_len):
-            for i in range(0, d_model, 2):
-                pos_encoding[pos, i] = math.sin(pos / (10000 ** (i / d_model)))
-                if i + 1 < d_model:
-                    pos_encoding[pos, i + 1] = math.cos(pos / (10000 ** (i / d_model)))
+        pos_encoding[:, 0::2] = torch.sin(angles)
+        pos_encoding[:, 1::2] = torch.cos(angles[:, :d_model // 2])
         return pos_encoding
 
     def forward(self, input_ids, decoder_input_ids=None, attention_mask=None, labels=None):
@@ -52,31 +72,71 @@ class CustomEncoderDecoderSummarizer(nn.Module):
             print(f"Error loading model: {e}")
             return False
 
+# Beam search settings shared by the single and batched summary helpers
+SUMMARY_GENERATION_KWARGS = dict(
+    num_beams=4,
+    temperature=1.0,
+    no_repeat_ngram_size=2,
+    repetition_penalty=1.5,
+    length_penalty=1.0,
+    top_k=50,
+    top_p=0.95,
+    early_stopping=True,
+)
+
+# Decoding strategies for requests with a deadline, from the configured beam search to the extractive tier
+SUMMARY_STRATEGIES = strategy_ladder(SUMMARY_GENERATION_KWARGS["num_beams"])
+
 # Generate summary for a given text
-def generate_summary(model, tokenizer, text, max_input_length=512, max_output_length=200):
+def generate_summary(model, tokenizer, text, max_input_length=512, max_output_length=200, strategy=None,
+                     deadline=None):
+    """``strategy`` overrides the beam search; generation stops at ``deadline`` (time.monotonic())."""
     model.eval()
+    generate_kwargs = (strategy or SUMMARY_STRATEGIES[0]).generate_kwargs(
+        dict(SUMMARY_GENERATION_KWARGS, max_length=max_output_length)
+    )
+    if deadline is not None:
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList([DeadlineCriteria([deadline])])
+    stages = GenerationStages("summarize", model.t5)
     input_text = "summarize: " + text
-    input_ids = tokenizer.encode(
-        input_text,
-        return_tensors="pt",
-        max_length=max_input_length,
-        truncation=True
-    ).to(device)
-
-    with torch.no_grad():
+    with stages.stage("tokenize"):
+        input_ids = tokenizer.encode(
+            input_text,
+            return_tensors="pt",
+            max_length=max_input_length,
+            truncation=True
+        ).to(device)
+    stages.record_inputs(torch.ones_like(input_ids), max_input_length)
+
+    started = time.perf_counter()
+    with maybe_profile("summarize"), stages.generate(), torch.no_grad():
         summary_ids = model.t5.generate(
             input_ids=input_ids,
-            max_length=max_output_length,
-            num_beams=4,
-            temperature=1.0,
-            no_repeat_ngram_size=2,
-            repetition_penalty=1.5,
-            length_penalty=1.0,
-            top_k=50,
-            top_p=0.95,
-            early_stopping=True
+            **generate_kwargs
         )
-    return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+    adaptive.timer.record("summarize", time.perf_counter() - started, summary_ids.shape[1] - 1,
+                          generate_kwargs["num_beams"])
+    stages.record_outputs(summary_ids, tokenizer.pad_token_id)
+    if deadline is not None and time.monotonic() >= deadline:
+        DEADLINE_STOPS.inc(task="summarize")
+
+    with stages.stage("detokenize"):
+        return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+
+# Generate summaries for several texts in padded batches
+def generate_summaries(model, tokenizer, texts, max_input_length=512, max_output_length=200, max_batch_size=4):
+    model.eval()
+    return generate_batched(
+        model.t5,
+        tokenizer,
+        ["summarize: " + text for text in texts],
+        device,
+        max_batch_size=max_batch_size,
+        max_input_length=max_input_length,
+        task="summarize",
+        max_length=max_output_length,
+        **SUMMARY_GENERATION_KWARGS
+    )
 
 # Create singleton model class
 class SummarizerModel:
@@ -84,54 +144,157 @@ class SummarizerModel:
     _model = None
     _tokenizer = None
     _is_initialized = False
+    # Per-chunk summaries for incremental summarization, created on first use
+    _chunk_cache = None
+    # Concurrent first requests must not each run initialize()
+    _init_lock = threading.Lock()
 
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = SummarizerModel()
+        with cls._init_lock:
+            if cls._instance is None:
+                cls._instance = SummarizerModel()
         return cls._instance
 
     def initialize(self, model_path="models/summary_model/epoch10.pth", tokenizer_path="t5-base"):
         """Initialize the model and tokenizer."""
-        if not self._is_initialized:
+        with self._init_lock:
+            if self._is_initialized:
+                return
+            if stub_models_enabled():
+                print("TALQS_STUB_MODELS=1: using the stub summarizer")
+                self._model, self._tokenizer = StubSeq2SeqModel(), StubTokenizer()
+                self._is_initialized = True
+                return
             try:
                 print("Initializing summarizer model...")
-                # Load tokenizer
-                self._tokenizer = T5Tokenizer.from_pretrained(tokenizer_path if os.path.exists(tokenizer_path) else "t5-base")
-                
-                # Load model
-                self._model = CustomEncoderDecoderSummarizer().to(device)
-                
-                # Check if model weights exist
                 if os.path.exists(model_path):
-                    self._model.load_model(model_path)
+                    # The fine-tuned weights overwrite every parameter: build the bare architecture
+                    # around the memory-mapped checkpoint instead of loading t5-base first
+                    state_dict = read_checkpoint(model_path, device)
+                    self._model = build_from_state_dict(CustomEncoderDecoderSummarizer, state_dict).to(device)
+                    print(f"Successfully loaded model from {model_path}")
                 else:
                     print(f"Model weights not found at {model_path}, using base t5 model")
-                
-                self._is_initialized = True
-                print("Summarizer model initialized successfully")
+                    self._model = CustomEncoderDecoderSummarizer().to(device)
+                self._model.eval()
+
+                self._finish_initialization(tokenizer_path)
             except Exception as e:
                 print(f"Error initializing model: {e}")
                 raise
 
+    def initialize_from_state_dict(self, state_dict, tokenizer_path="t5-base"):
+        """Initialize around weights that are already in (shared) memory, without copying them."""
+        with self._init_lock:
+            if self._is_initialized:
+                return
+            if stub_models_enabled():
+                self._model, self._tokenizer = StubSeq2SeqModel(), StubTokenizer()
+                self._is_initialized = True
+                return
+            print("Initializing summarizer model from shared weights...")
+            self._model = build_from_state_dict(CustomEncoderDecoderSummarizer, state_dict).to(device)
+            self._model.eval()
+            self._finish_initialization(tokenizer_path)
+
+    def _finish_initialization(self, tokenizer_path):
+        # Load tokenizer
+        self._tokenizer = T5Tokenizer.from_pretrained(tokenizer_path if os.path.exists(tokenizer_path) else "t5-base")
+
+        # fp32, dynamic int8 or bf16, selected with INFERENCE_PRECISION
+        self._model, precision = apply_precision(self._model, device)
+        print(f"Using {precision} inference")
+
+        self._is_initialized = True
+        print("Summarizer model initialized successfully")
+
     def summarize(self, text):
-        """Generate summary for the given text."""
+        """Generate summary for the given text.
+
+        Returns the summary and the strategy that produced it: the configured
+        decoding, or "extractive" when generation failed.
+        """
         if not self._is_initialized:
             self.initialize()
         
         try:
-            return generate_summary(self._model, self._tokenizer, text)
+            return {"summary": generate_summary(self._model, self._tokenizer, text),
+                    "strategy": SUMMARY_STRATEGIES[0].name}
         except Exception as e:
             print(f"Error generating summary: {e}")
             # Fallback to a simple extractive summary
-            return self._extractive_summary(text)
+            return {"summary": self._extractive_summary(text), "strategy": SUMMARY_STRATEGIES[-1].name}
+    
+    def summarize_batch(self, texts, max_batch_size=4):
+        """Summaries for several texts, generated in padded batches."""
+        if not self._is_initialized:
+            self.initialize()
+        return generate_summaries(self._model, self._tokenizer, texts, max_batch_size=max_batch_size)
+
+    def summarize_within(self, text, deadline, max_output_length=200):
+        """Summarize with the best decoding strategy expected to finish before ``deadline``.
+
+        ``deadline`` is a time.monotonic() value. Returns the summary, the
+        strategy used and whether generation was cut short by the deadline.
+        """
+        if not self._is_initialized:
+            self.initialize()
+
+        strategy = choose_strategy("summarize", SUMMARY_STRATEGIES, deadline, max_output_length)
+        STRATEGY_CHOICES.inc(task="summarize", strategy=strategy.name)
+        if strategy.extractive:
+            summary = self._extractive_summary(text)
+        else:
+            summary = generate_summary(self._model, self._tokenizer, text, max_output_length=max_output_length,
+                                       strategy=strategy, deadline=deadline)
+        return {
+            "summary": summary,
+            "strategy": strategy.name,
+            "deadline_exceeded": deadline is not None and time.monotonic() >= deadline,
+        }
+
+    def summarize_hierarchical(self, text):
+        """Summarize a document of any length by map-reducing over token-aware chunks.
+
+        Returns the summary together with the chunk count, number of model
+        calls and per-stage timings.
+        """
+        if not self._is_initialized:
+            self.initialize()
+
+        return hierarchical_summarize(
+            text,
+            self._tokenizer,
+            lambda texts: generate_summaries(self._model, self._tokenizer, texts),
+        )
     
+    def summarize_incremental(self, text, model_id):
+        """Like summarize_hierarchical, but chunks an earlier version of the document already had
+        reuse their stored summaries. ``model_id`` ties the stored summaries to the loaded weights.
+
+        Returns the summary with the number of chunks reused and recomputed.
+        """
+        if not self._is_initialized:
+            self.initialize()
+
+        with self._init_lock:
+            if self._chunk_cache is None:
+                self._chunk_cache = ResultCache("summarizer-chunks")
+                self._chunk_cache.retain_only(model_id)
+
+        return incremental_summarize(
+            text,
+            self._tokenizer,
+            lambda texts: generate_summaries(self._model, self._tokenizer, texts),
+            self._chunk_cache,
+            model_id,
+        )
+
+    def summarize_extractive(self, text):
+        """TextRank summary; needs no model, so it also works before initialization."""
+        return textrank_summary(text)
+
     def _extractive_summary(self, text):
-        """Generate a simple extractive summary as fallback."""
-        sentences = text.split(". ")
-        if len(sentences) <= 3:
-            return text
-        
-        # Take first, middle and last sentence
-        summary = f"{sentences[0]}. {sentences[len(sentences)//2]}. {sentences[-1]}."
-        return summary
+        """Generate an extractive summary as fallback."""
+        return textrank_summary(text)["summary"]
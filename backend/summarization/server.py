@@ -1,12 +1,53 @@
-from flask import Flask, request, jsonify
-from model import SummarizerModel
+from flask import Flask, Response, g, request, jsonify
+from model import SUMMARY_STRATEGIES, SummarizerModel
+from adaptive import deadline_from_ms
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, render as render_metrics
+from precision import inference_precision
+from result_cache import ResultCache, make_key, model_identity
+from stub_model import stub_models_enabled
+from workers import WorkerPool
 import os
+import time
 
 app = Flask(__name__)
 
 # Initialize the model
 summarizer = SummarizerModel.get_instance()
 
+# Set when SUMMARIZER_WORKERS > 0: inference then runs in worker processes instead of here
+worker_pool = None
+WORKER_TIMEOUT = float(os.environ.get('SUMMARIZER_WORKER_TIMEOUT', 300))
+
+# Cached summaries are keyed on the weights file, so replacing it invalidates them
+MODEL_ID = model_identity(
+    "summarizer-t5-base",
+    os.environ.get('MODEL_PATH', 'models/summary_model/epoch10.pth'),
+    "stub" if stub_models_enabled() else inference_precision(),
+)
+result_cache = ResultCache("summarizer")
+result_cache.retain_only(MODEL_ID)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            status=str(response.status_code),
+        )
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint. With SUMMARIZER_WORKERS the per-stage metrics are recorded
+    inside the worker processes, so only request latencies are reported here."""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint to check if the server is running."""
@@ -24,28 +65,99 @@ def summarize_text():
         if not text or len(text.strip()) == 0:
             return jsonify({"error": "Empty text provided"}), 400
         
+        mode = request.json.get('mode', 'truncate')
+        # Optional latency budget in milliseconds; the decoding strategy is chosen to fit it
+        deadline_ms = request.json.get('deadline_ms')
+        deadline = deadline_from_ms(deadline_ms) if mode == 'truncate' else None
+        
+        # "extractive" ranks sentences with TextRank: no model, milliseconds even for long documents
+        if mode == 'extractive':
+            return jsonify({"mode": "extractive", **summarizer.summarize_extractive(text)})
+        
         # Initialize model if not already done
-        if not summarizer._is_initialized:
+        if worker_pool is None and not summarizer._is_initialized:
             # Get model paths from environment or use defaults
             model_path = os.environ.get('MODEL_PATH', 'models/summary_model/epoch10.pth')
             tokenizer_path = os.environ.get('TOKENIZER_PATH', 't5-base')
             summarizer.initialize(model_path, tokenizer_path)
         
+        cache_key = make_key(text, f"summarize:{mode}", MODEL_ID)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+        if deadline is not None:
+            if worker_pool is not None:
+                # time.monotonic() is system-wide, so the deadline holds in the worker processes too
+                response = worker_pool.submit('summarize_within', text, deadline).result(timeout=WORKER_TIMEOUT)
+            else:
+                response = summarizer.summarize_within(text, deadline)
+            # Only summaries from the configured decoding are cached for later requests
+            if response["strategy"] == SUMMARY_STRATEGIES[0].name and not response["deadline_exceeded"]:
+                result_cache.put(cache_key, {"summary": response["summary"]}, MODEL_ID)
+            return jsonify(response)
+
+        # "incremental" summarizes the whole document like "hierarchical", reusing the summaries of
+        # chunks a previous version already had; its response depends on that history, so it is not cached
+        if mode == 'incremental':
+            if worker_pool is not None:
+                result = worker_pool.submit('summarize_incremental', text, MODEL_ID).result(timeout=WORKER_TIMEOUT)
+            else:
+                result = summarizer.summarize_incremental(text, MODEL_ID)
+            return jsonify({"mode": "incremental", **result})
+
+        # "hierarchical" summarizes the whole document instead of its first 512 tokens
+        if mode == 'hierarchical':
+            if worker_pool is not None:
+                result = worker_pool.submit('summarize_hierarchical', text).result(timeout=WORKER_TIMEOUT)
+            else:
+                result = summarizer.summarize_hierarchical(text)
+            response = {"mode": "hierarchical", **result}
+            result_cache.put(cache_key, response, MODEL_ID)
+            return jsonify(response)
+
         # Generate summary
-        summary = summarizer.summarize(text)
-        
-        return jsonify({"summary": summary})
+        if worker_pool is not None:
+            result = worker_pool.submit('summarize', text).result(timeout=WORKER_TIMEOUT)
+        else:
+            result = summarizer.summarize(text)
+        response = {"summary": result["summary"]}
+        # The extractive fallback after a failed generation is not cached, as on the deadline path
+        if result["strategy"] == SUMMARY_STRATEGIES[0].name:
+            result_cache.put(cache_key, response, MODEL_ID)
+        return jsonify(response)
     
     except Exception as e:
         print(f"Error in summarize_text: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/workers', methods=['GET'])
+def workers_status():
+    """Per-worker load, restarts and pinning when running with SUMMARIZER_WORKERS."""
+    if worker_pool is None:
+        return jsonify({"workers": []})
+    return jsonify(worker_pool.stats())
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Drop cached summaries, e.g. after replacing the model weights."""
+    model_id = (request.get_json(silent=True) or {}).get('model_id')
+    return jsonify({"removed": result_cache.invalidate(model_id)})
+
 if __name__ == '__main__':
     # Load model at startup
     try:
         model_path = os.environ.get('MODEL_PATH', 'models/summary_model/epoch10.pth')
         tokenizer_path = os.environ.get('TOKENIZER_PATH', 't5-base')
-        summarizer.initialize(model_path, tokenizer_path)
+        worker_pool = WorkerPool.from_environment(model_path, tokenizer_path)
+        if worker_pool is not None:
+            worker_pool.start()
+        else:
+            summarizer.initialize(model_path, tokenizer_path)
     except Exception as e:
         print(f"Warning: Failed to initialize model at startup: {e}")
         print("The model will attempt to initialize when the first request is received.")
@@ -0,0 +1,257 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+from model import CustomEncoderDecoderSummarizer, SummarizerModel
+from model_registry import read_checkpoint
+from stub_model import stub_models_enabled
+
+# How often the front process checks for crashed workers
+MONITOR_INTERVAL = 1.0
+
+# A request that has crashed this many workers is failed instead of retried
+MAX_ATTEMPTS = 2
+
+# A worker that failed to initialize this many times in a row is not restarted again
+MAX_INIT_FAILURES = int(os.environ.get("SUMMARIZER_MAX_INIT_FAILURES", 3))
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def load_shared_weights(model_path):
+    """Load the summarizer weights once and move them into shared memory.
+
+    The returned state dict can be handed to spawned workers: tensors in
+    shared memory are passed by handle, so every worker maps the same
+    pages instead of holding its own copy.
+    """
+    if stub_models_enabled():
+        return {}
+    if os.path.exists(model_path):
+        state_dict = read_checkpoint(model_path, "cpu")
+    else:
+        print(f"Model weights not found at {model_path}, using base t5 model")
+        state_dict = CustomEncoderDecoderSummarizer().state_dict()
+
+    for tensor in state_dict.values():
+        tensor.share_memory_()
+    return state_dict
+
+
+def _worker_main(worker_id, state_dict, tokenizer_path, num_threads, cpu_ids, requests, responses):
+    # Pin the intra-op thread pool (and optionally the cores) before any model code runs
+    torch.set_num_threads(num_threads)
+    if cpu_ids and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_ids)
+
+    summarizer = SummarizerModel.get_instance()
+    try:
+        summarizer.initialize_from_state_dict(state_dict, tokenizer_path)
+    except Exception as e:
+        responses.put(("init_failed", worker_id, None, f"{type(e).__name__}: {e}"))
+        return
+    responses.put(("ready", worker_id, None, None))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        job_id, method, args = job
+        try:
+            responses.put((job_id, worker_id, "ok", getattr(summarizer, method)(*args)))
+        except Exception as e:
+            responses.put((job_id, worker_id, "error", str(e)))
+
+
+class _Worker:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.requests = None
+        self.outstanding = {}  # job_id -> (future, method, args, attempts)
+        self.ready = False
+        self.restarts = 0
+        self.completed = 0
+        # Consecutive exits before "ready"; at MAX_INIT_FAILURES the worker is given up
+        self.init_failures = 0
+        self.failed = False
+        self.last_error = None
+
+
+class WorkerPool:
+    """Summarizer inference spread over several processes sharing one copy of the weights.
+
+    The front process loads the checkpoint once into shared memory and
+    spawns ``num_workers`` processes that assign those tensors into their
+    model without copying (fp32; int8/bf16 precision converts per worker).
+    Each worker runs with ``threads_per_worker`` torch threads, optionally
+    pinned to its own cores. Requests go to the worker with the fewest
+    outstanding jobs, and a worker that dies is restarted; its in-flight
+    requests are retried on the pool once. A worker that keeps dying before
+    it is ready (bad tokenizer path, out of memory) is given up after
+    ``MAX_INIT_FAILURES`` attempts, and its requests fail with WorkerCrashed.
+    """
+
+    def __init__(self, model_path, tokenizer_path, num_workers=2, threads_per_worker=None, pin_cpus=True):
+        cpu_count = os.cpu_count() or 1
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // num_workers)
+        self.pin_cpus = pin_cpus and self.threads_per_worker * num_workers <= cpu_count
+
+        self._ctx = mp.get_context("spawn")
+        self._responses = self._ctx.Queue()
+        self._workers = [_Worker(i) for i in range(num_workers)]
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._state_dict = None
+        self._running = False
+
+    @classmethod
+    def from_environment(cls, model_path, tokenizer_path):
+        """SUMMARIZER_WORKERS, SUMMARIZER_THREADS_PER_WORKER and SUMMARIZER_PIN_CPUS; None if disabled."""
+        num_workers = int(os.environ.get("SUMMARIZER_WORKERS", 0))
+        if num_workers <= 0:
+            return None
+        threads = int(os.environ.get("SUMMARIZER_THREADS_PER_WORKER", 0)) or None
+        pin_cpus = os.environ.get("SUMMARIZER_PIN_CPUS", "1") == "1"
+        return cls(model_path, tokenizer_path, num_workers, threads, pin_cpus)
+
+    def start(self):
+        print(f"Loading shared weights for {self.num_workers} summarizer workers...")
+        self._state_dict = load_shared_weights(self.model_path)
+        self._running = True
+        for worker in self._workers:
+            self._spawn(worker)
+        threading.Thread(target=self._collect, name="summarizer-collector", daemon=True).start()
+        threading.Thread(target=self._monitor, name="summarizer-monitor", daemon=True).start()
+
+    def _spawn(self, worker):
+        cpu_ids = None
+        if self.pin_cpus:
+            first = worker.worker_id * self.threads_per_worker
+            cpu_ids = list(range(first, first + self.threads_per_worker))
+        worker.requests = self._ctx.Queue()
+        worker.ready = False
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, self._state_dict, self.tokenizer_path, self.threads_per_worker,
+                  cpu_ids, worker.requests, self._responses),
+            daemon=True,
+        )
+        worker.process.start()
+        print(f"Started summarizer worker {worker.worker_id} (pid {worker.process.pid})")
+
+    def submit(self, method, text, *args):
+        """Queue ``SummarizerModel.<method>(text, *args)`` on the least-busy worker; returns a Future."""
+        future = Future()
+        self._dispatch(next(self._job_ids), future, method, (text, *args), attempts=0)
+        return future
+
+    def _dispatch(self, job_id, future, method, args, attempts):
+        with self._lock:
+            usable = [w for w in self._workers if not w.failed]
+            if not usable:
+                future.set_exception(WorkerCrashed("every summarizer worker failed to initialize"))
+                return
+            alive = [w for w in usable if w.process is not None and w.process.is_alive()]
+            worker = min(alive or usable, key=lambda w: (len(w.outstanding), not w.ready))
+            worker.outstanding[job_id] = (future, method, args, attempts)
+            worker.requests.put((job_id, method, args))
+
+    def _collect(self):
+        while self._running:
+            try:
+                job_id, worker_id, status, result = self._responses.get(timeout=MONITOR_INTERVAL)
+            except queue.Empty:
+                continue
+            worker = self._workers[worker_id]
+            if job_id == "ready":
+                worker.ready = True
+                worker.init_failures = 0
+                continue
+            if job_id == "init_failed":
+                print(f"Summarizer worker {worker_id} failed to initialize: {result}")
+                worker.last_error = result
+                continue
+            with self._lock:
+                entry = worker.outstanding.pop(job_id, None)
+                worker.completed += 1
+            if entry is None:
+                continue
+            if status == "ok":
+                entry[0].set_result(result)
+            else:
+                entry[0].set_exception(RuntimeError(result))
+
+    def _monitor(self):
+        while self._running:
+            time.sleep(MONITOR_INTERVAL)
+            for worker in self._workers:
+                if worker.failed or worker.process.is_alive():
+                    continue
+                exitcode, crashed_ready = worker.process.exitcode, worker.ready
+                with self._lock:
+                    orphaned = worker.outstanding
+                    worker.outstanding = {}
+                    if not crashed_ready:
+                        worker.init_failures += 1
+                    worker.failed = worker.init_failures >= MAX_INIT_FAILURES
+                    if not worker.failed:
+                        worker.restarts += 1
+                        self._spawn(worker)
+                if worker.failed:
+                    print(f"Summarizer worker {worker.worker_id} failed to initialize {worker.init_failures} times, "
+                          f"not restarting it")
+                else:
+                    print(f"Summarizer worker {worker.worker_id} exited with code {exitcode}, restarted")
+                for job_id, (future, method, args, attempts) in orphaned.items():
+                    if worker.failed:
+                        future.set_exception(WorkerCrashed(
+                            f"worker {worker.worker_id} failed to initialize: {worker.last_error}"
+                        ))
+                    elif not crashed_ready:
+                        # The worker never ran the job, so the job did not cause the crash
+                        self._dispatch(job_id, future, method, args, attempts)
+                    elif attempts + 1 >= MAX_ATTEMPTS:
+                        future.set_exception(WorkerCrashed(f"worker {worker.worker_id} crashed while summarizing"))
+                    else:
+                        self._dispatch(job_id, future, method, args, attempts + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "id": w.worker_id,
+                        "pid": w.process.pid if w.process else None,
+                        "alive": bool(w.process and w.process.is_alive()),
+                        "ready": w.ready,
+                        "outstanding": len(w.outstanding),
+                        "completed": w.completed,
+                        "restarts": w.restarts,
+                        "init_failures": w.init_failures,
+                        "failed": w.failed,
+                        "last_error": w.last_error,
+                    }
+                    for w in self._workers
+                ],
+                "threads_per_worker": self.threads_per_worker,
+                "pinned": self.pin_cpus,
+            }
+
+    def shutdown(self):
+        self._running = False
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.requests.put(None)
+                worker.process.join(timeout=5)
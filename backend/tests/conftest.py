@@ -0,0 +1,13 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# The backend modules import each other as top-level modules, as when a server is started from backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# summarization/ imports its modules the same way; appended, so that "server" stays backend/server.py
+SUMMARIZATION_DIR = os.path.join(BACKEND_DIR, "summarization")
+sys.path.append(SUMMARIZATION_DIR)
+
+# Tests never load real weights
+os.environ.setdefault("TALQS_STUB_MODELS", "1")
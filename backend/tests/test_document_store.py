@@ -0,0 +1,64 @@
+import numpy as np
+
+from document_store import DocumentStore, build_document, sentence_spans
+
+
+def sentences(text):
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+
+def test_sentence_spans_skip_abbreviations_and_initials():
+    text = "Ramesh v. State was decided. The fine of Rs. 5,000 was paid by A. K. Sharma. Appeal dismissed."
+
+    assert sentences(text) == [
+        "Ramesh v. State was decided.",
+        "The fine of Rs. 5,000 was paid by A. K. Sharma.",
+        "Appeal dismissed.",
+    ]
+
+
+def test_sentence_spans_split_on_blank_lines():
+    assert sentences("IN THE HIGH COURT\n\nCivil Appeal No. 12 of 2019\n\nHeld: dismissed.") == [
+        "IN THE HIGH COURT",
+        "Civil Appeal No. 12 of 2019",
+        "Held: dismissed.",
+    ]
+
+
+def test_spilled_documents_reload_with_the_same_sentences(tmp_path):
+    store = DocumentStore(max_bytes=1, spill_dir=str(tmp_path))
+    first = store.add(build_document("First document. It has two sentences.", "a.txt"))
+    second = store.add(build_document("Second document.", "b.txt"))
+
+    assert store.stats()["spills"] == 1
+    reloaded = store.get(first.id)
+    assert reloaded.text == first.text
+    assert reloaded.filename == "a.txt"
+    assert np.array_equal(reloaded.sentences, first.sentences)
+    assert store.stats()["reloads"] == 1
+    assert store.latest().id == second.id
+
+
+def test_spilled_documents_survive_a_restart(tmp_path):
+    store = DocumentStore(max_bytes=1, spill_dir=str(tmp_path))
+    first = store.add(build_document("Kept on disk.", "a.txt"))
+    store.add(build_document("Pushes the first one out.", "b.txt"))
+
+    assert DocumentStore(spill_dir=str(tmp_path)).get(first.id).sentence_texts() == ["Kept on disk."]
+
+
+def test_delete_removes_memory_and_disk_copies(tmp_path):
+    store = DocumentStore(max_bytes=1, spill_dir=str(tmp_path))
+    first = store.add(build_document("Spilled.", "a.txt"))
+    store.add(build_document("In memory.", "b.txt"))
+
+    assert store.delete(first.id)
+    assert store.get(first.id) is None
+    assert not store.delete(first.id)
+
+
+def test_unknown_and_malformed_ids_are_rejected(tmp_path):
+    store = DocumentStore(spill_dir=str(tmp_path))
+
+    assert store.get("0" * 32) is None
+    assert store.get("../etc/passwd") is None
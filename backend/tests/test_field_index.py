@@ -0,0 +1,84 @@
+import pytest
+
+from field_index import FieldIndex, extract_fields, normalize_question
+
+JUDGMENT = """IN THE SUPREME COURT OF INDIA
+Ramesh Kumar v. State of Maharashtra
+The petitioner, Ramesh Kumar, challenged the acquisition of his land under Section 4 of the Land Acquisition Act, 1894.
+The notification was issued on 12 March 2015 and possession was taken on 03/06/2016.
+Reliance was placed on Kesavananda Bharati v. State of Kerala (1973) 4 SCC 225 and on Article 300A.
+Mr. Sharma, the respondent, argued that the acquisition served a public purpose.
+Justice Rao dissented on the question of compensation.
+For these reasons the appeal is allowed and the notification is quashed.
+"""
+
+
+@pytest.fixture(scope="module")
+def fields():
+    return extract_fields(JUDGMENT)
+
+
+def test_parties_come_from_the_caption_and_the_role_phrases(fields):
+    assert fields["petitioner"] == ["Ramesh Kumar"]
+    assert fields["respondent"] == ["State of Maharashtra", "Mr. Sharma"]
+
+
+def test_later_captions_and_reporters_are_precedents(fields):
+    assert "Kesavananda Bharati v. State of Kerala" in fields["precedents"]
+    assert "(1973) 4 SCC 225" in fields["precedents"]
+    assert "Ramesh Kumar v. State of Maharashtra" not in fields["precedents"]
+
+
+def test_provisions(fields):
+    assert "Section 4 of the Land Acquisition Act, 1894" in fields["provisions"]
+    assert "Article 300A" in fields["provisions"]
+
+
+def test_timeline_is_sorted_and_reads_numeric_dates_day_first(fields):
+    assert [event["date"] for event in fields["timeline"]] == ["2015-03-12", "2016-06-03"]
+
+
+def test_the_last_operative_sentence_is_the_disposition(fields):
+    assert fields["disposition"]["outcome"] == "allowed"
+    assert fields["disposition"]["sentence"].startswith("For these reasons")
+
+
+def test_dissent(fields):
+    assert fields["dissent"] == ["Justice Rao dissented on the question of compensation."]
+
+
+def test_lowercase_words_are_not_taken_for_names():
+    fields = extract_fields("The petitioner filed a writ petition. The respondent, the state, opposed it.")
+    assert fields["petitioner"] == [] and fields["respondent"] == []
+
+
+def test_index_answers_default_questions_however_they_are_written(fields):
+    index = FieldIndex(fields)
+
+    assert index.lookup("Who is the petitioner in the case?") == "The petitioner is Ramesh Kumar."
+    assert index.lookup("who is the PETITIONER in the case") == "The petitioner is Ramesh Kumar."
+    assert index.lookup("What was the court's decision?").startswith("For these reasons")
+    assert index.lookup("What is the case summary?") is None
+
+
+def test_missing_questions_go_to_the_model_once_and_are_kept(fields):
+    index = FieldIndex(fields)
+    questions = ["Who is the petitioner in the case?", "What is the case summary?", "What evidence was presented?"]
+
+    assert index.missing(questions) == questions[1:]
+    index.add_answers({"What is the case summary?": "A land acquisition appeal.",
+                       "Who is the petitioner in the case?": "someone else"})
+
+    assert index.missing(questions) == ["What evidence was presented?"]
+    assert index.lookup("what is the case summary") == "A land acquisition appeal."
+    # Rule answers are not overwritten by model answers
+    assert index.lookup(questions[0]) == "The petitioner is Ramesh Kumar."
+
+
+def test_a_judgment_without_dissent_says_so():
+    index = FieldIndex.from_text("The appeal is dismissed.")
+    assert index.lookup("Were there any dissenting opinions?") == "No dissenting opinion is mentioned in the judgment."
+
+
+def test_normalize_question():
+    assert normalize_question("  What was the Court's decision?? ") == "what was the court s decision"
@@ -0,0 +1,135 @@
+from concurrent.futures import Future
+
+import pytest
+import requests
+
+from gateway import Backend, BackendError, BackendUnavailable, CircuitBreaker, outcome
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self._body = body
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def post(self, url, json=None, timeout=None):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def backend(*responses, failures=2):
+    breaker = CircuitBreaker(failure_threshold=failures, reset_seconds=0)
+    instance = Backend("test", "http://backend", read_timeout=1, breaker=breaker)
+    instance.session = FakeSession(*responses)
+    return instance
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["rejected_total"] == 1
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    assert breaker.state == "half-open"
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_a_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0)
+    open_breaker(breaker)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.stats()["opened_total"] == 2
+    assert breaker.allow()
+
+
+def test_backend_trips_on_server_errors_but_not_on_client_errors():
+    instance = backend(FakeResponse(400), FakeResponse(429), FakeResponse(500), requests.ConnectionError("down"))
+    for _ in range(4):
+        with pytest.raises(BackendError):
+            instance.post("/answer", {})
+    assert instance.breaker.stats()["consecutive_failures"] == 2
+    assert instance.breaker.stats()["opened_total"] == 1
+
+
+def test_an_unexpected_error_during_the_trial_does_not_wedge_the_breaker():
+    # Regression: a ValueError from response.json() left the half-open trial marked as running
+    instance = backend(FakeResponse(200, ValueError("not json")), FakeResponse(200, {"answer": "ok"}), failures=1)
+    open_breaker(instance.breaker)
+
+    with pytest.raises(BackendError, match="invalid response"):
+        instance.post("/answer", {})
+
+    assert instance.post("/answer", {}) == {"answer": "ok"}
+    assert instance.breaker.state == "closed"
+
+
+def test_open_breaker_rejects_without_calling_the_backend():
+    instance = backend()
+    instance.breaker.reset_seconds = 60
+    open_breaker(instance.breaker)
+
+    with pytest.raises(BackendUnavailable):
+        instance.post("/answer", {})
+    assert instance.calls == 0
+
+
+def test_outcome_reports_any_failure_as_an_error():
+    future = Future()
+    future.set_exception(RuntimeError("boom"))
+    assert outcome(future) == {"status": "error", "error": "boom", "retryAfter": None}
+
+    assert outcome(Future()) == {"status": "pending"}
+
+
+def test_questions_about_a_forgotten_document_register_it_again():
+    from gateway import Gateway
+
+    gateway = Gateway(workers=1)
+    gateway.qa = backend(FakeResponse(404), FakeResponse(200, {"document_id": "id"}), FakeResponse(200, {"answer": "ok"}))
+    sent = []
+    post = gateway.qa.post
+    gateway.qa.post = lambda path, payload, timeout=None: sent.append((path, payload)) or post(path, payload)
+
+    assert gateway.answer_document("Who?", "the text") == {"answer": "ok"}
+    assert [path for path, _ in sent] == ["/answer", "/documents", "/answer"]
+    assert "context" not in sent[0][1] and sent[1][1] == {"text": "the text", "questions": []}
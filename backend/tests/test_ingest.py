@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+
+from document_store import build_document
+from field_index import FieldExtractor, extract_fields
+from ingest import DocumentBuilder, SentenceSplitter, ingest_stream
+
+JUDGMENT = (
+    "IN THE SUPREME COURT OF INDIA\n\n"
+    "Ramesh Kumar v. State of Punjab\n\n"
+    "The appellant, Ramesh Kumar, was suspended on 12th March 2010. A fine of Rs. 5,000 was imposed "
+    "by Mr. A. K. Sharma... The respondent relied on Maneka Gandhi v. Union of India, AIR 1978 SC 597. "
+    "Naïve café owners — and others — testified! Was the order valid? "
+    "For these reasons, the appeal is allowed. "
+) * 3
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 2, 3, 7, 64, 1 << 20])
+def test_ingest_matches_build_document(chunk_bytes):
+    expected = build_document(JUDGMENT)
+
+    document = ingest_stream(io.BytesIO(JUDGMENT.encode("utf-8")), DocumentBuilder(), chunk_bytes=chunk_bytes)
+
+    assert document.text == JUDGMENT
+    assert np.array_equal(document.sentences, expected.sentences)
+    assert document.word_count == expected.word_count
+
+
+def test_on_sentence_sees_every_sentence_in_order():
+    seen = []
+
+    document = ingest_stream(io.BytesIO(JUDGMENT.encode("utf-8")), DocumentBuilder(on_sentence=seen.append),
+                             chunk_bytes=5)
+
+    assert seen == document.sentence_texts()
+
+
+def test_fields_extracted_during_ingest_match_extraction_afterwards():
+    extractor = FieldExtractor()
+
+    document = ingest_stream(io.BytesIO(JUDGMENT.encode("utf-8")), DocumentBuilder(on_sentence=extractor.add),
+                             chunk_bytes=16)
+
+    assert extractor.fields() == extract_fields(document.text)
+
+
+def test_invalid_utf8_raises():
+    with pytest.raises(UnicodeDecodeError):
+        ingest_stream(io.BytesIO(b"valid text \xff\xfe"), DocumentBuilder())
+
+
+def test_text_without_punctuation_is_cut_at_whitespace():
+    splitter = SentenceSplitter(max_sentence_chars=20)
+
+    sentences = []
+    for _ in range(20):
+        sentences += splitter.feed("word ")
+    sentences += splitter.finish()
+
+    assert len(sentences) > 1
+    assert all(len(text) <= 25 for _, _, text in sentences)
+    assert " ".join(text for _, _, text in sentences) == ("word " * 20).strip()
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from jobs import CANCELLED, DONE, FAILED, PENDING, RUNNING, JobQueue, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def documents(*texts):
+    return [{"text": text} for text in texts]
+
+
+def item_statuses(store, job_id):
+    return [row["status"] for row in store.results(job_id, include_pending=True)]
+
+
+def test_claim_batches_documents_with_the_same_task_and_params(store):
+    first = store.create("summarize", {"length": 1}, documents("a", "b"))
+    other = store.create("summarize", {"length": 2}, documents("c"))
+    second = store.create("summarize", {"length": 1}, documents("d"))
+
+    kind, params, rows = store.claim(10)
+
+    assert (kind, params) == ("summarize", {"length": 1})
+    assert [(job_id, text) for job_id, _, text in rows] == [(first, "a"), (first, "b"), (second, "d")]
+    assert item_statuses(store, other) == [PENDING]
+    assert store.claim(10)[2] == [(other, 0, "c")]
+    assert store.claim(10) is None
+
+
+def test_running_documents_are_requeued_after_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id = store.create("summarize", {}, documents("a", "b"))
+    store.claim(1)
+    assert item_statuses(store, job_id) == [RUNNING, PENDING]
+
+    reopened = JobStore(path)
+
+    assert reopened.recovered == 1
+    assert item_statuses(reopened, job_id) == [PENDING, PENDING]
+
+
+def test_finish_closes_the_job_and_keeps_cancelled_documents(store):
+    job_id = store.create("summarize", {}, documents("a", "b"))
+    _, _, rows = store.claim(10)
+    store.cancel(job_id)
+
+    store.finish([(job_id, idx, "late", None) for job_id, idx, _ in rows])
+
+    assert item_statuses(store, job_id) == [CANCELLED, CANCELLED]
+    assert store.status(job_id)["status"] == CANCELLED
+
+
+def test_a_failing_batch_is_retried_one_document_at_a_time(store):
+    def handler(params, texts):
+        if "bad" in texts:
+            raise RuntimeError("bad document")
+        return [text.upper() for text in texts]
+
+    queue = JobQueue(store)
+    queue.register("upper", handler)
+    job_id = store.create("upper", {}, documents("a", "bad", "c"))
+
+    store.finish(queue._process(*store.claim(10)))
+
+    rows = list(store.results(job_id))
+    assert [row["status"] for row in rows] == [DONE, FAILED, DONE]
+    assert [row["result"] for row in rows] == ["A", None, "C"]
+    assert store.status(job_id)["status"] == "done"
+
+
+def test_short_handler_results_do_not_leave_documents_running(store):
+    # Regression: zip(rows, results) silently dropped the documents without a result
+    def handler(params, texts):
+        return [text.upper() for text in texts if text != "lost"]
+
+    queue = JobQueue(store)
+    queue.register("upper", handler)
+    job_id = store.create("upper", {}, documents("a", "lost", "c"))
+
+    store.finish(queue._process(*store.claim(10)))
+
+    assert item_statuses(store, job_id) == [DONE, FAILED, DONE]
+    assert store.status(job_id)["status"] == "done"
+
+
+def test_workers_drain_submitted_jobs(store):
+    queue = JobQueue(store, poll_seconds=0.01)
+    queue.register("upper", lambda params, texts: [text.upper() for text in texts])
+    queue.start()
+    try:
+        job_id = queue.submit("upper", documents("a", "b"))
+        deadline = time.time() + 5
+        while store.status(job_id)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+
+    assert [row["result"] for row in store.results(job_id)] == ["A", "B"]
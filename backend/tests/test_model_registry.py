@@ -0,0 +1,50 @@
+import collections
+
+import torch
+from torch import nn
+from transformers import T5Config, T5ForConditionalGeneration
+
+from model_registry import build_from_state_dict, read_checkpoint
+
+CONFIG = T5Config(vocab_size=64, d_model=16, d_ff=32, num_layers=1, num_heads=2, d_kv=8, decoder_start_token_id=0)
+Settings = collections.namedtuple("Settings", "learning_rate")
+
+
+class Wrapper(nn.Module):
+    def __init__(self, load_pretrained=True):
+        super().__init__()
+        self.t5 = T5ForConditionalGeneration(CONFIG)
+
+
+def test_build_from_state_dict_keeps_embeddings_tied():
+    source = Wrapper()
+    # Separate tensors per key, as in a checkpoint read from disk
+    state_dict = {key: value.clone() for key, value in source.state_dict().items()}
+
+    model = build_from_state_dict(Wrapper, state_dict)
+
+    assert model.t5.lm_head.weight is model.t5.shared.weight
+    assert torch.equal(model.t5.shared.weight, source.t5.shared.weight)
+
+
+def test_read_checkpoint_memory_maps_zipfile_checkpoints(tmp_path):
+    path = tmp_path / "model.pth"
+    torch.save({"weight": torch.arange(4.0)}, path)
+
+    assert torch.equal(read_checkpoint(path, "cpu")["weight"], torch.arange(4.0))
+
+
+def test_read_checkpoint_loads_legacy_format(tmp_path):
+    path = tmp_path / "legacy.pth"
+    torch.save({"weight": torch.ones(3)}, path, _use_new_zipfile_serialization=False)
+
+    assert torch.equal(read_checkpoint(path, "cpu")["weight"], torch.ones(3))
+
+
+def test_read_checkpoint_loads_pickles_with_more_than_tensors(tmp_path):
+    path = tmp_path / "training.pth"
+    torch.save({"weight": torch.ones(2), "settings": Settings(0.1)}, path)
+
+    checkpoint = read_checkpoint(path, "cpu")
+
+    assert checkpoint["settings"].learning_rate == 0.1
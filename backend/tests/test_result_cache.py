@@ -0,0 +1,91 @@
+import json
+
+from result_cache import ResultCache, make_key, model_identity
+
+
+def memory_cache(max_bytes):
+    return ResultCache("test", max_bytes=max_bytes, cache_dir="")
+
+
+def size(value):
+    return len(json.dumps(value).encode("utf-8"))
+
+
+def test_keys_ignore_whitespace_but_not_task_model_or_params():
+    key = make_key("The  appeal\n is dismissed.", "summarize", "m1", {"max_length": 150})
+
+    assert key == make_key("The appeal is dismissed.", "summarize", "m1", {"max_length": 150})
+    assert key != make_key("The appeal is dismissed.", "answer", "m1", {"max_length": 150})
+    assert key != make_key("The appeal is dismissed.", "summarize", "m2", {"max_length": 150})
+    assert key != make_key("The appeal is dismissed.", "summarize", "m1", {"max_length": 100})
+
+
+def test_model_identity_includes_precision_and_weights(tmp_path):
+    weights = tmp_path / "weights.pth"
+    weights.write_bytes(b"1234")
+
+    assert model_identity("qa") == "qa"
+    assert model_identity("qa", precision="fp32") == "qa"
+    assert model_identity("qa", precision="int8") == "qa/int8"
+    assert model_identity("qa", str(weights)).startswith("qa@4-")
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes():
+    value = "x" * 100
+    cache = memory_cache(max_bytes=3 * size(value))
+    for key in "abc":
+        cache.put(key, value, "m")
+    cache.get("a")
+
+    cache.put("d", value, "m")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == [value] * 3
+    assert cache.stats()["bytes"] == 3 * size(value)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_replacing_an_entry_does_not_count_its_bytes_twice():
+    cache = memory_cache(max_bytes=1000)
+    cache.put("a", "x" * 100, "m")
+    cache.put("a", "y" * 50, "m")
+
+    assert cache.get("a") == "y" * 50
+    assert cache.stats()["bytes"] == size("y" * 50)
+
+
+def test_values_larger_than_the_budget_are_not_kept_in_memory():
+    cache = memory_cache(max_bytes=10)
+    cache.put("big", "x" * 100, "m")
+
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_by_model():
+    cache = memory_cache(max_bytes=1000)
+    cache.put("a", "old", "m1")
+    cache.put("b", "new", "m2")
+
+    assert cache.invalidate("m1") == 1
+    assert cache.get("a") is None and cache.get("b") == "new"
+    assert cache.invalidate() == 1
+
+
+def test_disk_entries_survive_a_restart_and_are_promoted(tmp_path):
+    ResultCache("test", cache_dir=str(tmp_path)).put("a", {"summary": "s"}, "m1")
+
+    reopened = ResultCache("test", cache_dir=str(tmp_path))
+
+    assert reopened.get("a") == {"summary": "s"}
+    assert reopened.get("a") == {"summary": "s"}
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_retain_only_drops_other_models_from_disk(tmp_path):
+    cache = ResultCache("test", cache_dir=str(tmp_path))
+    cache.put("a", "old", "m1")
+    cache.put("b", "new", "m2")
+
+    assert cache.retain_only("m2") == 1
+    assert ResultCache("test", cache_dir=str(tmp_path)).get("a") is None
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from retrieval import IndexCache, retrieve_context
+
+
+def test_cache_returns_the_same_index_and_evicts_the_oldest():
+    cache = IndexCache(max_entries=2, build=lambda text: object())
+
+    first = cache.get("a")
+    assert cache.get("a") is first
+    cache.get("b")
+    cache.get("c")
+
+    assert cache.get("a") is not first
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_concurrent_requests_for_one_document_build_once():
+    builds = []
+
+    def build(text):
+        builds.append(text)
+        time.sleep(0.2)
+        return object()
+
+    cache = IndexCache(build=build)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("doc"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == ["doc"]
+    assert len({id(index) for index in results}) == 1
+
+
+def test_a_slow_build_does_not_block_other_documents():
+    started = threading.Event()
+    release = threading.Event()
+
+    def build(text):
+        if text == "slow":
+            started.set()
+            release.wait(5)
+        return text
+
+    cache = IndexCache(build=build)
+    slow = threading.Thread(target=cache.get, args=("slow",))
+    slow.start()
+    started.wait(5)
+    try:
+        start = time.perf_counter()
+        assert cache.get("fast") == "fast"
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        slow.join()
+
+
+def test_a_failed_build_is_retried_by_the_next_request():
+    calls = []
+
+    def build(text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return text
+
+    cache = IndexCache(build=build)
+    try:
+        cache.get("doc")
+    except RuntimeError:
+        pass
+    assert cache.get("doc") == "doc"
+    assert cache.stats()["entries"] == 1
+
+
+def test_short_documents_are_returned_unchanged():
+    cache = IndexCache()
+    assert retrieve_context(cache, "who filed", "A short document.") == "A short document."
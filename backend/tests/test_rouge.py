@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.rouge import rouge_l, rouge_n, tokenize
+
+
+def test_tokenize_lowercases_and_drops_punctuation():
+    assert tokenize("The Court, in 2019, held:") == ["the", "court", "in", "2019", "held"]
+
+
+def test_identical_texts_score_one():
+    text = "The appeal is dismissed with costs."
+    assert rouge_n(text, text, 1) == pytest.approx(1.0)
+    assert rouge_n(text, text, 2) == pytest.approx(1.0)
+    assert rouge_l(text, text) == pytest.approx(1.0)
+
+
+def test_disjoint_texts_score_zero():
+    assert rouge_n("appeal dismissed", "petition allowed") == 0.0
+    assert rouge_l("appeal dismissed", "petition allowed") == 0.0
+
+
+def test_partial_overlap_is_the_f1_of_precision_and_recall():
+    prediction, reference = "the cat sat", "the cat sat on the mat"
+
+    # 3 of 3 predicted unigrams match, 3 of 6 reference unigrams are covered
+    assert rouge_n(prediction, reference, 1) == pytest.approx(2 / 3)
+    # 2 of 2 predicted bigrams, 2 of 5 reference bigrams
+    assert rouge_n(prediction, reference, 2) == pytest.approx(2 * 1 * 0.4 / 1.4)
+    assert rouge_l(prediction, reference) == pytest.approx(2 / 3)
+
+
+def test_repeated_ngrams_are_clipped_to_the_reference_count():
+    assert rouge_n("the the the", "the cat", 1) == pytest.approx(2 * (1 / 3) * 0.5 / (1 / 3 + 0.5))
+
+
+def test_rouge_l_rewards_order_that_rouge_1_ignores():
+    reference = "the court dismissed the appeal"
+    reordered = "the appeal dismissed the court"
+
+    assert rouge_n(reordered, reference, 1) == pytest.approx(1.0)
+    assert rouge_l(reordered, reference) < 1.0
+
+
+def test_empty_texts():
+    assert rouge_l("", "") == 1.0
+    assert rouge_l("", "text") == 0.0
+    assert rouge_n("", "text") == 0.0
+    assert rouge_n("one", "one", 2) == 0.0
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from field_index import question_field
+from semantic_cache import SemanticCache
+
+CONTEXT = "Ram Kumar v. State of Punjab. The appeal is dismissed."
+
+
+def anisotropic_embed(questions):
+    """Every question nearly on the same direction, as mean-pooled T5 states of legal questions are."""
+    rng = np.random.default_rng(0)
+    base = np.ones(16, dtype=np.float32)
+    vectors = base + 0.01 * rng.standard_normal((len(questions), 16)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache("test", anisotropic_embed, threshold=0.95)
+    questions = [
+        "Who is the petitioner in the case?",
+        "What was the court's decision?",
+        "When was the appeal filed?",
+    ]
+    cache.add(CONTEXT, questions, [f"answer to {question}" for question in questions])
+    return cache
+
+
+def lookup(cache, question):
+    vector = cache.embed([question])[0] if cache.needs_embedding(CONTEXT, question) else None
+    return cache.lookup(CONTEXT, question, vector)
+
+
+@pytest.mark.parametrize("question", [
+    "Who filed the case?",
+    "Who is the plaintiff?",
+    "petitioner?",
+    "Who were the appellants in this appeal?",
+])
+def test_wordings_of_the_same_field_reuse_the_answer(cache, question):
+    answer, _, matched = lookup(cache, question)
+
+    assert matched == "Who is the petitioner in the case?"
+    assert answer == "answer to Who is the petitioner in the case?"
+    assert cache.stats()["field_hits"] == 1
+
+
+@pytest.mark.parametrize("question", [
+    "Who is the respondent in the case?",
+    "Against whom was the case filed?",
+    "Were there any dissenting opinions?",
+])
+def test_questions_about_another_field_do_not_share_an_answer(cache, question):
+    assert lookup(cache, question)[0] is None
+
+
+def test_questions_without_a_field_never_match_one_with_a_field():
+    cache = SemanticCache("test", anisotropic_embed, threshold=0.95)
+    cache.add(CONTEXT, ["Who is the petitioner in the case?"], ["Ram Kumar"])
+
+    # Nothing embedded to compare with: no encoder pass, and no answer
+    assert not cache.needs_embedding(CONTEXT, "Who is the petitioner's counsel?")
+    assert cache.lookup(CONTEXT, "Who is the petitioner's counsel?")[0] is None
+
+
+def test_questions_without_a_field_match_from_the_threshold():
+    cache = SemanticCache("test", anisotropic_embed, threshold=0.95)
+    cache.add(CONTEXT, ["When was the appeal filed?"], ["In 2019"], np.array([[1.0, 0.0]], dtype=np.float32))
+
+    answer, similarity, matched = cache.lookup(CONTEXT, "When has the appeal been filed", np.array([0.96, 0.28]))
+    assert (answer, matched) == ("In 2019", "When was the appeal filed?")
+    assert similarity == pytest.approx(0.96, abs=1e-3)
+
+    answer, similarity, _ = cache.lookup(CONTEXT, "When was the trial held?", np.array([0.6, 0.8]))
+    assert answer is None
+    assert similarity == pytest.approx(0.6, abs=1e-3)
+
+
+def test_answers_are_per_document(cache):
+    assert cache.lookup("another document", "Who is the petitioner in the case?")[0] is None
+
+
+def test_question_field_covers_the_default_questions_and_their_wordings():
+    assert question_field("Who is the petitioner in the case?") == "petitioner"
+    assert question_field("Who brought the suit?") == "petitioner"
+    assert question_field("Who were the accused?") == "respondent"
+    assert question_field("How did the court rule?") == "disposition"
+    assert question_field("Who is the petitioner's counsel?") is None
+    assert question_field("When was the appeal filed?") is None
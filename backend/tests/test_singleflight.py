@@ -0,0 +1,128 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_calls_with_one_key_share_one_computation():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(flights.run("key", compute) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = run(scenario())
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.stats()["computations"] == 1 and flights.stats()["coalesced"] == 4
+    assert flights.in_flight == 0
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return await asyncio.gather(flights.run("a", lambda: compute("a")), flights.run("b", lambda: compute("b")))
+
+    assert run(scenario()) == ["a", "b"]
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.1)
+            return "result"
+
+        first = asyncio.ensure_future(flights.run("key", compute))
+        second = asyncio.ensure_future(flights.run("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return first, await second
+
+    first, result = run(scenario())
+
+    assert first.cancelled()
+    assert result == "result"
+
+
+def test_the_computation_is_cancelled_when_every_caller_is_gone():
+    async def scenario():
+        flights = SingleFlight("test")
+        finished = []
+
+        async def compute():
+            await asyncio.sleep(0.1)
+            finished.append(True)
+
+        callers = [asyncio.ensure_future(flights.run("key", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.2)
+        return flights, finished
+
+    flights, finished = run(scenario())
+
+    assert finished == []
+    assert flights.in_flight == 0
+
+
+def test_failures_reach_every_caller_and_the_next_call_starts_afresh():
+    async def scenario():
+        flights = SingleFlight("test")
+        attempts = []
+
+        async def compute():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return "result"
+
+        failures = await asyncio.gather(*(flights.run("key", compute) for _ in range(3)), return_exceptions=True)
+        return flights, failures, await flights.run("key", compute)
+
+    flights, failures, result = run(scenario())
+
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert result == "result"
+    assert flights.stats()["failures"] == 1
+
+
+def test_a_call_right_after_the_last_caller_left_starts_afresh():
+    async def scenario():
+        flights = SingleFlight("test")
+        started = []
+
+        async def compute():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return len(started)
+
+        caller = asyncio.ensure_future(flights.run("key", compute))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0)
+        # The cancelled task has not landed yet
+        return await flights.run("key", compute), flights
+
+    result, flights = run(scenario())
+
+    assert result == 2
+    assert flights.stats()["computations"] == 2
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+import pytest
+
+import model  # summarization/model.py
+from conftest import SUMMARIZATION_DIR
+
+TEXT = "The appellant challenged the order. The High Court dismissed the appeal. Costs were awarded."
+
+
+@pytest.fixture
+def server():
+    # summarization/server.py shares its module name with backend/server.py
+    spec = importlib.util.spec_from_file_location("summarization_server", os.path.join(SUMMARIZATION_DIR, "server.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def summarize(server):
+    response = server.app.test_client().post("/summarize", json={"text": TEXT, "mode": "full"})
+    assert response.status_code == 200
+    return response.get_json()["summary"]
+
+
+def test_the_extractive_fallback_is_not_cached(server, monkeypatch):
+    def failing_generation(*args, **kwargs):
+        raise RuntimeError("out of memory")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(model, "generate_summary", failing_generation)
+        fallback = summarize(server)
+    assert fallback == model.textrank_summary(TEXT)["summary"]
+    assert server.result_cache.stats()["entries"] == 0
+
+    generated = summarize(server)
+    assert generated != fallback
+    assert server.result_cache.stats()["entries"] == 1
+    assert summarize(server) == generated
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from textrank import rank_sentences, split_sentences, textrank_summary, tfidf_matrix
+
+SENTENCES = [
+    "The appellant challenged the acquisition of agricultural land.",
+    "The acquisition of the land was notified for a public purpose.",
+    "The appellant was not heard before the acquisition was notified.",
+    "Lunch was served at noon.",
+    "The court quashed the acquisition notification for want of a hearing.",
+    "The compensation for the land was never paid to the appellant.",
+    "Costs are awarded to the appellant.",
+]
+
+
+def dense_textrank(sentences, damping=0.85, iterations=200):
+    """Textbook PageRank over the explicit cosine similarity matrix."""
+    X = tfidf_matrix(sentences).toarray()
+    S = X @ X.T
+    np.fill_diagonal(S, 0.0)
+    n = len(sentences)
+    degree = S.sum(axis=1)
+    dangling = degree <= 1e-12
+    degree[dangling] = 1.0
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        scores = (1 - damping) / n + damping * (S @ (scores / degree) + scores[dangling].sum() / n)
+    return scores
+
+
+def test_tfidf_rows_are_unit_length():
+    X = tfidf_matrix(SENTENCES)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    assert norms == pytest.approx(np.ones(len(SENTENCES)))
+
+
+def test_sparse_ranking_matches_the_dense_similarity_graph():
+    assert rank_sentences(SENTENCES, tolerance=1e-12) == pytest.approx(dense_textrank(SENTENCES), abs=1e-8)
+
+
+def test_unrelated_sentences_rank_lowest():
+    scores = rank_sentences(SENTENCES)
+    assert int(np.argmin(scores)) == SENTENCES.index("Lunch was served at noon.")
+    assert scores.sum() == pytest.approx(1.0)
+
+
+def test_summary_keeps_document_order_and_respects_the_limits():
+    result = textrank_summary(sentences=SENTENCES, max_sentences=3)
+
+    assert result["indices"] == sorted(result["indices"])
+    assert len(result["indices"]) == 3
+    assert 3 not in result["indices"]
+    assert result["summary"] == " ".join(SENTENCES[i] for i in result["indices"])
+
+    short = textrank_summary(sentences=SENTENCES, max_sentences=3, max_words=12)
+    # The best sentence is always kept; others only while the total stays within max_words
+    assert len(short["indices"]) == 1 or sum(len(SENTENCES[i].split()) for i in short["indices"]) <= 12
+
+
+def test_redundant_sentences_are_not_picked_twice():
+    sentences = SENTENCES + [SENTENCES[4], SENTENCES[4]]
+    result = textrank_summary(sentences=sentences, max_sentences=4)
+    picked = [sentences[i] for i in result["indices"]]
+    assert len(picked) == len(set(picked))
+
+
+def test_short_documents_are_returned_whole():
+    text = "The appeal is dismissed. Costs to the respondent."
+    assert textrank_summary(text)["summary"] == " ".join(split_sentences(text))
+    assert textrank_summary("")["summary"] == ""
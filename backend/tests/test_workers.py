@@ -0,0 +1,33 @@
+import pytest
+
+import workers  # summarization/workers.py
+
+
+@pytest.fixture
+def failing_pool(monkeypatch):
+    # Real weights without a checkpoint or the network: building T5 fails inside every worker
+    monkeypatch.setenv("TALQS_STUB_MODELS", "0")
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    monkeypatch.setattr(workers, "load_shared_weights", lambda model_path: {})
+    monkeypatch.setattr(workers, "MONITOR_INTERVAL", 0.1)
+    monkeypatch.setattr(workers, "MAX_INIT_FAILURES", 2)
+    pool = workers.WorkerPool("missing.pth", "missing-tokenizer", num_workers=1, pin_cpus=False)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_a_worker_that_cannot_initialize_is_given_up(failing_pool):
+    future = failing_pool.submit("summarize", "The appeal is dismissed.")
+
+    with pytest.raises(workers.WorkerCrashed):
+        future.result(timeout=120)
+    worker = failing_pool.stats()["workers"][0]
+    assert worker["failed"]
+    assert worker["init_failures"] == 2
+    assert worker["restarts"] == 1
+    assert not worker["alive"]
+
+    # Later requests fail at once instead of queueing for a worker that never comes up
+    with pytest.raises(workers.WorkerCrashed):
+        failing_pool.submit("summarize", "The appeal is dismissed.").result(timeout=1)